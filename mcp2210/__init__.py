@@ -1,2 +1,19 @@
 from mcp2210.commands import ChipSettings, SPISettings, USBSettings
-from mcp2210.device import MCP2210, CommandException
+from mcp2210.device import MCP2210, CommandException, DeadlineExceeded, VerificationError
+from mcp2210.words import WordTransfer
+from mcp2210.transport import Transport, HIDTransport, BufferedTransport, LazyTransport, enumerate_devices
+from mcp2210.simulator import SimulatedMCP2210
+from mcp2210.trace import Tracer
+from mcp2210.metrics import Metrics
+from mcp2210.snapshot import SettingsSnapshot
+from mcp2210.capture import CaptureWriter, RecordingTransport, ReplayTransport
+from mcp2210.manager import DeviceManager
+from mcp2210.daemon import MCP2210Daemon, RemoteMCP2210
+from mcp2210.flash import SPIFlash
+from mcp2210.scheduler import TransactionScheduler
+from mcp2210.sampler import GPIOSampler
+from mcp2210.monitor import EventMonitor
+
+import sys
+if sys.version_info >= (3, 7):
+    from mcp2210.aio import AsyncMCP2210
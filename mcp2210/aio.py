@@ -0,0 +1,114 @@
+import asyncio
+
+from mcp2210.device import MCP2210
+from mcp2210.manager import DeviceWorker
+
+
+class AsyncMCP2210(object):
+    #print "aio.py:AsyncMCP2210"
+    """asyncio front-end for an MCP2210.
+
+    Every operation runs on a dedicated I/O thread for the device, in the order the coroutines were
+    called, so any number of coroutines can share one adapter without blocking the event loop on USB
+    reads or interleaving their commands.
+
+    Usage:
+        >>> dev = await AsyncMCP2210.open(my_vid, my_pid)
+        >>> await dev.transfer(b"data")
+        >>> await dev.set_gpio_mask(0x0F, 0x05)
+        >>> settings = await dev.get_setting('transfer_settings')
+    """
+
+    def __init__(self, device, name=None):
+        #print "aio.py:AsyncMCP2210:__init__"
+        """Constructor.
+
+        Arguments:
+          device: An open MCP2210. It must only be used through this object from now on.
+          name: Name for the device, used in statistics.
+        """
+        self.device = device
+        self.worker = DeviceWorker(name, device)
+
+    @classmethod
+    async def open(cls, *args, **kwargs):
+        #print "aio.py:AsyncMCP2210:open"
+        """Opens an MCP2210 without blocking the event loop.
+
+        Arguments are those of MCP2210.
+        """
+        device = await asyncio.get_running_loop().run_in_executor(None, lambda: MCP2210(*args, **kwargs))
+        return cls(device)
+
+    def call(self, fn, *args, **kwargs):
+        #print "aio.py:AsyncMCP2210:call"
+        """Runs fn(device, *args, **kwargs) on the device's I/O thread, returning an awaitable result."""
+        return asyncio.wrap_future(self.worker.submit(fn, *args, **kwargs))
+
+    def sendCommand(self, command):
+        #print "aio.py:AsyncMCP2210:sendCommand"
+        return self.call(MCP2210.sendCommand, command)
+
+    def transfer(self, data):
+        #print "aio.py:AsyncMCP2210:transfer"
+        return asyncio.wrap_future(self.worker.transfer(data))
+
+    def transfer_into(self, data, rx_buffer):
+        #print "aio.py:AsyncMCP2210:transfer_into"
+        return asyncio.wrap_future(self.worker.transfer_into(data, rx_buffer))
+
+    def cancel_transfer(self):
+        #print "aio.py:AsyncMCP2210:cancel_transfer"
+        return self.call(MCP2210.cancel_transfer)
+
+    def get_gpio(self):
+        #print "aio.py:AsyncMCP2210:get_gpio"
+        """Reads the current GPIO pin values from the device."""
+        return self.call(_read_gpio, 'gpio')
+
+    def set_gpio(self, value):
+        #print "aio.py:AsyncMCP2210:set_gpio"
+        return self.call(_write_gpio, 'gpio', value)
+
+    def set_gpio_mask(self, mask, value):
+        #print "aio.py:AsyncMCP2210:set_gpio_mask"
+        """Sets the GPIO pins selected by mask to the corresponding bits of value, in one command."""
+        return self.call(_write_gpio_mask, 'gpio', mask, value)
+
+    def get_gpio_direction(self):
+        #print "aio.py:AsyncMCP2210:get_gpio_direction"
+        return self.call(_read_gpio, 'gpio_direction')
+
+    def set_gpio_direction(self, value):
+        #print "aio.py:AsyncMCP2210:set_gpio_direction"
+        return self.call(_write_gpio, 'gpio_direction', value)
+
+    def get_setting(self, name):
+        #print "aio.py:AsyncMCP2210:get_setting"
+        """Reads a settings property of MCP2210, such as 'transfer_settings' or 'chip_settings'."""
+        return self.call(getattr, name)
+
+    def set_setting(self, name, value):
+        #print "aio.py:AsyncMCP2210:set_setting"
+        """Assigns a settings property of MCP2210, such as 'transfer_settings' or 'chip_settings'."""
+        return self.call(setattr, name, value)
+
+    async def close(self):
+        #print "aio.py:AsyncMCP2210:close"
+        """Waits for queued operations to finish, then closes the device."""
+        await asyncio.get_running_loop().run_in_executor(None, self.worker.close)
+
+
+def _read_gpio(device, name):
+    #print "aio.py:_read_gpio"
+    return getattr(device, name).read()
+
+
+def _write_gpio(device, name, value):
+    #print "aio.py:_write_gpio"
+    getattr(device, name).raw = value
+
+
+def _write_gpio_mask(device, name, mask, value):
+    #print "aio.py:_write_gpio_mask"
+    getattr(device, name).write_mask(mask, value)
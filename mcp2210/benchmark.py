@@ -0,0 +1,365 @@
+"""Benchmarks for the command, transfer, GPIO and EEPROM paths, run against the simulated adapter.
+
+Run it with:
+    python -m mcp2210.benchmark --latency 0.001 --output results.json
+
+Every figure is measured against a SimulatedMCP2210 with the given USB latency, so results depend only
+on the library, the interpreter and the machine, and can be compared across commits. Timings are the
+best of several repeats, which is the least noisy estimate of the cost of the code itself.
+
+The results are a JSON object with these keys:
+  environment: Python version, platform, git commit if known, and the options used.
+  commands: For each command class, the CPU time of sendCommand() - and of execute() where the class
+    has a precompiled encoder - with responses answered instantly so only the library is measured,
+    and the wall clock time of sendCommand() against the simulator.
+  transfers: For each payload size, the wall clock and CPU time of transfer(), its throughput in bytes
+    per second, and the number of reports it took.
+  gpio: Pin toggles per second, single pin writes and batched writes.
+  eeprom: Time to dump the whole EEPROM, uncached and through load().
+  startup: Time to the first transfer after constructing an MCP2210, with and without the fast
+    start options.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from mcp2210 import commands
+from mcp2210.device import MCP2210
+from mcp2210.simulator import SimulatedMCP2210
+from mcp2210.transport import Transport
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+try:
+    from time import process_time
+except ImportError:
+    from time import clock as process_time
+
+
+# Payload sizes for transfer benchmarks, from a single byte to several MB
+TRANSFER_SIZES = (1, 4, 16, 60, 256, 1024, 4096, 16384, 65535, 65536, 262144, 1 << 20, 4 << 20)
+
+
+def _command_samples(device):
+    #print "benchmark.py:_command_samples"
+    """Returns (command class, constructor arguments) for every command, with arguments that leave the
+    device as it was."""
+    return [
+        (commands.GetChipSettingsCommand, ()),
+        (commands.SetChipSettingsCommand, (device.chip_settings,)),
+        (commands.GetBootChipSettingsCommand, ()),
+        (commands.SetBootChipSettingsCommand, (device.boot_chip_settings,)),
+        (commands.GetSPISettingsCommand, ()),
+        (commands.SetSPISettingsCommand, (device.transfer_settings,)),
+        (commands.GetBootSPISettingsCommand, ()),
+        (commands.SetBootSPISettingsCommand, (device.boot_transfer_settings,)),
+        (commands.GetBootUSBSettingsCommand, ()),
+        (commands.SetBootUSBSettingsCommand, (device.boot_usb_settings,)),
+        (commands.GetUSBManufacturerCommand, ()),
+        (commands.SetUSBManufacturerCommand, (device.manufacturer_name,)),
+        (commands.GetUSBProductCommand, ()),
+        (commands.SetUSBProductCommand, (device.product_name,)),
+        (commands.SendPasswordCommand, (b'',)),
+        (commands.GetGPIOValueCommand, ()),
+        (commands.SetGPIOValueCommand, (device.gpio.read(),)),
+        (commands.GetGPIODirectionCommand, ()),
+        (commands.SetGPIODirectionCommand, (device.gpio_direction.read(),)),
+        (commands.ReadEEPROMCommand, (0,)),
+        (commands.WriteEEPROMCommand, (0, bytearray(device.eeprom[0])[0])),
+        (commands.SPITransferCommand, (b'',)),
+        (commands.CancelTransferCommand, ()),
+        (commands.GetChipStatusCommand, ()),
+        (commands.GetEventCounterCommand, ()),
+        (commands.ResetEventCounterCommand, ()),
+    ]
+
+
+class _CannedTransport(Transport):
+    #print "benchmark.py:_CannedTransport"
+    """Transport that answers each report at once with a fixed response for its command byte."""
+
+    def __init__(self, responses):
+        #print "benchmark.py:_CannedTransport:__init__"
+        """Constructor.
+
+        Arguments:
+          responses: Dict of command byte to 64-byte response. Other commands get a success response
+            with no data.
+        """
+        self.responses = responses
+        self._default = bytearray(64)
+        self._next = self._default
+
+    def write(self, report):
+        #print "benchmark.py:_CannedTransport:write"
+        command = bytearray(report[:1])[0]
+        self._next = self.responses.get(command)
+        if self._next is None:
+            self._default[0] = command
+            self._next = self._default
+
+    def read_into(self, report, timeout=None):
+        #print "benchmark.py:_CannedTransport:read_into"
+        report[:64] = self._next
+        return 64
+
+
+def _best(function, iterations, repeat, clock):
+    #print "benchmark.py:_best"
+    """Returns the least time per call, by clock, of repeat runs of iterations calls to function."""
+    best = None
+    for i in range(repeat):
+        start = clock()
+        for j in range(iterations):
+            function()
+        elapsed = (clock() - start) / iterations
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def benchmark_commands(latency=0.0, iterations=2000, repeat=5):
+    #print "benchmark.py:benchmark_commands"
+    """Measures the cost of sending each command class.
+
+    Returns:
+      A dict of command class name to a dict with the CPU seconds per sendCommand() as send_cpu, per
+      execute() as execute_cpu if the class has an encoder, and the wall clock seconds per sendCommand()
+      against the simulator as send_wall.
+    """
+    simulated = MCP2210(transport=SimulatedMCP2210(latency=latency))
+    samples = _command_samples(simulated)
+
+    # Record the simulator's response to each command, marked successful, to answer them instantly
+    responses = {}
+    for command, args in samples:
+        simulated.sendCommand(command(*args))
+        response = bytearray(simulated._input)
+        response[1] = commands.STATUS_SUCCESS
+        responses.setdefault(response[0], response)
+    canned = MCP2210(transport=_CannedTransport(responses))
+
+    # Keep each wall clock timing to a fraction of a second however high the latency
+    wall_iterations = min(max(int(0.2 / latency), 10), iterations) if latency else iterations
+    results = {}
+    for command, args in samples:
+        timings = {
+            'send_cpu': _best(lambda: canned.sendCommand(command(*args)), iterations, repeat, process_time),
+            'send_wall': _best(lambda: simulated.sendCommand(command(*args)), wall_iterations,
+                               repeat, monotonic),
+        }
+        encoder = commands.encoder_for(command)
+        encoded = bytearray(64)
+        encoder.encode_into(encoded, *args)
+        if encoded[:len(bytearray(command(*args)))] == bytearray(command(*args)):
+            timings['execute_cpu'] = _best(lambda: canned.execute(encoder, *args), iterations, repeat, process_time)
+        results[command.__name__] = timings
+    return results
+
+
+def benchmark_transfers(latency=0.0, max_size=4 << 20, repeat=3, bit_rate=12000000):
+    #print "benchmark.py:benchmark_transfers"
+    """Measures SPI throughput for payloads of each size in TRANSFER_SIZES up to max_size, at bit_rate
+    with no SPI delays.
+
+    Returns:
+      A dict of payload size, as a string, to a dict of wall clock seconds, CPU seconds, bytes per
+      second and reports per transfer.
+    """
+    transport = SimulatedMCP2210(latency=latency)
+    device = MCP2210(transport=transport)
+    # Fastest clock and no delays, so the bus is no slower than it has to be
+    settings = device.transfer_settings
+    settings.bit_rate = bit_rate
+    settings.cs_data_delay = settings.lb_cs_delay = settings.interbyte_delay = 0
+    device.transfer_settings = settings
+    device.transfer_into(bytearray(64), bytearray(64))
+    results = {}
+    for size in TRANSFER_SIZES:
+        if size > max_size:
+            break
+        data = bytearray(size)
+        rx = bytearray(size)
+        best = None
+        for i in range(repeat):
+            reports = transport.reports
+            cpu = process_time()
+            start = monotonic()
+            device.transfer_into(data, rx)
+            elapsed = monotonic() - start
+            cpu = process_time() - cpu
+            if best is None or elapsed < best['seconds']:
+                best = {'seconds': elapsed, 'cpu_seconds': cpu, 'bytes_per_second': size / elapsed,
+                        'reports': transport.reports - reports}
+        results[str(size)] = best
+    return results
+
+
+def benchmark_gpio(latency=0.0, iterations=1000, repeat=3):
+    #print "benchmark.py:benchmark_gpio"
+    """Measures GPIO write rates.
+
+    Returns:
+      A dict with toggles per second of one pin through gpio[pin], and writes per second of four pins
+      through write_mask() and through a batch().
+    """
+    device = MCP2210(transport=SimulatedMCP2210(latency=latency))
+    device.gpio_direction.raw = 0
+    gpio = device.gpio
+    state = [0]
+
+    def toggle():
+        #print "benchmark.py:benchmark_gpio:toggle"
+        state[0] ^= 1
+        gpio[0] = state[0]
+
+    def write_mask():
+        #print "benchmark.py:benchmark_gpio:write_mask"
+        state[0] ^= 0x0F
+        gpio.write_mask(0x0F, state[0])
+
+    def batch():
+        #print "benchmark.py:benchmark_gpio:batch"
+        state[0] ^= 1
+        with gpio.batch():
+            for pin in range(4):
+                gpio[pin] = state[0]
+
+    if latency:
+        iterations = min(iterations, max(int(0.5 / latency), 10))
+    return {
+        'toggles_per_second': 1.0 / _best(toggle, iterations, repeat, monotonic),
+        'write_mask_per_second': 1.0 / _best(write_mask, iterations, repeat, monotonic),
+        'batch_per_second': 1.0 / _best(batch, iterations, repeat, monotonic),
+    }
+
+
+def benchmark_eeprom(latency=0.0, repeat=3):
+    #print "benchmark.py:benchmark_eeprom"
+    """Measures the time to dump all 256 bytes of EEPROM.
+
+    Returns:
+      A dict with the seconds to read the whole EEPROM with a slice, uncached, and through load().
+    """
+    device = MCP2210(transport=SimulatedMCP2210(latency=latency))
+    eeprom = device.eeprom
+
+    def load():
+        #print "benchmark.py:benchmark_eeprom:load"
+        eeprom.load()
+        eeprom.invalidate()
+
+    return {
+        'dump_seconds': _best(lambda: eeprom[0:eeprom.SIZE], 1, repeat, monotonic),
+        'load_seconds': _best(load, 1, repeat, monotonic),
+    }
+
+
+def benchmark_startup(latency=0.0, repeat=3):
+    #print "benchmark.py:benchmark_startup"
+    """Measures the time from constructing an MCP2210 to the end of its first transfer.
+
+    A typical start - cancelling any transfer left running, then reading the chip and transfer
+    settings and GPIO directions - is compared with a fast one that skips the cancel and restores a
+    settings snapshot saved by the previous run.
+
+    Returns:
+      A dict with the seconds and reports each kind of start took, as default_ and fast_ values.
+    """
+    import shutil
+    import tempfile
+    from mcp2210.snapshot import SettingsSnapshot
+
+    transport = SimulatedMCP2210(latency=latency)
+    directory = tempfile.mkdtemp()
+    snapshots = SettingsSnapshot(directory)
+
+    def start(fast):
+        #print "benchmark.py:benchmark_startup:start"
+        reports = transport.reports
+        device = MCP2210(transport=transport, serial="benchmark", cancel=not fast)
+        if fast:
+            snapshots.restore(device)
+        device.chip_settings
+        device.gpio_direction.raw
+        device.transfer(b'\0' * 4)
+        snapshots.save(device)
+        return device.first_transfer_time, transport.reports - reports
+
+    results = {}
+    try:
+        for label, fast in (('default', False), ('fast', True)):
+            start(fast)
+            timings = [start(fast) for i in range(repeat)]
+            results[label + '_seconds'] = min(seconds for seconds, reports in timings)
+            results[label + '_reports'] = timings[0][1]
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+def _git_commit():
+    #print "benchmark.py:_git_commit"
+    try:
+        with open(os.devnull, 'w') as null:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=null,
+                                           cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(latency=0.0, max_size=4 << 20, iterations=2000, repeat=3, bit_rate=12000000):
+    #print "benchmark.py:run"
+    """Runs every benchmark, returning the results as a dict ready for JSON, as described above."""
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'commit': _git_commit(),
+            'time': time.time(),
+            'latency': latency,
+            'max_size': max_size,
+            'iterations': iterations,
+            'repeat': repeat,
+            'bit_rate': bit_rate,
+        },
+        'commands': benchmark_commands(latency, iterations, repeat),
+        'transfers': benchmark_transfers(latency, max_size, repeat, bit_rate),
+        'gpio': benchmark_gpio(latency, iterations // 2, repeat),
+        'eeprom': benchmark_eeprom(latency, repeat),
+        'startup': benchmark_startup(latency, repeat),
+    }
+
+
+def main(argv=None):
+    #print "benchmark.py:main"
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the MCP2210 library against a simulated adapter")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="Simulated USB latency in seconds per report; 0.001 models real hardware")
+    parser.add_argument('--max-size', type=int, default=4 << 20, help="Largest transfer to measure, in bytes")
+    parser.add_argument('--bit-rate', type=int, default=12000000, help="SPI clock for transfers, in Hz")
+    parser.add_argument('--iterations', type=int, default=2000, help="Calls per timing of each command")
+    parser.add_argument('--repeat', type=int, default=3, help="Timings taken of each benchmark; the best is kept")
+    parser.add_argument('--output', help="File to write the JSON results to, instead of standard output")
+    args = parser.parse_args(argv)
+
+    results = run(args.latency, args.max_size, args.iterations, args.repeat, args.bit_rate)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write("\n")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,363 @@
+from collections import deque
+import mmap
+import os
+import struct
+import time
+
+from mcp2210 import commands
+from mcp2210.trace import REQUEST, RESPONSE, REPORT_SIZE
+from mcp2210.transport import Transport
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+
+# A capture file starts with a header: magic, format version, record size, and the wall clock and
+# monotonic times when it was opened, so record timestamps can be related to the time of day.
+HEADER = struct.Struct('<8sHHdd')
+MAGIC = b'MCP2210C'
+VERSION = 1
+
+# Each record is a monotonic timestamp and a direction, followed by the 64-byte report
+RECORD = struct.Struct('<dB')
+RECORD_SIZE = RECORD.size + REPORT_SIZE
+
+
+class CaptureError(Exception):
+    #print "capture.py:CaptureError"
+    """Thrown when a capture file is malformed, or a replayed session diverges from the capture."""
+
+
+class CaptureWriter(object):
+    #print "capture.py:CaptureWriter"
+    """Appends timestamped reports to a compact binary capture file, rotating it as it grows.
+
+    Records are packed into a buffer allocated up front and written out a buffer at a time, so recording
+    costs a copy and a timestamp per report. It has the same record() method as trace.Tracer, so it can
+    be installed as a device's tracer, though RecordingTransport also captures the traffic sent while
+    the device is opened.
+
+    Once a file reaches max_bytes it's renamed with a suffix of .1, older files move up to .2 and so on,
+    the oldest beyond backup_count are deleted, and a new file is started - as logging's
+    RotatingFileHandler does.
+
+    Usage:
+        >>> dev.tracer = CaptureWriter("session.cap")
+        >>> dev.transfer(b"data")
+        >>> dev.tracer.close()
+        >>> analyze_latency(read_session("session.cap"))
+    """
+
+    def __init__(self, path, max_bytes=64 << 20, backup_count=4, buffer_records=1024):
+        #print "capture.py:CaptureWriter:__init__"
+        """Constructor.
+
+        Arguments:
+          path: Path of the capture file, which is overwritten.
+          max_bytes: Size at which the file is rotated, or 0 to never rotate.
+          backup_count: Number of rotated files to keep.
+          buffer_records: Number of records held in memory before they're written to the file.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.records = 0
+        self._buffer = bytearray(buffer_records * RECORD_SIZE)
+        self._capacity = buffer_records
+        self._used = 0
+        self._file = None
+        self._open()
+
+    def _open(self):
+        #print "capture.py:CaptureWriter:_open"
+        self._file = open(self.path, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, time.time(), monotonic()))
+        self._size = HEADER.size
+
+    def record(self, direction, report):
+        #print "capture.py:CaptureWriter:record"
+        """Records one report.
+
+        Arguments:
+          direction: trace.REQUEST or trace.RESPONSE.
+          report: The report, which is zero padded to 64 bytes.
+        """
+        offset = self._used * RECORD_SIZE
+        RECORD.pack_into(self._buffer, offset, monotonic(), direction)
+        offset += RECORD.size
+        length = len(report)
+        self._buffer[offset:offset + length] = report
+        if length < REPORT_SIZE:
+            self._buffer[offset + length:offset + REPORT_SIZE] = bytearray(REPORT_SIZE - length)
+        self._used += 1
+        self.records += 1
+        if self._used == self._capacity:
+            self.flush()
+
+    def flush(self):
+        #print "capture.py:CaptureWriter:flush"
+        """Writes buffered records to the file, rotating it if it has grown past max_bytes."""
+        if self._used:
+            size = self._used * RECORD_SIZE
+            self._file.write(memoryview(self._buffer)[:size])
+            self._size += size
+            self._used = 0
+        self._file.flush()
+        if self.max_bytes and self._size >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        #print "capture.py:CaptureWriter:_rotate"
+        self._file.close()
+        if self.backup_count:
+            for i in range(self.backup_count - 1, 0, -1):
+                source = "%s.%d" % (self.path, i)
+                if os.path.exists(source):
+                    os.rename(source, "%s.%d" % (self.path, i + 1))
+            os.rename(self.path, self.path + ".1")
+        self._open()
+
+    def close(self):
+        #print "capture.py:CaptureWriter:close"
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+class RecordingTransport(Transport):
+    #print "capture.py:RecordingTransport"
+    """Wraps another transport, recording every report written and read to a CaptureWriter.
+
+    Usage:
+        >>> dev = MCP2210(transport=RecordingTransport(HIDTransport(), CaptureWriter("session.cap")))
+    """
+
+    def __init__(self, transport, writer):
+        #print "capture.py:RecordingTransport:__init__"
+        self.transport = transport
+        self.writer = writer
+
+    def write(self, report):
+        #print "capture.py:RecordingTransport:write"
+        self.writer.record(REQUEST, report)
+        self.transport.write(report)
+
+    def read_into(self, report, timeout=None):
+        #print "capture.py:RecordingTransport:read_into"
+        length = self.transport.read_into(report, timeout)
+        if length:
+            self.writer.record(RESPONSE, memoryview(report)[:length])
+        return length
+
+    def close(self):
+        #print "capture.py:RecordingTransport:close"
+        self.transport.close()
+        self.writer.close()
+
+
+def read_capture(path):
+    #print "capture.py:read_capture"
+    """Reads a capture file through a memory map.
+
+    A record cut short by a crash at the end of the file is ignored.
+
+    Yields:
+      (timestamp, direction, report) tuples, as trace.Tracer does, so trace.format_trace() can render them.
+
+    Raises:
+      CaptureError if the file is not a capture file, including one too short to hold a header, such
+      as a capture whose writer has not flushed yet.
+    """
+    with open(path, 'rb') as f:
+        # mmap can't map an empty file
+        if os.fstat(f.fileno()).st_size < HEADER.size:
+            raise CaptureError("%s is too short to be a capture file" % path)
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, version, record_size = HEADER.unpack_from(data)[:3]
+        if magic != MAGIC or version != VERSION:
+            raise CaptureError("%s is not a version %d capture file" % (path, VERSION))
+        for offset in range(HEADER.size, len(data) - record_size + 1, record_size):
+            timestamp, direction = RECORD.unpack_from(data, offset)
+            yield timestamp, direction, data[offset + RECORD.size:offset + record_size]
+    finally:
+        data.close()
+
+
+def capture_files(path):
+    #print "capture.py:capture_files"
+    """Returns the paths of a capture file and its rotated predecessors, oldest first."""
+    paths = [path]
+    i = 1
+    while os.path.exists("%s.%d" % (path, i)):
+        paths.insert(0, "%s.%d" % (path, i))
+        i += 1
+    return paths
+
+
+def read_session(path):
+    #print "capture.py:read_session"
+    """Reads a capture file and its rotated predecessors in order, yielding records as read_capture does."""
+    for name in capture_files(path):
+        for record in read_capture(name):
+            yield record
+
+
+class ReplayTransport(Transport):
+    #print "capture.py:ReplayTransport"
+    """Transport that answers with the responses from a captured session, for reproducing it offline.
+
+    Each report written is matched against the next request in the capture, and the responses captured
+    after that request become readable. Reads never wait: where the capture shows no response, as when
+    a command timed out, the read returns nothing straight away. Replaying the same commands therefore
+    gives the same results every time, including timeouts and late responses.
+
+    Usage:
+        >>> dev = MCP2210(transport=ReplayTransport("session.cap"))
+        >>> dev.transfer(b"data")  # Returns what the slave returned when the session was captured
+    """
+
+    def __init__(self, path, strict=True):
+        #print "capture.py:ReplayTransport:__init__"
+        """Constructor.
+
+        Arguments:
+          path: Capture file to replay, along with its rotated predecessors. The capture should start
+            when the device was opened, as with RecordingTransport.
+          strict: If True, a CaptureError is raised when a report written differs from the captured
+            request, rather than replaying the captured response regardless.
+        """
+        self.strict = strict
+        self.requests = 0
+        self._records = read_session(path)
+        self._next = next(self._records, None)
+        self._responses = deque()
+
+    def write(self, report):
+        #print "capture.py:ReplayTransport:write"
+        while self._next is not None and self._next[1] != REQUEST:
+            self._next = next(self._records, None)
+        if self._next is None:
+            raise CaptureError("Capture ended before request %d" % (self.requests + 1))
+        captured = self._next[2]
+        report = bytes(bytearray(report))
+        if self.strict and report != captured[:len(report)]:
+            offset = next(i for i, (a, b) in enumerate(zip(bytearray(report), bytearray(captured))) if a != b)
+            raise CaptureError("Request %d (command 0x%.2x) differs from the capture at byte %d" % (
+                self.requests + 1, bytearray(report[:1])[0], offset))
+        self.requests += 1
+        self._next = next(self._records, None)
+        while self._next is not None and self._next[1] == RESPONSE:
+            self._responses.append(self._next[2])
+            self._next = next(self._records, None)
+
+    def read_into(self, report, timeout=None):
+        #print "capture.py:ReplayTransport:read_into"
+        if not self._responses:
+            return 0
+        data = self._responses.popleft()
+        report[:len(data)] = data
+        return len(data)
+
+
+def _command_classes():
+    #print "capture.py:_command_classes"
+    """Returns (name, class) pairs for the concrete command classes in commands."""
+    return [(name[:-len('Command')], value) for name, value in sorted(vars(commands).items())
+            if name.endswith('Command') and hasattr(value, 'COMMAND') and hasattr(value, 'RESPONSE')]
+
+
+def _subcommand_commands():
+    #print "capture.py:_subcommand_commands"
+    subcommands = {}
+    for name, value in _command_classes():
+        subcommands.setdefault(value.COMMAND, set()).add(getattr(value, 'SUBCOMMAND', None))
+    return frozenset(command for command, values in subcommands.items() if len(values - set([None])) > 1)
+
+
+# Command bytes whose second byte, the subcommand, selects between several command classes
+SUBCOMMAND_COMMANDS = _subcommand_commands()
+
+
+def command_key(command, subcommand):
+    #print "capture.py:command_key"
+    """Returns the key identifying the command class of a request from its first two bytes.
+
+    The key is (command byte, subcommand byte) for commands in SUBCOMMAND_COMMANDS, such as the boot
+    settings commands, and (command byte, None) for the rest, whose second byte is a parameter.
+    """
+    return (command, subcommand if command in SUBCOMMAND_COMMANDS else None)
+
+
+def _command_names():
+    #print "capture.py:_command_names"
+    names = {}
+    for name, value in _command_classes():
+        subcommand = getattr(value, 'SUBCOMMAND', None)
+        # Abstract bases such as SetBootSettingsCommand have no subcommand of their own
+        if value.COMMAND in SUBCOMMAND_COMMANDS and subcommand is None:
+            continue
+        names[command_key(value.COMMAND, subcommand)] = name
+    return names
+
+
+# Command names by command_key(), for reports
+COMMAND_NAMES = _command_names()
+
+
+def command_name(key):
+    #print "capture.py:command_name"
+    """Returns the name of the command class with a command_key(), or its bytes in hex if unknown."""
+    name = COMMAND_NAMES.get(key)
+    if name is None:
+        command, subcommand = key
+        name = '0x%.2x' % command if subcommand is None else '0x%.2x/0x%.2x' % (command, subcommand)
+    return name
+
+
+def _percentile(ordered, fraction):
+    #print "capture.py:_percentile"
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def analyze_latency(records):
+    #print "capture.py:analyze_latency"
+    """Reports the latency distribution of each command type in a capture.
+
+    Commands are told apart by command_key(), so each boot settings command is reported separately.
+    Latency is the time from a request to the next response echoing its command byte. Requests with no
+    such response before the next request, such as those that timed out, are counted as unanswered.
+
+    Arguments:
+      records: (timestamp, direction, report) tuples, as from read_session() or a trace.Tracer.
+
+    Returns:
+      A dict of command name (or hex bytes, for unknown commands) to a dict with the number of
+      requests, unanswered requests, and the mean, minimum, median, 90th and 99th percentile and
+      maximum latency in seconds.
+    """
+    latencies = {}
+    requests = {}
+    pending = None
+    for timestamp, direction, report in records:
+        command, subcommand = bytearray(report[:2])
+        if direction == REQUEST:
+            key = command_key(command, subcommand)
+            pending = (timestamp, key)
+            requests[key] = requests.get(key, 0) + 1
+        elif pending is not None and command == pending[1][0]:
+            latencies.setdefault(pending[1], []).append(timestamp - pending[0])
+            pending = None
+
+    result = {}
+    for key, count in requests.items():
+        ordered = sorted(latencies.get(key, []))
+        stats = {'requests': count, 'unanswered': count - len(ordered)}
+        if ordered:
+            stats.update(mean=sum(ordered) / len(ordered), min=ordered[0], median=_percentile(ordered, 0.5),
+                         p90=_percentile(ordered, 0.9), p99=_percentile(ordered, 0.99), max=ordered[-1])
+        result[command_name(key)] = stats
+    return result
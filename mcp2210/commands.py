@@ -1,4 +1,5 @@
-from ctypes import Structure, c_ubyte, c_ushort, c_uint, c_char
+from ctypes import Structure, c_ubyte, c_ushort, c_uint, c_char, addressof, string_at
+import struct
 
 
 class CommandHeader(Structure):
@@ -43,6 +44,7 @@ class SetBootSettingsCommand(Command):
 
 class ChipSettings(Structure):
     #print "commands.py:ChipSettings"
+    _pack_ = 1
     _fields_ = [('pin_designations', c_ubyte * 9),
                 ('gpio_outputs', c_ushort),
                 ('gpio_directions', c_ushort),
@@ -54,6 +56,7 @@ class ChipSettings(Structure):
 class SetBootChipSettingsCommand(SetBootSettingsCommand):
     #print "commands.py:SetBootChipSettingsCommand"
     SUBCOMMAND = 0x20
+    FIELDS = ('settings',)
     _fields_ = [('header', CommandHeader),
                 ('settings', ChipSettings)]
 
@@ -73,6 +76,7 @@ class SPISettings(Structure):
 class SetBootSPISettingsCommand(SetBootSettingsCommand):
     #print "commands.py:SetBoot:SPISettingsCommand"
     SUBCOMMAND = 0x10
+    FIELDS = ('settings',)
     _fields_ = [('header', CommandHeader),
                 ('settings', SPISettings)]
 
@@ -88,6 +92,7 @@ class USBSettings(Structure):
 class SetBootUSBSettingsCommand(SetBootSettingsCommand):
     #print "commands.py:SetBootUSBSettingsCommand"
     SUBCOMMAND = 0x30
+    FIELDS = ('settings',)
     _fields_ = [('header', CommandHeader),
                 ('settings', USBSettings)]
 
@@ -108,14 +113,14 @@ class SetUSBStringCommand(SetBootSettingsCommand):
     @property
     def string(self):
         #print "commands.py:SetUSBStringCommand:string(@property)"
-        return ''.join(chr(x) for x in self.str[:self.str_len - 2]).decode('utf16')
+        return bytes(bytearray(self.str[:self.str_len - 2])).decode('utf-16-le')
 
     @string.setter
     def string(self, value):
         #print "commands.py:SetUSBStringCommand:string(@string.setter)"
-        for i, x in enumerate((value + '\0').encode('utf16')):
-            self.str[i] = ord(x)
-        self.str_len = len(value) * 2 + 4
+        data = bytearray(value.encode('utf-16-le'))
+        self.str[:len(data)] = data
+        self.str_len = len(data) + 2
 
 
 class SetUSBManufacturerCommand(SetUSBStringCommand):
@@ -196,7 +201,7 @@ class GetUSBStringResponse(Response):
     @property
     def string(self):
         #print "commands.py:GetUSBStringResponse:string(@property)"
-        return ''.join(chr(x) for x in self.str[:self.str_len - 2]).decode('utf16')
+        return bytes(bytearray(self.str[:self.str_len - 2])).decode('utf-16-le')
 
 
 class GetUSBProductCommand(GetBootSettingsCommand):
@@ -232,6 +237,7 @@ class GetSPISettingsCommand(Command):
 
 class SetSPISettingsCommand(Command):
     #print "commands.py:SetSPISettingsCommand"
+    FIELDS = ('settings',)
     COMMAND = 0x40
     SUBCOMMAND = 0x00
     RESPONSE = EmptyResponse
@@ -249,6 +255,7 @@ class GetChipSettingsCommand(Command):
 
 class SetChipSettingsCommand(Command):
     #print "commands.py:SetChipSettingsCommand"
+    FIELDS = ('settings',)
     COMMAND = 0x21
     SUBCOMMAND = 0x00
     RESPONSE = EmptyResponse
@@ -279,6 +286,7 @@ class SetGPIOCommand(Command):
     #print "commands.py:SetGPIOCommand"
     SUBCOMMAND = 0x00
     RESPONSE = EmptyResponse
+    FIELDS = ('gpio',)
     _fields_ = [('header', CommandHeader),
                 ('gpio', c_ushort)]
 
@@ -310,6 +318,7 @@ class ReadEEPROMCommand(Structure):
     #print "commands.py:ReadEEPROMCommand"
     COMMAND = 0x50
     RESPONSE = ReadEEPROMResponse
+    FIELDS = ('address',)
     _fields_ = [('command', c_ubyte),
                 ('address', c_ubyte),
                 ('reserved', c_ubyte)]
@@ -323,6 +332,7 @@ class WriteEEPROMCommand(Structure):
     #print "commands.py:WriteEEPROMCommand"
     COMMAND = 0x51
     RESPONSE = EmptyResponse
+    FIELDS = ('address', 'value')
     _fields_ = [('command', c_ubyte),
                 ('address', c_ubyte),
                 ('value', c_ubyte)]
@@ -332,8 +342,43 @@ class WriteEEPROMCommand(Structure):
         super(WriteEEPROMCommand, self).__init__(self.COMMAND, address, value)
 
 
+# Status codes the chip returns in the second byte of every response
+STATUS_SUCCESS = 0x00
+STATUS_BUS_UNAVAILABLE = 0xF7
+STATUS_BUSY = 0xF8
+STATUS_UNKNOWN_COMMAND = 0xF9
+STATUS_WRITE_FAILED = 0xFA
+STATUS_BLOCKED = 0xFB
+STATUS_REJECTED = 0xFC
+STATUS_DENIED = 0xFD
+
+# Descriptions of each status code, from the datasheet
+STATUS_MESSAGES = {
+    STATUS_SUCCESS: "Command completed successfully",
+    STATUS_BUS_UNAVAILABLE: "SPI bus not available; an external master owns it",
+    STATUS_BUSY: "Transfer in progress; command not carried out",
+    STATUS_UNKNOWN_COMMAND: "Command not recognized",
+    STATUS_WRITE_FAILED: "EEPROM write failed",
+    STATUS_BLOCKED: "Access blocked; settings are password protected or locked",
+    STATUS_REJECTED: "Access rejected; too many failed password attempts",
+    STATUS_DENIED: "Access denied; wrong password",
+}
+
+# Status codes that report a temporary condition, so the command may succeed if sent again
+BUSY_STATUSES = frozenset([STATUS_BUS_UNAVAILABLE, STATUS_BUSY])
+
 SPIBuffer = c_ubyte * 60
 
+# Status codes returned in the second byte of an SPI transfer response
+SPI_STATUS_SUCCESS = STATUS_SUCCESS
+SPI_STATUS_BUS_UNAVAILABLE = STATUS_BUS_UNAVAILABLE
+SPI_STATUS_IN_PROGRESS = STATUS_BUSY
+
+# SPI engine states returned in the fourth byte of an SPI transfer response
+SPI_ENGINE_FINISHED = 0x10
+SPI_ENGINE_STARTED = 0x20
+SPI_ENGINE_DATA_PENDING = 0x30
+
 
 class SPITransferResponse(Structure):
     #print "commands.py:SPITransferResponse"
@@ -346,7 +391,7 @@ class SPITransferResponse(Structure):
     @property
     def data(self):
         #print "commands.py:SPITransferResponse:data(@property)"
-        return ''.join(chr(x) for x in self._data[:self.length])
+        return string_at(addressof(self._data), self.length)
 
 
 class SPITransferCommand(Structure):
@@ -360,8 +405,9 @@ class SPITransferCommand(Structure):
 
     def __init__(self, data):
         #print "commands.py:SPITransferCommand:__init__"
-        data = SPIBuffer(*(ord(x) for x in data))
-        super(SPITransferCommand, self).__init__(self.COMMAND, len(data), 0x0000, data)
+        data = bytearray(data)
+        super(SPITransferCommand, self).__init__(self.COMMAND, len(data), 0x0000)
+        self.data[:len(data)] = data
 
 
 class DeviceStatusResponse(Response):
@@ -380,3 +426,110 @@ class CancelTransferCommand(Command):
     SUBCOMMAND = 0x00
     RESPONSE = DeviceStatusResponse
     _fields_ = [('header', CommandHeader)]
+
+
+class GetChipStatusCommand(Command):
+    #print "commands.py:GetChipStatusCommand"
+    COMMAND = 0x10
+    SUBCOMMAND = 0x00
+    RESPONSE = DeviceStatusResponse
+    _fields_ = [('header', CommandHeader)]
+
+
+# SPI bus owners reported in DeviceStatusResponse.bus_owner
+BUS_OWNER_NONE = 0x00
+BUS_OWNER_USB = 0x01
+BUS_OWNER_EXTERNAL = 0x02
+
+# Pin functions in ChipSettings.pin_designations
+PIN_GPIO = 0x00
+PIN_CHIP_SELECT = 0x01
+PIN_DEDICATED = 0x02
+
+# GP6 interrupt counting modes, in bits 1-3 of ChipSettings.other_settings
+EVENT_COUNT_NONE = 0x00
+EVENT_COUNT_FALLING_EDGES = 0x01
+EVENT_COUNT_RISING_EDGES = 0x02
+EVENT_COUNT_LOW_PULSES = 0x03
+EVENT_COUNT_HIGH_PULSES = 0x04
+
+
+class GetEventCounterResponse(Response):
+    #print "commands.py:GetEventCounterResponse"
+    _anonymous_ = ['header']
+    _fields_ = [('header', ResponseHeader),
+                ('count', c_ushort)]
+
+
+class GetEventCounterCommand(Command):
+    #print "commands.py:GetEventCounterCommand"
+    COMMAND = 0x12
+    # Bit 0 set reads the counter without resetting it
+    SUBCOMMAND = 0x01
+    RESPONSE = GetEventCounterResponse
+    _fields_ = [('header', CommandHeader)]
+
+
+class ResetEventCounterCommand(GetEventCounterCommand):
+    #print "commands.py:ResetEventCounterCommand"
+    """Reads the interrupt event counter and resets it to zero."""
+    SUBCOMMAND = 0x00
+
+
+REPORT_SIZE = 64
+
+_PACKERS = {c_ubyte: struct.Struct('<B'), c_ushort: struct.Struct('<H'), c_uint: struct.Struct('<I')}
+
+
+class CommandEncoder(object):
+    #print "commands.py:CommandEncoder"
+    """Encodes one command class into 64-byte reports from a precompiled template.
+
+    The template holds the command's constant bytes. Encoding copies it into the output report and
+    patches the per-call fields, named by the class's FIELDS, in place with precompiled struct packers,
+    so no ctypes command object is constructed. Responses are decoded with from_buffer as views over the
+    input report, so they are only valid until the next report is read into it.
+    """
+
+    def __init__(self, command):
+        #print "commands.py:CommandEncoder:__init__"
+        self.command = command
+        self.response = command.RESPONSE
+        self.template = bytearray(REPORT_SIZE)
+        view = command.from_buffer(self.template)
+        if 'header' in dict(command._fields_):
+            view.header.command = command.COMMAND
+            view.header.subcommand = command.SUBCOMMAND
+        else:
+            view.command = command.COMMAND
+        del view
+        types = dict(command._fields_)
+        self._fields = [(getattr(command, name).offset, getattr(command, name).size, _PACKERS.get(types[name]))
+                        for name in getattr(command, 'FIELDS', ())]
+
+    def encode_into(self, report, *values):
+        #print "commands.py:CommandEncoder:encode_into"
+        """Writes the command into report, a 64-byte bytearray, with values for each of its FIELDS."""
+        report[:] = self.template
+        for (offset, size, packer), value in zip(self._fields, values):
+            if packer is None:
+                report[offset:offset + size] = bytearray(value)
+            else:
+                packer.pack_into(report, offset, value)
+
+    def decode(self, report):
+        #print "commands.py:CommandEncoder:decode"
+        """Returns the response in report as a RESPONSE view over it, without copying."""
+        return self.response.from_buffer(report)
+
+
+_encoders = {}
+
+
+def encoder_for(command):
+    #print "commands.py:encoder_for"
+    """Returns the CommandEncoder for a command class, compiling it on first use."""
+    try:
+        return _encoders[command]
+    except KeyError:
+        return _encoders.setdefault(command, CommandEncoder(command))
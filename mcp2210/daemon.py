@@ -0,0 +1,791 @@
+"""Local daemon that owns MCP2210 adapters and serves many client processes over a Unix socket.
+
+hidapi lets only one process open an adapter. The daemon opens each adapter once and runs requests from
+any number of RemoteMCP2210 clients on it, one at a time, so clients neither fight over the device nor
+pay for opening it.
+
+Run it with:
+    python -m mcp2210.daemon /tmp/mcp2210.sock
+
+and connect with:
+    >>> dev = RemoteMCP2210("/tmp/mcp2210.sock")
+    >>> dev.transfer(b"data")
+
+The protocol is a stream of binary frames. A request is a header packed as REQUEST_HEADER - request ID,
+opcode, timeout in seconds (0 for none) and payload length - followed by the payload; each reply is a
+RESPONSE_HEADER - request ID, result code and payload length - followed by the payload. Requests on one
+connection are answered in order.
+"""
+from collections import deque
+from contextlib import contextmanager
+from ctypes import Structure, c_ubyte, sizeof
+import os
+import socket
+import struct
+import sys
+import threading
+
+from mcp2210 import commands
+from mcp2210.device import MCP2210, CommandException, DeadlineExceeded
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+
+DEFAULT_SOCKET = "/tmp/mcp2210.sock"
+
+REQUEST_HEADER = struct.Struct('<IBdI')
+RESPONSE_HEADER = struct.Struct('<IBI')
+
+# Request opcodes
+OP_SELECT = 0x01
+OP_COMMAND = 0x02
+OP_TRANSFER = 0x03
+OP_CANCEL_TRANSFER = 0x04
+OP_GET_GPIO = 0x10
+OP_SET_GPIO = 0x11
+OP_GET_GPIO_DIRECTION = 0x12
+OP_SET_GPIO_DIRECTION = 0x13
+OP_READ_EEPROM = 0x20
+OP_WRITE_EEPROM = 0x21
+OP_GET_SETTING = 0x30
+OP_SET_SETTING = 0x31
+
+# Result codes
+RESULT_OK = 0x00
+RESULT_COMMAND_ERROR = 0x01
+RESULT_DEADLINE_EXCEEDED = 0x02
+RESULT_ERROR = 0x03
+
+# Settings served by OP_GET_SETTING and OP_SET_SETTING, by index, with their types
+SETTINGS = (
+    ('chip_settings', commands.ChipSettings),
+    ('boot_chip_settings', commands.ChipSettings),
+    ('transfer_settings', commands.SPISettings),
+    ('boot_transfer_settings', commands.SPISettings),
+    ('boot_usb_settings', commands.USBSettings),
+    ('manufacturer_name', None),
+    ('product_name', None),
+)
+SETTING_INDEXES = dict((name, i) for i, (name, kind) in enumerate(SETTINGS))
+
+# Requests that only read device state, so identical ones queued together can share one answer
+READ_OPS = frozenset([OP_GET_GPIO, OP_GET_GPIO_DIRECTION, OP_READ_EEPROM, OP_GET_SETTING])
+
+MASK = struct.Struct('<HH')
+EEPROM_RANGE = struct.Struct('<BH')
+
+
+class DaemonError(Exception):
+    #print "daemon.py:DaemonError"
+    """Thrown by a client when the daemon fails a request for a reason other than the device's status."""
+
+
+class _RawReport(Structure):
+    #print "daemon.py:_RawReport"
+    _fields_ = [('data', c_ubyte * 64)]
+
+_RawReport.RESPONSE = _RawReport
+
+
+def _recv_exact(sock, buffer):
+    #print "daemon.py:_recv_exact"
+    """Fills buffer from sock, returning False if the connection closes first."""
+    view = memoryview(buffer)
+    while len(view):
+        received = sock.recv_into(view)
+        if not received:
+            return False
+        view = view[received:]
+    return True
+
+
+def _encode_setting(value):
+    #print "daemon.py:_encode_setting"
+    if isinstance(value, Structure):
+        return bytes(bytearray(value))
+    return value.encode('utf-8')
+
+
+def _decode_setting(kind, data):
+    #print "daemon.py:_decode_setting"
+    if kind is None:
+        return data.decode('utf-8')
+    return kind.from_buffer_copy(data)
+
+
+class _Connection(object):
+    #print "daemon.py:_Connection"
+    def __init__(self, sock):
+        #print "daemon.py:_Connection:__init__"
+        self.sock = sock
+        self.adapter = None
+        self._lock = threading.Lock()
+
+    def reply(self, request_id, result, payload=b''):
+        #print "daemon.py:_Connection:reply"
+        with self._lock:
+            try:
+                self.sock.sendall(RESPONSE_HEADER.pack(request_id, result, len(payload)) + payload)
+            except socket.error:
+                pass
+
+
+class AdapterServer(object):
+    #print "daemon.py:AdapterServer"
+    """Runs the requests queued by all clients of one adapter on a dedicated thread.
+
+    Whenever the thread is free it takes every request queued since, and coalesces them before touching
+    the device: identical reads with no write between them are answered by one command, and runs of
+    GPIO writes to the same register are merged into one write of the final value.
+    """
+
+    def __init__(self, name, device):
+        #print "daemon.py:AdapterServer:__init__"
+        """Constructor.
+
+        Arguments:
+          name: Name clients select the adapter by, normally its USB serial number.
+          device: The open MCP2210.
+        """
+        self.name = name
+        self.device = device
+        self.requests = 0
+        self.commands_saved = 0
+        self._queue = deque()
+        self._ready = threading.Condition()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="mcp2210-daemon-%s" % name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, connection, request_id, opcode, timeout, payload):
+        #print "daemon.py:AdapterServer:submit"
+        with self._ready:
+            self._queue.append((connection, request_id, opcode, timeout, payload))
+            self._ready.notify()
+
+    def close(self):
+        #print "daemon.py:AdapterServer:close"
+        with self._ready:
+            self._running = False
+            self._ready.notify()
+        self._thread.join()
+        self.device.transport.close()
+
+    def _run(self):
+        #print "daemon.py:AdapterServer:_run"
+        while True:
+            with self._ready:
+                while self._running and not self._queue:
+                    self._ready.wait()
+                if not self._running:
+                    return
+                batch = list(self._queue)
+                self._queue.clear()
+            self.requests += len(batch)
+            self._execute_batch(batch)
+
+    def _execute_batch(self, batch):
+        #print "daemon.py:AdapterServer:_execute_batch"
+        answers = {}
+        i = 0
+        while i < len(batch):
+            connection, request_id, opcode, timeout, payload = batch[i]
+            if opcode in (OP_SET_GPIO, OP_SET_GPIO_DIRECTION):
+                j = i + 1
+                while j < len(batch) and batch[j][2] == opcode:
+                    j += 1
+                self._write_gpio(batch[i:j])
+                answers.clear()
+                i = j
+                continue
+
+            key = (opcode, payload)
+            if opcode in READ_OPS and key in answers:
+                self.commands_saved += 1
+                result, data = answers[key]
+            else:
+                result, data = self._execute(opcode, timeout, payload)
+                if opcode in READ_OPS:
+                    answers[key] = (result, data)
+                else:
+                    answers.clear()
+            connection.reply(request_id, result, data)
+            i += 1
+
+    def _write_gpio(self, run):
+        #print "daemon.py:AdapterServer:_write_gpio"
+        """Applies a run of GPIO register writes as a single write of the final value.
+
+        The write runs within the shortest timeout of any request in the run, so none waits longer than
+        it asked to.
+        """
+        timeouts = [timeout for connection, request_id, opcode, timeout, payload in run if timeout]
+        def write():
+            settings = self.device.gpio if run[0][2] == OP_SET_GPIO else self.device.gpio_direction
+            value = settings.raw
+            for connection, request_id, opcode, timeout, payload in run:
+                mask, bits = MASK.unpack(payload)
+                value = (value & ~mask) | (bits & mask)
+            settings.raw = value
+        result, data = self._call(min(timeouts) if timeouts else 0, write)
+        self.commands_saved += len(run) - 1
+        for connection, request_id, opcode, timeout, payload in run:
+            connection.reply(request_id, result, data)
+
+    def _call(self, timeout, fn, *args):
+        #print "daemon.py:AdapterServer:_call"
+        """Calls fn(*args) within timeout seconds, returning a result code and reply payload."""
+        try:
+            if timeout:
+                with self.device.time_limit(timeout):
+                    return RESULT_OK, fn(*args) or b''
+            return RESULT_OK, fn(*args) or b''
+        except CommandException as e:
+            return RESULT_COMMAND_ERROR, bytes(bytearray([e.code]))
+        except DeadlineExceeded as e:
+            return RESULT_DEADLINE_EXCEEDED, str(e).encode('utf-8')
+        except Exception as e:
+            return RESULT_ERROR, ("%s: %s" % (type(e).__name__, e)).encode('utf-8')
+
+    def _execute(self, opcode, timeout, payload):
+        #print "daemon.py:AdapterServer:_execute"
+        handler = self._HANDLERS.get(opcode)
+        if handler is None:
+            return RESULT_ERROR, ("Unknown opcode 0x%.2x" % opcode).encode('utf-8')
+        return self._call(timeout, handler, self, payload)
+
+    def _command(self, payload):
+        #print "daemon.py:AdapterServer:_command"
+        response = self.device.sendCommand(_RawReport.from_buffer_copy(payload))
+        # The command may have changed anything behind the device's caches
+        self.device.invalidate_settings()
+        self.device.gpio.invalidate()
+        self.device.gpio_direction.invalidate()
+        return bytes(bytearray(response))
+
+    def _transfer(self, payload):
+        #print "daemon.py:AdapterServer:_transfer"
+        data = memoryview(payload)
+        if payload[:1] == b'\x01':
+            settings = commands.SPISettings.from_buffer_copy(payload, 1)
+            data = data[1 + sizeof(settings):]
+            # The transaction size goes in the same command as the client's settings
+            settings.spi_tx_size = min(len(data), self.device.MAX_TRANSACTION_SIZE)
+            self.device.transfer_settings = settings
+        else:
+            data = data[1:]
+        return self.device.transfer(data)
+
+    def _cancel_transfer(self, payload):
+        #print "daemon.py:AdapterServer:_cancel_transfer"
+        self.device.cancel_transfer()
+
+    def _get_gpio(self, payload):
+        #print "daemon.py:AdapterServer:_get_gpio"
+        return struct.pack('<H', self.device.gpio.read())
+
+    def _get_gpio_direction(self, payload):
+        #print "daemon.py:AdapterServer:_get_gpio_direction"
+        return struct.pack('<H', self.device.gpio_direction.read())
+
+    def _read_eeprom(self, payload):
+        #print "daemon.py:AdapterServer:_read_eeprom"
+        address, length = EEPROM_RANGE.unpack(payload)
+        return self.device.eeprom[address:address + length]
+
+    def _write_eeprom(self, payload):
+        #print "daemon.py:AdapterServer:_write_eeprom"
+        address = bytearray(payload[:1])[0]
+        data = payload[1:]
+        self.device.eeprom[address:address + len(data)] = bytearray(data)
+        if self.device.eeprom.cached:
+            self.device.eeprom.commit()
+
+    def _get_setting(self, payload):
+        #print "daemon.py:AdapterServer:_get_setting"
+        return _encode_setting(getattr(self.device, SETTINGS[bytearray(payload)[0]][0]))
+
+    def _set_setting(self, payload):
+        #print "daemon.py:AdapterServer:_set_setting"
+        name, kind = SETTINGS[bytearray(payload[:1])[0]]
+        setattr(self.device, name, _decode_setting(kind, payload[1:]))
+
+    _HANDLERS = {
+        OP_COMMAND: _command,
+        OP_TRANSFER: _transfer,
+        OP_CANCEL_TRANSFER: _cancel_transfer,
+        OP_GET_GPIO: _get_gpio,
+        OP_GET_GPIO_DIRECTION: _get_gpio_direction,
+        OP_READ_EEPROM: _read_eeprom,
+        OP_WRITE_EEPROM: _write_eeprom,
+        OP_GET_SETTING: _get_setting,
+        OP_SET_SETTING: _set_setting,
+    }
+
+
+class MCP2210Daemon(object):
+    #print "daemon.py:MCP2210Daemon"
+    """Serves requests for a set of open adapters on a Unix socket.
+
+    Usage:
+        >>> daemon = MCP2210Daemon("/tmp/mcp2210.sock", {"sim": MCP2210(transport=SimulatedMCP2210())})
+        >>> daemon.start()
+        >>> RemoteMCP2210("/tmp/mcp2210.sock").transfer(b"data")
+        >>> daemon.stats()
+        >>> daemon.close()
+    """
+
+    def __init__(self, path, devices):
+        #print "daemon.py:MCP2210Daemon:__init__"
+        """Constructor.
+
+        Arguments:
+          path: Path of the Unix socket to listen on; a stale socket file there is replaced.
+          devices: Dict of name to open MCP2210. Clients that don't select one get the first by name.
+        """
+        self.path = path
+        self.adapters = dict((name, AdapterServer(name, device)) for name, device in devices.items())
+        self._default = self.adapters[sorted(self.adapters)[0]] if self.adapters else None
+        if os.path.exists(path):
+            os.unlink(path)
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(path)
+        self._listener.listen(16)
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        #print "daemon.py:MCP2210Daemon:start"
+        """Starts accepting clients on a background thread."""
+        self._running = True
+        self._thread = threading.Thread(target=self.serve_forever, name="mcp2210-daemon")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def serve_forever(self):
+        #print "daemon.py:MCP2210Daemon:serve_forever"
+        """Accepts clients until close(), each served by a thread of its own."""
+        self._running = True
+        while self._running:
+            try:
+                sock, address = self._listener.accept()
+            except socket.error:
+                break
+            thread = threading.Thread(target=self._serve_client, args=(sock,), name="mcp2210-daemon-client")
+            thread.daemon = True
+            thread.start()
+
+    def _serve_client(self, sock):
+        #print "daemon.py:MCP2210Daemon:_serve_client"
+        connection = _Connection(sock)
+        connection.adapter = self._default
+        header = bytearray(REQUEST_HEADER.size)
+        try:
+            while _recv_exact(sock, header):
+                request_id, opcode, timeout, length = REQUEST_HEADER.unpack_from(header)
+                payload = bytearray(length)
+                if not _recv_exact(sock, payload):
+                    break
+                payload = bytes(payload)
+                if opcode == OP_SELECT:
+                    connection.adapter = self.adapters.get(payload.decode('utf-8'))
+                    if connection.adapter is None:
+                        connection.reply(request_id, RESULT_ERROR, b"No such adapter: " + payload)
+                    else:
+                        connection.reply(request_id, RESULT_OK)
+                elif connection.adapter is None:
+                    connection.reply(request_id, RESULT_ERROR, b"No adapter selected")
+                else:
+                    connection.adapter.submit(connection, request_id, opcode, timeout, payload)
+        finally:
+            sock.close()
+
+    def stats(self):
+        #print "daemon.py:MCP2210Daemon:stats"
+        """Returns a dict of adapter name to the number of requests served and device commands saved by
+        coalescing them."""
+        return dict((name, {'requests': adapter.requests, 'commands_saved': adapter.commands_saved})
+                    for name, adapter in self.adapters.items())
+
+    def close(self):
+        #print "daemon.py:MCP2210Daemon:close"
+        """Stops accepting clients, then closes every adapter once its queued requests are done."""
+        self._running = False
+        try:
+            self._listener.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self._listener.close()
+        if self._thread is not None:
+            self._thread.join()
+        for adapter in self.adapters.values():
+            adapter.close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def remote_setting(name, doc=None):
+    #print "daemon.py:remote_setting"
+    """Property for a device setting read and written through the daemon, which caches it."""
+    index = SETTING_INDEXES[name]
+    kind = SETTINGS[index][1]
+
+    def getter(self):
+        #print "daemon.py:remote_setting:getter"
+        return _decode_setting(kind, self._request(OP_GET_SETTING, bytearray([index])))
+
+    def setter(self, value):
+        #print "daemon.py:remote_setting:setter"
+        self._request(OP_SET_SETTING, bytes(bytearray([index])) + _encode_setting(value))
+
+    return property(getter, setter, doc=doc)
+
+
+class RemoteGPIO(object):
+    #print "daemon.py:RemoteGPIO"
+    """GPIO register of an adapter behind the daemon, with the interface of device.GPIOSettings.
+
+    Every read fetches the register, and every write outside a batch is sent straight away.
+    """
+
+    def __init__(self, client, get_op, set_op):
+        #print "daemon.py:RemoteGPIO:__init__"
+        self._client = client
+        self._get_op = get_op
+        self._set_op = set_op
+        self._batch_depth = 0
+        self._mask = 0
+        self._bits = 0
+
+    def read(self):
+        #print "daemon.py:RemoteGPIO:read"
+        value = struct.unpack('<H', self._client._request(self._get_op))[0]
+        return (value & ~self._mask) | self._bits
+
+    @property
+    def raw(self):
+        #print "daemon.py:RemoteGPIO:raw(@property)"
+        return self.read()
+
+    @raw.setter
+    def raw(self, value):
+        #print "daemon.py:RemoteGPIO:raw(@raw.setter)"
+        self.write_mask(0xFFFF, value)
+
+    def invalidate(self):
+        #print "daemon.py:RemoteGPIO:invalidate"
+        self._mask = 0
+        self._bits = 0
+
+    def write_mask(self, mask, value):
+        #print "daemon.py:RemoteGPIO:write_mask"
+        """Sets the pins selected by mask to the corresponding bits in value, in one request."""
+        if self._batch_depth:
+            self._mask |= mask
+            self._bits = (self._bits & ~mask) | (value & mask)
+        else:
+            self._client._request(self._set_op, MASK.pack(mask, value & mask))
+
+    @contextmanager
+    def batch(self):
+        #print "daemon.py:RemoteGPIO:batch"
+        """Context manager that collects pin changes and sends them in one request on exit."""
+        self._batch_depth += 1
+        completed = False
+        try:
+            yield self
+            completed = True
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                if not completed:
+                    self.invalidate()
+                elif self._mask:
+                    mask, bits = self._mask, self._bits
+                    self.invalidate()
+                    self.write_mask(mask, bits)
+
+    def __getitem__(self, i):
+        #print "daemon.py:RemoteGPIO:__getitem__"
+        return (self.raw >> i) & 1
+
+    def __setitem__(self, i, value):
+        #print "daemon.py:RemoteGPIO:__setitem__"
+        self.write_mask(1 << i, (1 << i) if value else 0)
+
+
+class RemoteEEPROM(object):
+    #print "daemon.py:RemoteEEPROM"
+    """EEPROM of an adapter behind the daemon, indexed and sliced like device.EEPROMData.
+
+    Writes take effect immediately; the daemon commits them if it holds a cached image.
+    """
+    SIZE = 256
+
+    def __init__(self, client):
+        #print "daemon.py:RemoteEEPROM:__init__"
+        self._client = client
+
+    def _address(self, key):
+        #print "daemon.py:RemoteEEPROM:_address"
+        """Returns the address for an index, which counts from the end of the EEPROM if negative."""
+        address = key + self.SIZE if key < 0 else key
+        if not 0 <= address < self.SIZE:
+            raise IndexError("EEPROM address %d out of range" % key)
+        return address
+
+    def __getitem__(self, key):
+        #print "daemon.py:RemoteEEPROM:__getitem__"
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.SIZE)
+            data = self._client._request(OP_READ_EEPROM, EEPROM_RANGE.pack(start, max(stop - start, 0)))
+            return data[::step]
+        return self._client._request(OP_READ_EEPROM, EEPROM_RANGE.pack(self._address(key), 1))
+
+    def __setitem__(self, key, value):
+        #print "daemon.py:RemoteEEPROM:__setitem__"
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.SIZE)
+            if step != 1:
+                for i, j in enumerate(range(start, stop, step)):
+                    self[j] = value[i:i + 1]
+                return
+        else:
+            start = self._address(key)
+            if isinstance(value, int):
+                # bytearray raises ValueError for anything that isn't a byte value
+                value = bytearray([value])
+        self._client._request(OP_WRITE_EEPROM, bytes(bytearray([start])) + bytes(bytearray(value)))
+
+
+class RemoteMCP2210(object):
+    #print "daemon.py:RemoteMCP2210"
+    """Client for an adapter served by MCP2210Daemon, with the same interface as device.MCP2210.
+
+    Connecting costs no USB traffic at all. Each client keeps its own transfer settings: they're fetched
+    from the adapter on first use, and sent along with every transfer, so transfers from different
+    processes always run with the settings their client last set. The daemon only changes the device's
+    settings when they differ from the last transfer's.
+
+    Usage:
+        >>> dev = RemoteMCP2210("/tmp/mcp2210.sock")
+        >>> dev.transfer(b"data")
+        >>> dev.gpio.write_mask(0x0F, 0x05)
+    """
+    MAX_TRANSACTION_SIZE = MCP2210.MAX_TRANSACTION_SIZE
+
+    def __init__(self, path=DEFAULT_SOCKET, name=None):
+        #print "daemon.py:RemoteMCP2210:__init__"
+        """Constructor.
+
+        Arguments:
+          path: Path of the daemon's socket.
+          name: Name of the adapter to use; by default, the daemon's first.
+        """
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(path)
+        self._lock = threading.Lock()
+        self._header = bytearray(RESPONSE_HEADER.size)
+        self._next_id = 0
+        self._transfer_settings = None
+        self.deadline = None
+        self.gpio = RemoteGPIO(self, OP_GET_GPIO, OP_SET_GPIO)
+        self.gpio_direction = RemoteGPIO(self, OP_GET_GPIO_DIRECTION, OP_SET_GPIO_DIRECTION)
+        self.eeprom = RemoteEEPROM(self)
+        if name is not None:
+            self._request(OP_SELECT, name.encode('utf-8'))
+
+    def _request(self, opcode, payload=b'', deadline=None):
+        #print "daemon.py:RemoteMCP2210:_request"
+        """Sends a request and waits for its reply, returning the reply payload or raising its error."""
+        if deadline is None or (self.deadline is not None and self.deadline < deadline):
+            deadline = self.deadline
+        timeout = 0.0
+        if deadline is not None:
+            timeout = deadline - monotonic()
+            if timeout <= 0:
+                raise DeadlineExceeded("Deadline passed before request 0x%.2x was sent" % opcode)
+        with self._lock:
+            self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+            self._sock.sendall(REQUEST_HEADER.pack(self._next_id, opcode, timeout, len(payload)) + bytes(payload))
+            if not _recv_exact(self._sock, self._header):
+                raise DaemonError("Daemon closed the connection")
+            request_id, result, length = RESPONSE_HEADER.unpack_from(self._header)
+            data = bytearray(length)
+            if not _recv_exact(self._sock, data):
+                raise DaemonError("Daemon closed the connection")
+        data = bytes(data)
+        if result == RESULT_OK:
+            return data
+        elif result == RESULT_COMMAND_ERROR:
+            raise CommandException(bytearray(data)[0])
+        elif result == RESULT_DEADLINE_EXCEEDED:
+            raise DeadlineExceeded(data.decode('utf-8'))
+        raise DaemonError(data.decode('utf-8'))
+
+    @contextmanager
+    def time_limit(self, seconds):
+        #print "daemon.py:RemoteMCP2210:time_limit"
+        """Context manager that makes every request in its block finish within seconds from now."""
+        previous = self.deadline
+        deadline = monotonic() + seconds
+        if previous is None or deadline < previous:
+            self.deadline = deadline
+        try:
+            yield
+        finally:
+            self.deadline = previous
+
+    def sendCommand(self, command, deadline=None):
+        #print "daemon.py:RemoteMCP2210:sendCommand"
+        """Sends a Command object to the adapter and returns its response, as MCP2210.sendCommand does."""
+        report = bytearray(64)
+        data = bytearray(command)
+        report[:len(data)] = data
+        return command.RESPONSE.from_buffer_copy(self._request(OP_COMMAND, report, deadline))
+
+    def authenticate(self, password):
+        #print "daemon.py:RemoteMCP2210:authenticate"
+        self.sendCommand(commands.SendPasswordCommand(password))
+
+    def transfer(self, data, deadline=None):
+        #print "daemon.py:RemoteMCP2210:transfer"
+        """Transfers data over SPI with this client's transfer settings, returning the data received."""
+        if self._transfer_settings is None:
+            payload = b'\x00'
+        else:
+            payload = b'\x01' + bytes(bytearray(self._transfer_settings))
+        return self._request(OP_TRANSFER, payload + bytes(bytearray(data)), deadline)
+
+    def transfer_into(self, data, rx_buffer, deadline=None):
+        #print "daemon.py:RemoteMCP2210:transfer_into"
+        received = self.transfer(data, deadline)
+        memoryview(rx_buffer)[:len(received)] = bytearray(received)
+        return len(received)
+
+    def cancel_transfer(self):
+        #print "daemon.py:RemoteMCP2210:cancel_transfer"
+        self._request(OP_CANCEL_TRANSFER)
+
+    def chip_status(self):
+        #print "daemon.py:RemoteMCP2210:chip_status"
+        return self.sendCommand(commands.GetChipStatusCommand())
+
+    def event_count(self, reset=False):
+        #print "daemon.py:RemoteMCP2210:event_count"
+        command = commands.ResetEventCounterCommand if reset else commands.GetEventCounterCommand
+        return self.sendCommand(command()).count
+
+    manufacturer_name = remote_setting('manufacturer_name', doc="Sets and gets the MCP2210 USB manufacturer name")
+    product_name = remote_setting('product_name', doc="Sets and gets the MCP2210 USB product name")
+    chip_settings = remote_setting('chip_settings', doc="Sets and gets current chip settings")
+    boot_chip_settings = remote_setting('boot_chip_settings', doc="Sets and gets boot time chip settings")
+    boot_transfer_settings = remote_setting('boot_transfer_settings', doc="Sets and gets boot time transfer settings")
+    boot_usb_settings = remote_setting('boot_usb_settings', doc="Sets and gets boot time USB settings")
+    _device_transfer_settings = remote_setting('transfer_settings')
+
+    @property
+    def transfer_settings(self):
+        #print "daemon.py:RemoteMCP2210:transfer_settings(@property)"
+        """This client's transfer settings, sent with each of its transfers."""
+        if self._transfer_settings is None:
+            self._transfer_settings = self._device_transfer_settings
+        return commands.SPISettings.from_buffer_copy(self._transfer_settings)
+
+    @transfer_settings.setter
+    def transfer_settings(self, value):
+        #print "daemon.py:RemoteMCP2210:transfer_settings(@transfer_settings.setter)"
+        self._transfer_settings = commands.SPISettings.from_buffer_copy(value)
+
+    def close(self):
+        #print "daemon.py:RemoteMCP2210:close"
+        self._sock.close()
+
+
+def benchmark(requests=2000, latency=0.0):
+    #print "daemon.py:benchmark"
+    """Measures the per-request overhead of going through the daemon, against direct access.
+
+    Two simulated adapters with the given latency are set up, one used directly and one through a daemon
+    on a temporary socket, and the same requests are timed on each.
+
+    Returns:
+      A dict of operation name to a dict of seconds per request when 'direct' and through the 'daemon',
+      and their difference as 'overhead'.
+    """
+    from mcp2210.simulator import SimulatedMCP2210
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), "mcp2210.sock")
+    direct = MCP2210(transport=SimulatedMCP2210(latency=latency))
+    daemon = MCP2210Daemon(path, {'sim': MCP2210(transport=SimulatedMCP2210(latency=latency))})
+    daemon.start()
+    remote = RemoteMCP2210(path)
+    operations = [
+        ('gpio_read', lambda dev: dev.gpio.read()),
+        ('gpio_write', lambda dev: dev.gpio.write_mask(0x01, 0x01)),
+        ('transfer_16', lambda dev: dev.transfer(b'\0' * 16)),
+        ('get_chip_settings', lambda dev: dev.chip_settings),
+    ]
+    results = {}
+    try:
+        for name, operation in operations:
+            timings = {}
+            for label, dev in (('direct', direct), ('daemon', remote)):
+                operation(dev)
+                start = monotonic()
+                for i in range(requests):
+                    operation(dev)
+                timings[label] = (monotonic() - start) / requests
+            timings['overhead'] = timings['daemon'] - timings['direct']
+            results[name] = timings
+    finally:
+        remote.close()
+        daemon.close()
+        os.rmdir(os.path.dirname(path))
+    return results
+
+
+def main(argv=None):
+    #print "daemon.py:main"
+    import argparse
+    from mcp2210.transport import HIDTransport, enumerate_devices
+
+    parser = argparse.ArgumentParser(description="Serve MCP2210 adapters to local processes over a Unix socket")
+    parser.add_argument('socket', nargs='?', default=DEFAULT_SOCKET, help="Path of the socket to listen on")
+    parser.add_argument('--simulate', type=int, default=0, metavar='N',
+                        help="Serve N simulated adapters instead of the attached ones")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Measure per-request overhead against direct access on simulated adapters, then exit")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        for name, timings in sorted(benchmark().items()):
+            print("%-24s direct %8.1f us  daemon %8.1f us  overhead %8.1f us" % (
+                name, timings['direct'] * 1e6, timings['daemon'] * 1e6, timings['overhead'] * 1e6))
+        return
+
+    if args.simulate:
+        from mcp2210.simulator import SimulatedMCP2210
+        devices = dict(("sim%d" % i, MCP2210(transport=SimulatedMCP2210())) for i in range(args.simulate))
+    else:
+        devices = {}
+        for info in enumerate_devices():
+            devices[info.get('serial_number') or info['path']] = MCP2210(transport=HIDTransport(path=info['path']))
+    if not devices:
+        sys.exit("No adapters found")
+    daemon = MCP2210Daemon(args.socket, devices)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
+
+
+if __name__ == '__main__':
+    main()
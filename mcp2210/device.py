@@ -1,40 +1,151 @@
-import hid
 from mcp2210 import commands
+from mcp2210.transport import DEFAULT_VID, DEFAULT_PID, HIDTransport, LazyTransport
+from mcp2210 import trace
+from mcp2210.capture import command_key
+from mcp2210.metrics import MeteredTransport
+from mcp2210.scheduler import TransactionScheduler
+from mcp2210.words import WordTransfer
+from contextlib import contextmanager
+from ctypes import Structure, addressof, memmove, memset, sizeof
 import time
 
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
 
 class CommandException(Exception):
     #print "device.py:CommandException"
-    """Thrown when the MCP2210 returns an error status code."""
+    """Thrown when the MCP2210 returns an error status code.
+
+    The status code is available as the code attribute; see commands.STATUS_MESSAGES for their meanings.
+    """
 
     def __init__(self, code):
         #print "device.py:CommandException:__init__"
-        super(CommandException, self).__init__("Got error code from device: 0x%.2x" % code)
+        self.code = code
+        super(CommandException, self).__init__("Got error code from device: 0x%.2x (%s)" % (
+            code, commands.STATUS_MESSAGES.get(code, "Unknown status")))
+
+
+class DeadlineExceeded(Exception):
+    #print "device.py:DeadlineExceeded"
+    """Thrown when an operation's deadline passes, or the MCP2210 doesn't answer a command in time."""
+
+
+class VerificationError(Exception):
+    #print "device.py:VerificationError"
+    """Thrown when data read back from the MCP2210 doesn't match what was written to it."""
 
 
 class GPIOSettings(object):
     #print "device.py:GPIOSettings"
-    """Encapsulates settings for GPIO pins - direction or status."""
+    """Encapsulates settings for GPIO pins - direction or status.
+
+    The last value read or written is kept as a shadow of the device register, and individual pin
+    updates are applied to it. Inside a batch() the shadow is only sent to the device when the batch
+    ends, so any number of pin changes costs a single command and appears on the pins at once:
+
+        >>> with dev.gpio.batch():
+        ...     dev.gpio[0] = 1
+        ...     dev.gpio[1] = 0
+        ...     dev.gpio.write_mask(0xF0, 0xA0)
+
+    Call invalidate() whenever the register may have changed behind the shadow's back, such as input
+    pins changing level, so that the next read fetches it from the device.
+    """
 
     def __init__(self, device, get_command, set_command):
         #print "device.py:GPIOSettings:__init__"
         self._device = device
-        self._get_command = get_command
-        self._set_command = set_command
+        self._get_command = commands.encoder_for(get_command)
+        self._set_command = commands.encoder_for(set_command)
         self._value = None
+        self._batch_depth = 0
+        self._modified = False
 
     @property
     def raw(self):
         #print "device.py:GPIOSettings:raw(@property)"
         if self._value is None:
-            self._value = self._device.sendCommand(self._get_command()).gpio
+            self._value = self._device.execute(self._get_command).gpio
         return self._value
 
     @raw.setter
     def raw(self, value):
         #print "device.py:GPIOSettings:raw(@raw.setter)"
+        if self._batch_depth:
+            self._modified = self._modified or value != self._value
+            self._value = value
+        else:
+            self._value = value
+            self._send()
+
+    def read(self):
+        #print "device.py:GPIOSettings:read"
+        """Fetches the register from the device, refreshing the shadow, and returns it.
+
+        Unlike raw, which returns the shadow once it's known, this always costs a command, so it sees
+        input pins change. Changes made inside a batch and not yet sent are discarded.
+        """
+        self._value = self._device.execute(self._get_command).gpio
+        self._modified = False
+        return self._value
+
+    def preload(self, value):
+        #print "device.py:GPIOSettings:preload"
+        """Sets the shadow register to a value known to match the device, without sending a command."""
         self._value = value
-        self._device.sendCommand(self._set_command(value))
+        self._modified = False
+
+    def invalidate(self):
+        #print "device.py:GPIOSettings:invalidate"
+        """Discards the shadow register, so the next read fetches the value from the device.
+
+        Changes made inside a batch and not yet sent are discarded too.
+        """
+        self._value = None
+        self._modified = False
+
+    @contextmanager
+    def batch(self):
+        #print "device.py:GPIOSettings:batch"
+        """Context manager that collects pin changes and sends them in one command on exit.
+
+        Batches may be nested; changes are sent when the outermost one exits, and only if the
+        register value actually changed. If the block raises anything, even KeyboardInterrupt, the
+        pending changes are discarded and the shadow is invalidated.
+        """
+        self._batch_depth += 1
+        completed = False
+        try:
+            yield self
+            completed = True
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                if not completed:
+                    self.invalidate()
+                elif self._modified:
+                    self._modified = False
+                    self._send()
+
+    def _send(self):
+        #print "device.py:GPIOSettings:_send"
+        self._device.execute(self._set_command, self._value)
+        # The current chip settings include the GPIO values and directions
+        self._device.invalidate_settings('chip_settings')
+
+    def write_mask(self, mask, value):
+        #print "device.py:GPIOSettings:write_mask"
+        """Sets the pins selected by the bits in mask to the corresponding bits in value, in one command.
+
+        Arguments:
+          mask: Bit mask of the pins to change.
+          value: New values for those pins; bits outside mask are ignored.
+        """
+        self.raw = (self.raw & ~mask) | (value & mask)
 
     def __getitem__(self, i):
         #print "device.py:GPIOSettings:__getitem__"
@@ -48,56 +159,357 @@ class GPIOSettings(object):
             self.raw &= ~(1 << i)
 
 
-def remote_property(name, get_command, set_command, field_name, doc=None):
+def _copy_setting(value):
+    #print "device.py:_copy_setting"
+    if isinstance(value, Structure):
+        return type(value).from_buffer_copy(value)
+    return value
+
+
+def _same_setting(a, b):
+    #print "device.py:_same_setting"
+    if isinstance(a, Structure):
+        return type(a) is type(b) and bytearray(a) == bytearray(b)
+    return a == b
+
+
+def _chip_settings_changed(device, settings):
+    #print "device.py:_chip_settings_changed"
+    """Brings the GPIO shadows into line with chip settings just set on the device or preloaded.
+
+    The chip settings set the pin directions outright, but the value register also reflects input
+    levels, so it's fetched again on next use.
+    """
+    device.gpio.invalidate()
+    device.gpio_direction.preload(settings.gpio_directions)
+
+
+def remote_property(name, get_command, set_command, field_name, doc=None, on_set=None):
     #print "device.py:remote_property"
     """Property decorator that facilitates writing properties for values from a remote device.
 
+    Values are cached when fetched or set. Reads return a copy of the cached value, so changes only reach
+    the device on assignment, and assigning a value equal to the cached one sends no command at all. The
+    cache is dropped by invalidate_settings(), and values older than the object's settings_ttl seconds
+    are fetched again, unless settings_ttl is None.
+
     Arguments:
-      name: The field name to use on the local object to store the cached property.
+      name: The key to store the cached property under in the local object's settings cache.
       get_command: A function that returns the remote value of the property.
       set_command: A function that accepts a new value for the property and sets it remotely.
       field_name: The name of the field to retrieve from the response message to get operations.
+      on_set: A function called as on_set(device, value) once a new value has been set.
     """
 
+    def cached(self):
+        #print "device.py:remote_property:cached"
+        value, fetched = self._settings_cache.get(name, (None, None))
+        if value is not None and self.settings_ttl is not None and monotonic() - fetched > self.settings_ttl:
+            return None
+        return value
+
     def getter(self):
         #print "device.py:remote_property:getter"
-        try:
-            return getattr(self, name)
-        except AttributeError:
-            value = getattr(self.sendCommand(get_command()), field_name)
-            setattr(self, name, value)
-            return value
+        value = cached(self)
+        if value is None:
+            value = _copy_setting(getattr(self.sendCommand(get_command()), field_name))
+            self._settings_cache[name] = (value, monotonic())
+        return _copy_setting(value)
 
     def setter(self, value):
         #print "device.py:remote_property:setter"
-        setattr(self, name, value)
+        if _same_setting(cached(self), value):
+            self.settings_writes_skipped += 1
+            return
         self.sendCommand(set_command(value))
+        self._settings_cache[name] = (_copy_setting(value), monotonic())
+        if on_set is not None:
+            on_set(self, value)
 
     return property(getter, setter, doc=doc)
 
 
 class EEPROMData(object):
     #print "device.py:EEPROMData"
-    """Represents data stored in the MCP2210 EEPROM."""
+    """Represents data stored in the MCP2210 EEPROM.
+
+    By default every byte read or written is a round trip to the device. After load(), the whole image
+    is held locally: reads are served from memory and writes only mark addresses dirty until commit()
+    writes back the modified addresses and verifies them.
+
+    Usage:
+        >>> dev.eeprom.load()
+        >>> dev.eeprom[0:16] = "serial: 0001\0\0\0\0"
+        >>> dev.eeprom.commit()
+        >>> dev.eeprom.round_trips_saved
+    """
+    SIZE = 256
 
     def __init__(self, device):
         #print "device.py:EEPROMData:__init__"
         self._device = device
+        self._read_command = commands.encoder_for(commands.ReadEEPROMCommand)
+        self._write_command = commands.encoder_for(commands.WriteEEPROMCommand)
+        self._image = None
+        self._device_image = None
+        self._dirty = set()
+        # Round trips made, and those that uncached access to the same bytes would have made
+        self.round_trips = 0
+        self._uncached_round_trips = 0
+
+    @property
+    def cached(self):
+        #print "device.py:EEPROMData:cached(@property)"
+        """True if reads and writes are served from a local image loaded with load()."""
+        return self._image is not None
+
+    @property
+    def round_trips_saved(self):
+        #print "device.py:EEPROMData:round_trips_saved(@property)"
+        """Number of USB round trips saved by caching, compared to accessing each byte on the device.
+
+        Loading and verifying cost round trips of their own, so this stays at 0 until caching pays off.
+        """
+        return max(self._uncached_round_trips - self.round_trips, 0)
+
+    @property
+    def dirty_ranges(self):
+        #print "device.py:EEPROMData:dirty_ranges(@property)"
+        """List of (start, stop) address ranges written locally but not yet committed."""
+        ranges = []
+        for address in sorted(self._dirty):
+            if ranges and ranges[-1][1] == address:
+                ranges[-1] = (ranges[-1][0], address + 1)
+            else:
+                ranges.append((address, address + 1))
+        return ranges
+
+    def _address(self, key):
+        #print "device.py:EEPROMData:_address"
+        """Returns the address for an index, which counts from the end of the EEPROM if negative."""
+        address = key + self.SIZE if key < 0 else key
+        if not 0 <= address < self.SIZE:
+            raise IndexError("EEPROM address %d out of range" % key)
+        return address
+
+    def _read(self, address):
+        #print "device.py:EEPROMData:_read"
+        self.round_trips += 1
+        return self._device.execute(self._read_command, address).data
+
+    def _write(self, address, value):
+        #print "device.py:EEPROMData:_write"
+        self.round_trips += 1
+        self._device.execute(self._write_command, address, value)
+
+    def load(self):
+        #print "device.py:EEPROMData:load"
+        """Reads the whole EEPROM into the local image, discarding any uncommitted writes."""
+        image = bytearray(self._read(address) for address in range(self.SIZE))
+        self._device_image = image
+        self._image = bytearray(image)
+        self._dirty.clear()
+
+    def invalidate(self):
+        #print "device.py:EEPROMData:invalidate"
+        """Drops the local image and any uncommitted writes; later accesses go to the device."""
+        self._image = None
+        self._device_image = None
+        self._dirty.clear()
+
+    def commit(self):
+        #print "device.py:EEPROMData:commit"
+        """Writes modified addresses in the local image to the device and reads them back to verify.
+
+        Addresses that were written locally but hold the value already on the device are skipped.
+
+        Returns:
+            The number of bytes written.
+        """
+        if self._image is None:
+            return 0
+        written = [address for address in sorted(self._dirty) if self._image[address] != self._device_image[address]]
+        for address in written:
+            self._write(address, self._image[address])
+        for address in written:
+            value = self._read(address)
+            if value != self._image[address]:
+                raise VerificationError("EEPROM address 0x%.2x reads back 0x%.2x, expected 0x%.2x"
+                                        % (address, value, self._image[address]))
+            self._device_image[address] = value
+        self._dirty.clear()
+        return len(written)
 
     def __getitem__(self, key):
         #print "device.py:EEPROMData:__getitem__"
         if isinstance(key, slice):
-            return ''.join(self[i] for i in range(*key.indices(255)))
+            addresses = range(*key.indices(self.SIZE))
+            self._uncached_round_trips += len(addresses)
+            if self._image is not None:
+                return bytes(self._image[key])
+            return bytes(bytearray(self._read(i) for i in addresses))
         else:
-            return chr(self._device.sendCommand(commands.ReadEEPROMCommand(key)).header.reserved)
+            key = self._address(key)
+            self._uncached_round_trips += 1
+            if self._image is not None:
+                return bytes(self._image[key:key + 1])
+            return bytes(bytearray([self._read(key)]))
 
     def __setitem__(self, key, value):
         #print "device.py:EEPROMData:__setitem__"
         if isinstance(key, slice):
-            for i, j in enumerate(range(*key.indices(255))):
+            for i, j in enumerate(range(*key.indices(self.SIZE))):
                 self[j] = value[i]
         else:
-            self._device.sendCommand(commands.WriteEEPROMCommand(key, ord(value)))
+            key = self._address(key)
+            self._uncached_round_trips += 1
+            if not isinstance(value, int):
+                value = ord(value)
+            if self._image is not None:
+                self._image[key] = value
+                self._dirty.add(key)
+            else:
+                self._write(key, value)
+
+
+class _ChunkReader(object):
+    #print "device.py:_ChunkReader"
+    """Reads byte strings of requested lengths from an iterable of arbitrarily sized chunks."""
+
+    def __init__(self, chunks):
+        #print "device.py:_ChunkReader:__init__"
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+
+    def read(self, length):
+        #print "device.py:_ChunkReader:read"
+        while len(self._buffer) < length:
+            try:
+                self._buffer.extend(next(self._chunks))
+            except StopIteration:
+                raise ValueError("Ran out of data to transmit %d bytes short" % (length - len(self._buffer)))
+        data = bytes(self._buffer[:length])
+        del self._buffer[:length]
+        return data
+
+
+class BusyBackoff(object):
+    #print "device.py:BusyBackoff"
+    """Paces retries of commands the MCP2210 reports as busy, learning how long each command type waits.
+
+    The first retry of a busy command sleeps for the learned wait for its command type, which may be any
+    length; if it's still busy, each further sleep doubles, up to MAX_DELAY or the learned wait, whichever
+    is longer. No sleep runs past the deadline of the operation. Once the command gets through, the
+    learned wait moves towards the midpoint between the last time it was known to be busy and the end of
+    the sleep after which it wasn't, so it settles on the shortest sleep that usually works: commands
+    that are always busy for a few milliseconds stop polling the bus in the meantime, and those busy
+    only briefly are retried in well under a millisecond.
+
+    Usage:
+        >>> dev.backoff.timeout = 10.0  # Allow an external SPI master to hold the bus for longer
+        >>> dev.backoff.stats()[0x42]['typical_wait']
+    """
+    MIN_DELAY = 0.0001
+    MAX_DELAY = 0.005
+    # Weight given to each new wait in the learned wait for its command type
+    WEIGHT = 0.25
+
+    def __init__(self, timeout=5.0):
+        #print "device.py:BusyBackoff:__init__"
+        """Constructor.
+
+        Arguments:
+          timeout: Seconds a command may stay busy before a CommandException is raised with its status.
+        """
+        self.timeout = timeout
+        self._stats = {}
+
+    def start(self, key, deadline=None):
+        #print "device.py:BusyBackoff:start"
+        """Starts waiting for a busy command.
+
+        Arguments:
+          key: The command type, normally its command byte.
+          deadline: monotonic() time past which no sleep may run, or None.
+
+        Returns:
+          A BusyWait whose sleep() is called before each retry and done() once the command gets through.
+        """
+        return BusyWait(self, key, self.typical_wait(key), deadline)
+
+    def typical_wait(self, key):
+        #print "device.py:BusyBackoff:typical_wait"
+        """Returns the learned wait, in seconds, for commands of type key, or 0 if none has been busy yet."""
+        stats = self._stats.get(key)
+        return stats[4] if stats else 0.0
+
+    def record(self, key, elapsed, retries, needed):
+        #print "device.py:BusyBackoff:record"
+        """Records that a command of type key got through.
+
+        Arguments:
+          key: The command type.
+          elapsed: Seconds from the first busy response to the command getting through.
+          retries: Number of times the command was sent again.
+          needed: Estimate of the sleep that would have been just long enough, which is learned.
+        """
+        stats = self._stats.get(key)
+        if stats is None:
+            self._stats[key] = [1, retries, elapsed, elapsed, needed]
+        else:
+            stats[0] += 1
+            stats[1] += retries
+            stats[2] += elapsed
+            stats[3] = max(stats[3], elapsed)
+            stats[4] += (needed - stats[4]) * self.WEIGHT
+
+    def stats(self):
+        #print "device.py:BusyBackoff:stats"
+        """Returns a dict of command byte to a dict of busy episodes, retries, total and longest wait in
+        seconds, and the learned wait."""
+        return dict((key, {'waits': waits, 'retries': retries, 'wait_time': total, 'max_wait': longest,
+                           'typical_wait': typical})
+                    for key, (waits, retries, total, longest, typical) in self._stats.items())
+
+
+class BusyWait(object):
+    #print "device.py:BusyWait"
+    """One command's wait for the MCP2210 to stop reporting it busy, as returned by BusyBackoff.start."""
+    __slots__ = ('backoff', 'key', 'deadline', 'started', 'delay', 'last_busy', 'retries')
+
+    def __init__(self, backoff, key, typical_wait, deadline=None):
+        #print "device.py:BusyWait:__init__"
+        self.backoff = backoff
+        self.key = key
+        self.deadline = deadline
+        self.started = monotonic()
+        self.delay = max(typical_wait, backoff.MIN_DELAY)
+        self.last_busy = 0.0
+        self.retries = 0
+
+    def sleep(self, status):
+        #print "device.py:BusyWait:sleep"
+        """Sleeps before the next retry, or raises CommandException(status) once the timeout has passed.
+
+        The sleep is cut short at the deadline, so the retry that follows raises DeadlineExceeded on time.
+        """
+        now = monotonic()
+        self.last_busy = now - self.started
+        if self.last_busy > self.backoff.timeout:
+            raise CommandException(status)
+        if self.retries:
+            self.delay = min(self.delay * 2, max(self.backoff.MAX_DELAY, self.delay))
+        delay = self.delay
+        if self.deadline is not None:
+            delay = max(min(delay, self.deadline - now), 0)
+        time.sleep(delay)
+        self.retries += 1
+
+    def done(self):
+        #print "device.py:BusyWait:done"
+        # The command was still busy when the last busy response arrived, and free by the end of the sleep
+        # that followed it, so the shortest wait that would have worked lies somewhere within that sleep.
+        self.backoff.record(self.key, monotonic() - self.started, self.retries, self.last_busy + self.delay / 2)
 
 
 class MCP2210(object):
@@ -108,6 +520,9 @@ class MCP2210(object):
         >>> dev = MCP2210(my_vid, my_pid)
         >>> dev.transfer("data")
 
+    Without an adapter attached, the same interface drives a software model of the chip:
+        >>> dev = MCP2210(transport=SimulatedMCP2210())
+
     Advanced usage:
         >>> dev.manufacturer_name = "Foobar Industries Ltd"
         >>> #print dev.manufacturer_name
@@ -124,113 +539,356 @@ class MCP2210(object):
     See the MCP2210 datasheet (http://ww1.microchip.com/downloads/en/DeviceDoc/22288A.pdf) for full details
     on available commands and arguments.
     """
-    def __init__(self, vid, pid):
+    # Largest transaction the chip can clock out with chip select held active
+    MAX_TRANSACTION_SIZE = 0xFFFF
+    # Bounds, in seconds, for the delay between polls of an SPI engine with no received data yet
+    POLL_DELAY_MIN = 0.0002
+    POLL_DELAY_MAX = 0.005
+    # Seconds that cached settings remain valid, or None to keep them until invalidate_settings()
+    settings_ttl = None
+    # Size of the HID reports exchanged with the MCP2210
+    REPORT_SIZE = 64
+    # Seconds to wait for the response to any one command, or None to wait indefinitely
+    response_timeout = 1.0
+    # Seconds without input after which responses to timed out commands are assumed to have all arrived
+    STALE_DRAIN_TIME = 0.01
+
+    def __init__(self, vid=DEFAULT_VID, pid=DEFAULT_PID, transport=None, serial=None, lazy=False, cancel=True):
         #print "device.py:MCP2210:__init__"
         """Constructor.
 
         Arguments:
           vid: Vendor ID
           pid: Product ID
+          transport: A transport.Transport to use instead of opening vid and pid with hidapi, such as a
+            simulator.SimulatedMCP2210.
+          serial: USB serial number of the adapter to open, which also keys its settings snapshot.
+          lazy: If True, the adapter is only opened when the first command is sent.
+          cancel: If True, any SPI transfer left running by a previous user is cancelled, which costs a
+            round trip. Pass False when the engine is known to be idle to start up faster.
         """
-        self.hid = hid.device()
-        self.hid.open(vid, pid)
+        # Construction time, from which the time to the first transfer is measured
+        self.created = monotonic()
+        self.first_transfer_time = None
+        self.serial = serial
+        if transport is None:
+            if lazy:
+                transport = LazyTransport(lambda: HIDTransport(vid, pid, serial))
+            else:
+                transport = HIDTransport(vid, pid, serial)
+        self.transport = transport
+        # Output and input reports are reused for every command, with SPI transfer views laid over them
+        self._report = bytearray(self.REPORT_SIZE)
+        self._input = bytearray(self.REPORT_SIZE)
+        self._input_view = memoryview(self._input)
+        self._spi_command = commands.SPITransferCommand.from_buffer(self._report)
+        self._spi_response = commands.SPITransferResponse.from_buffer(self._input)
+        self._tracer = None
+        self._metrics = None
+        # monotonic() time by which every operation must finish, or None
+        self.deadline = None
+        # Set after a command times out, since its response may still turn up
+        self._resync = False
+        self.stale_responses = 0
+        self._settings_cache = {}
+        self.settings_writes_skipped = 0
+        self.backoff = BusyBackoff()
         self.gpio_direction = GPIOSettings(self, commands.GetGPIODirectionCommand, commands.SetGPIODirectionCommand)
         self.gpio = GPIOSettings(self, commands.GetGPIOValueCommand, commands.SetGPIOValueCommand)
         self.eeprom = EEPROMData(self)
-        self.cancel_transfer()
+        self.scheduler = TransactionScheduler(self)
+        if cancel:
+            self.cancel_transfer()
 
-    def sendCommand(self, command):
+    def sendCommand(self, command, deadline=None):
         #print "device.py:MCP2210:sendCommand"
         """Sends a Command object to the MCP2210 and returns its response.
 
+        Commands the chip reports as busy are sent again, paced by the device's BusyBackoff.
+
+        Arguments:
+            command: A commands.Command instance
+            deadline: monotonic() time by which the command must complete.
+
+        Returns:
+            A commands.Response instance, or raises a CommandException on error or DeadlineExceeded on timeout.
+        """
+        if deadline is not None:
+            with self._until(deadline):
+                return self.sendCommand(command)
+        memset(addressof(self._spi_command), 0, self.REPORT_SIZE)
+        memmove(addressof(self._spi_command), addressof(command), sizeof(command))
+        self._exchange()
+        if self._input[1]:
+            self._check_status()
+        return command.RESPONSE.from_buffer_copy(self._input)
+
+    def execute(self, encoder, *values):
+        #print "device.py:MCP2210:execute"
+        """Sends a command from its precompiled encoder and returns its response.
+
+        This is the fast path for frequent small commands: the command is patched into the output report
+        from a template, and the response is a view over the input report rather than a copy.
+
         Arguments:
-            A commands.Command instance
+            encoder: A commands.CommandEncoder, as returned by commands.encoder_for.
+            values: Values for each of the command's FIELDS.
 
         Returns:
-            A commands.Response instance, or raises a CommandException on error.
-        """
-        command_data = [ord(x) for x in buffer(command)]
-	bits = dict()
-	for i in range(0,8):
-		bits[i] = ""
-	printall = False
-	for x in buffer(command)[2:]:
-		for i in range(0,8):
-			if ((ord(x) & 1 << i)) == 0:
-				bits[i] = bits[i] + " "
-			else:
-				bits[i] = bits[i] + "X"
-				printall = True
-	l = max(len(bits[0].strip()), len(bits[1].strip()), len(bits[2].strip()), len(bits[3].strip()), len(bits[4].strip()), len(bits[5].strip()), len(bits[6].strip()), len(bits[7].strip()))
-	if l > 2:
-		for i in range(0,62):
-			print bits[7][i], bits[6][i], bits[5][i], bits[4][i], bits[3][i], bits[2][i], bits[1][i], bits[0][i]
-	elif l == 0:
-		print
-	else:
-		print bits[7][2], bits[6][2], bits[5][2], bits[4][2], bits[3][2], bits[2][2], bits[1][2], bits[0][2]
-        self.hid.write(command_data)
-        response_data = ''.join(chr(x) for x in self.hid.read(64))
-        response = command.RESPONSE.from_buffer_copy(response_data)
-        response.command = 66
-        engine_status = 16
-        response.length = 64
-	response.status = 0
-	
-        #response_data = ''.join(chr(x) for x in mock_data)
-#        if response.status != 0:
-#            raise CommandException(response.status)
+            A commands.Response view, valid until the next command is sent, or raises a CommandException on error.
+        """
+        encoder.encode_into(self._report, *values)
+        self._exchange()
+        if self._input[1]:
+            self._check_status()
+        return encoder.decode(self._input)
+
+    def _check_status(self):
+        #print "device.py:MCP2210:_check_status"
+        """Handles a non-zero status in the input report: busy commands are resent until they get through,
+        and any other status raises a CommandException."""
+        status = self._input[1]
+        if status in commands.BUSY_STATUSES:
+            wait = self.backoff.start(self._report[0], self.deadline)
+            while status in commands.BUSY_STATUSES:
+                wait.sleep(status)
+                self._exchange()
+                status = self._input[1]
+            wait.done()
+        if status != commands.STATUS_SUCCESS:
+            raise CommandException(status)
+
+    def _exchange(self):
+        #print "device.py:MCP2210:_exchange"
+        """Writes the output report to the MCP2210 and reads its reply into the input report.
+
+        Waits at most response_timeout seconds for the reply, and not past the deadline. Responses that
+        don't echo the command byte are late replies to earlier commands, and are discarded.
+        """
+        deadline = self.deadline
+        if deadline is not None and monotonic() >= deadline:
+            raise DeadlineExceeded("Deadline passed before command 0x%.2x was sent" % self._report[0])
+        if self._resync:
+            self._drain()
+        self.transport.write(self._report)
+        while True:
+            timeout = self.response_timeout
+            if deadline is not None:
+                remaining = max(deadline - monotonic(), 0)
+                if timeout is None or remaining < timeout:
+                    timeout = remaining
+            if not self.transport.read_into(self._input, timeout):
+                self._resync = True
+                # The command may or may not have taken effect, so cached device state can't be trusted
+                self.invalidate_settings()
+                self.gpio.invalidate()
+                self.gpio_direction.invalidate()
+                raise DeadlineExceeded("No response to command 0x%.2x" % self._report[0])
+            if self._input[0] == self._report[0]:
+                return
+            self.stale_responses += 1
+
+    def _traced_exchange(self):
+        #print "device.py:MCP2210:_traced_exchange"
+        """Variant of _exchange that records both reports with the tracer; installed by setting tracer."""
+        self._tracer.record(trace.REQUEST, self._report)
+        MCP2210._exchange(self)
+        self._tracer.record(trace.RESPONSE, self._input)
+
+    def _metered_send_command(self, command, deadline=None):
+        #print "device.py:MCP2210:_metered_send_command"
+        """Variant of sendCommand that times encoding and decoding; installed by setting metrics."""
+        if deadline is not None:
+            with self._until(deadline):
+                return self._metered_send_command(command)
+        start = monotonic()
+        memset(addressof(self._spi_command), 0, self.REPORT_SIZE)
+        memmove(addressof(self._spi_command), addressof(command), sizeof(command))
+        key = command_key(self._report[0], self._report[1])
+        self._metrics.record_encode(key, monotonic() - start)
+        self._exchange()
+        if self._input[1]:
+            self._check_status()
+        start = monotonic()
+        response = command.RESPONSE.from_buffer_copy(self._input)
+        self._metrics.record_decode(key, monotonic() - start)
         return response
 
+    def _metered_execute(self, encoder, *values):
+        #print "device.py:MCP2210:_metered_execute"
+        """Variant of execute that times encoding and decoding; installed by setting metrics."""
+        start = monotonic()
+        encoder.encode_into(self._report, *values)
+        key = command_key(self._report[0], self._report[1])
+        self._metrics.record_encode(key, monotonic() - start)
+        self._exchange()
+        if self._input[1]:
+            self._check_status()
+        start = monotonic()
+        response = encoder.decode(self._input)
+        self._metrics.record_decode(key, monotonic() - start)
+        return response
+
+    def _drain(self):
+        #print "device.py:MCP2210:_drain"
+        """Discards responses to commands that timed out, until no input arrives for STALE_DRAIN_TIME.
+
+        This keeps a late response from being taken for the reply to the next command, even one with
+        the same command byte.
+        """
+        while self.transport.read_into(self._input, self.STALE_DRAIN_TIME):
+            self.stale_responses += 1
+        self._resync = False
 
-#    manufacturer_name = remote_property(
-#        '_manufacturer_name',
-#        commands.GetUSBManufacturerCommand,
-#        commands.SetUSBManufacturerCommand,
-#        'string',
-#        doc="Sets and gets the MCP2210 USB manufacturer name")
-
-#    product_name = remote_property(
-#        '_product_name',
-#        commands.GetUSBProductCommand,
-#        commands.SetUSBProductCommand,
-#        'string',
-#        doc="Sets and gets the MCP2210 USB product name")
-
-#    boot_chip_settings = remote_property(
-#        '_boot_chip_settings',
-#        commands.GetBootChipSettingsCommand,
-#        commands.SetBootChipSettingsCommand,
-#        'settings',
-#        doc="Sets and gets boot time chip settings such as GPIO assignments")
-
-#    chip_settings = remote_property(
-#        '_chip_settings',
-#        commands.GetChipSettingsCommand,
-#        commands.SetChipSettingsCommand,
-#        'settings',
-#        doc="Sets and gets current chip settings such as GPIO assignments")
-
-#    boot_transfer_settings = remote_property(
-#        '_boot_transfer_settings',
-#        commands.GetBootSPISettingsCommand,
-#        commands.SetBootSPISettingsCommand,
-#        'settings',
-#        doc="Sets and gets boot time transfer settings such as data rate")
-
-#    transfer_settings = remote_property(
-#        '_transfer_settings',
-#        commands.GetSPISettingsCommand,
-#        commands.SetSPISettingsCommand,
-#        'settings',
-#        doc="Sets and gets current transfer settings such as data rate")
-
-#    boot_usb_settings = remote_property(
-#        '_boot_usb_settings',
-#        commands.GetBootUSBSettingsCommand,
-#        commands.SetBootUSBSettingsCommand,
-#        'settings',
-#        doc="Sets and gets boot time USB settings such as VID and PID")
+    @contextmanager
+    def _until(self, deadline):
+        #print "device.py:MCP2210:_until"
+        previous = self.deadline
+        if previous is None or deadline < previous:
+            self.deadline = deadline
+        try:
+            yield
+        finally:
+            self.deadline = previous
+
+    def time_limit(self, seconds):
+        #print "device.py:MCP2210:time_limit"
+        """Context manager that makes every operation in its block finish within seconds from now.
+
+        Operations still running when the time is up raise DeadlineExceeded; an SPI transaction cut
+        short is cancelled. Nested limits can only shorten the deadline.
+
+        Usage:
+            >>> with dev.time_limit(0.5):
+            ...     dev.transfer_settings = settings
+            ...     dev.transfer(b"data")
+        """
+        return self._until(monotonic() + seconds)
+
+    @property
+    def tracer(self):
+        #print "device.py:MCP2210:tracer(@property)"
+        """A trace.Tracer recording every report exchanged with the device, or None when not tracing.
+
+        Untraced devices use an _exchange without any tracing checks, so tracing costs nothing until enabled.
+        """
+        return self._tracer
+
+    @tracer.setter
+    def tracer(self, tracer):
+        #print "device.py:MCP2210:tracer(@tracer.setter)"
+        self._tracer = tracer
+        if tracer is None:
+            self.__dict__.pop('_exchange', None)
+        else:
+            self._exchange = self._traced_exchange
+
+    @property
+    def metrics(self):
+        #print "device.py:MCP2210:metrics(@property)"
+        """A metrics.Metrics counting and timing every command sent to the device, or None.
+
+        Setting it wraps the transport in a metrics.MeteredTransport and installs variants of sendCommand
+        and execute that time encoding and decoding; setting None removes them again, so metrics cost
+        nothing until enabled.
+        """
+        return self._metrics
+
+    @metrics.setter
+    def metrics(self, metrics):
+        #print "device.py:MCP2210:metrics(@metrics.setter)"
+        if isinstance(self.transport, MeteredTransport):
+            self.transport = self.transport.transport
+        self._metrics = metrics
+        if metrics is None:
+            self.__dict__.pop('sendCommand', None)
+            self.__dict__.pop('execute', None)
+        else:
+            self.transport = MeteredTransport(self.transport, metrics)
+            self.sendCommand = self._metered_send_command
+            self.execute = self._metered_execute
+
+    manufacturer_name = remote_property(
+        '_manufacturer_name',
+        commands.GetUSBManufacturerCommand,
+        commands.SetUSBManufacturerCommand,
+        'string',
+        doc="Sets and gets the MCP2210 USB manufacturer name")
+
+    product_name = remote_property(
+        '_product_name',
+        commands.GetUSBProductCommand,
+        commands.SetUSBProductCommand,
+        'string',
+        doc="Sets and gets the MCP2210 USB product name")
+
+    boot_chip_settings = remote_property(
+        '_boot_chip_settings',
+        commands.GetBootChipSettingsCommand,
+        commands.SetBootChipSettingsCommand,
+        'settings',
+        doc="Sets and gets boot time chip settings such as GPIO assignments")
+
+    chip_settings = remote_property(
+        '_chip_settings',
+        commands.GetChipSettingsCommand,
+        commands.SetChipSettingsCommand,
+        'settings',
+        doc="Sets and gets current chip settings such as GPIO assignments",
+        on_set=_chip_settings_changed)
+
+    boot_transfer_settings = remote_property(
+        '_boot_transfer_settings',
+        commands.GetBootSPISettingsCommand,
+        commands.SetBootSPISettingsCommand,
+        'settings',
+        doc="Sets and gets boot time transfer settings such as data rate")
+
+    transfer_settings = remote_property(
+        '_transfer_settings',
+        commands.GetSPISettingsCommand,
+        commands.SetSPISettingsCommand,
+        'settings',
+        doc="Sets and gets current transfer settings such as data rate")
+
+    boot_usb_settings = remote_property(
+        '_boot_usb_settings',
+        commands.GetBootUSBSettingsCommand,
+        commands.SetBootUSBSettingsCommand,
+        'settings',
+        doc="Sets and gets boot time USB settings such as VID and PID")
+
+    def invalidate_settings(self, *names):
+        #print "device.py:MCP2210:invalidate_settings"
+        """Drops cached settings, so they are fetched from the device on next use.
+
+        Arguments:
+          names: Names of the properties to invalidate, such as 'chip_settings'. All are invalidated if
+            none are given.
+        """
+        if not names:
+            self._settings_cache.clear()
+        for name in names:
+            self._settings_cache.pop('_' + name, None)
+
+    def cached_settings(self):
+        #print "device.py:MCP2210:cached_settings"
+        """Returns a dict of property name, such as 'chip_settings', to a copy of each cached setting."""
+        return dict((name[1:], _copy_setting(value)) for name, (value, fetched) in self._settings_cache.items())
+
+    def preload_settings(self, **values):
+        #print "device.py:MCP2210:preload_settings"
+        """Fills the settings cache with values known to match the device, such as from a snapshot, so
+        reading them sends no command. Preloading chip_settings updates the GPIO shadows to match.
+
+        Arguments:
+          values: Property names, such as chip_settings, with their values.
+        """
+        now = monotonic()
+        for name, value in values.items():
+            self._settings_cache['_' + name] = (_copy_setting(value), now)
+        if 'chip_settings' in values:
+            _chip_settings_changed(self, values['chip_settings'])
 
     def authenticate(self, password):
         #print "device.py:MCP2210:authenticate"
@@ -241,31 +899,267 @@ class MCP2210(object):
         """
         self.sendCommand(commands.SendPasswordCommand(password))
 
-    def transfer(self, data):
+    def transfer(self, data, deadline=None):
         #print "device.py:MCP2210:transfer"
         """Transfers data over SPI.
 
+        The SPI transaction size is set to the length of the data once per transaction, after which
+        chunks are paced by the engine status the MCP2210 reports in each response: the loop only
+        backs off while the chip is busy or has no received data for us yet.
+
+        Transfers longer than MAX_TRANSACTION_SIZE bytes are split into several SPI transactions,
+        since the chip cannot represent a larger transaction size.
+
         Arguments:
-            data: The data to transfer.
+            data: The data to transfer, as bytes, a bytearray or a memoryview.
+            deadline: monotonic() time by which the transfer must complete.
 
         Returns:
             The data returned by the SPI device.
         """
-#       settings = self.transfer_settings
-#       settings.spi_tx_size = len(data)
-#       self.transfer_settings = settings
+        response = bytearray(len(data))
+        self.transfer_into(data, response, deadline)
+        return bytes(response)
+
+    def transfer_into(self, data, rx_buffer, deadline=None):
+        #print "device.py:MCP2210:transfer_into"
+        """Transfers data over SPI, writing the data returned by the SPI device into rx_buffer.
 
-        response = ''
-        for i in range(0, len(data), 60):
-            response += self.sendCommand(commands.SPITransferCommand(data[i:i + 60])).data
-            time.sleep(0.01)
+        Chunks are copied straight from data into the reusable output report, and from the input
+        report into rx_buffer, so no per-chunk objects are built for the payload.
 
-        while len(response) < len(data):
-            response += self.sendCommand(commands.SPITransferCommand('')).data
+        Arguments:
+            data: The data to transfer, as bytes, a bytearray or a memoryview.
+            rx_buffer: A writable buffer, such as a bytearray or memoryview, at least as long as data.
+            deadline: monotonic() time by which the transfer must complete.
 
-        return ''.join(response)
+        Returns:
+            The number of bytes written to rx_buffer.
+        """
+        if deadline is not None:
+            with self._until(deadline):
+                return self.transfer_into(data, rx_buffer)
+        tx = memoryview(data)
+        rx = memoryview(rx_buffer)
+        if len(rx) < len(tx):
+            raise ValueError("Receive buffer is %d bytes, need at least %d" % (len(rx), len(tx)))
+
+        received = 0
+        for i in range(0, len(tx), self.MAX_TRANSACTION_SIZE):
+            received += self._transaction(tx[i:i + self.MAX_TRANSACTION_SIZE], rx[received:])
+        if self.first_transfer_time is None:
+            self.first_transfer_time = monotonic() - self.created
+        return received
+
+    def transfer_words(self, commands, word_bits=16, endian='big', mask=None, out=None, deadline=None):
+        #print "device.py:MCP2210:transfer_words"
+        """Transfers a sequence of multi-byte words over SPI, decoding the words received into an array.
+
+        The transmit payload is built from the words and the received bytes decoded with vectorized
+        NumPy operations where NumPy is installed. For continuous sampling, build a words.WordTransfer
+        once and call its read_into() repeatedly, which skips encoding the commands each time.
+
+        Usage:
+            >>> dev.transfer_words([0x0600, 0x0640], word_bits=16, mask=0x0FFF)  # Two 12-bit samples
+
+        Arguments:
+            commands: Sequence or NumPy array of integer words to send; one word is received for each.
+            word_bits: Bits per word, up to 32; each word takes (word_bits + 7) // 8 bytes on the wire.
+            endian: 'big' if words are sent and received most significant byte first, or 'little'.
+            mask: Bits of each received word to keep, shifted down to bit 0; see words.unpack_words_into().
+            out: Array to decode into, such as a row of a preallocated NumPy array. By default a new one
+                is allocated, as by words.empty_words().
+            deadline: monotonic() time by which the transfer must complete.
+
+        Returns:
+            The array of received words: out if given, otherwise a NumPy array if NumPy is installed
+            and an array.array if not.
+        """
+        transfer = WordTransfer(self, commands, word_bits, endian, mask)
+        if out is None:
+            return transfer.read(deadline)
+        transfer.read_into(out, deadline)
+        return out
+
+    def transfer_stream(self, chunks, length=None):
+        #print "device.py:MCP2210:transfer_stream"
+        """Transfers data from an iterable of chunks over SPI, yielding received data as it arrives.
+
+        This is a generator: chunks are only pulled from the iterable as the SPI engine needs them, and
+        the next report is only sent once the consumer asks for more data, so a transfer of any size runs
+        in constant memory, paced by whichever of producer, consumer and bus is slowest.
+
+        Usage:
+            >>> with open("dump.bin", "wb") as f:
+            ...     for data in dev.transfer_stream(iter(lambda: b"\0" * 4096, None), length=0xFFFF):
+            ...         f.write(data)
+
+        Arguments:
+            chunks: An iterable of bytes-like objects to transmit, such as a generator.
+            length: The total number of bytes to transmit, taken from chunks as needed. If not given,
+                each chunk is transferred as a separate SPI transaction.
+
+        Yields:
+            The data returned by the SPI device, up to 60 bytes at a time.
+        """
+        if length is None:
+            for chunk in chunks:
+                tx = memoryview(chunk)
+                for i in range(0, len(tx), self.MAX_TRANSACTION_SIZE):
+                    part = tx[i:i + self.MAX_TRANSACTION_SIZE]
+                    for data in self._spi_engine(len(part), lambda offset, size: part[offset:offset + size]):
+                        yield data.tobytes()
+        else:
+            reader = _ChunkReader(chunks)
+            for i in range(0, length, self.MAX_TRANSACTION_SIZE):
+                size = min(length - i, self.MAX_TRANSACTION_SIZE)
+                for data in self._spi_engine(size, lambda offset, size: reader.read(size)):
+                    yield data.tobytes()
+
+    def _transaction(self, tx, rx):
+        #print "device.py:MCP2210:_transaction"
+        """Runs a single SPI transaction from memoryview tx into memoryview rx.
+
+        Returns:
+            The number of bytes received.
+        """
+        received = 0
+        for data in self._spi_engine(len(tx), lambda offset, size: tx[offset:offset + size]):
+            rx[received:received + len(data)] = data
+            received += len(data)
+        return received
+
+    def _spi_engine(self, size, source):
+        #print "device.py:MCP2210:_spi_engine"
+        """Runs a single SPI transaction of size bytes, yielding the received data of each response.
+
+        Arguments:
+            size: Number of bytes in the transaction.
+            source: Function called as source(offset, length) to get the next length bytes to transmit;
+                it is called once for each chunk, in order.
+
+        Yields:
+            Memoryviews of the received data in the input report, valid until the generator resumes.
+        """
+        settings = self.transfer_settings
+        if settings.spi_tx_size != size:
+            settings.spi_tx_size = size
+            self.transfer_settings = settings
+
+        command = self._spi_command
+        reply = self._spi_response
+        report = self._report
+        sent = 0
+        polls = 0
+        wait = None
+        finished = False
+        try:
+            length = min(size, 60)
+            chunk = source(sent, length)
+            while True:
+                command.command = command.COMMAND
+                command.length = length
+                command.reserved = 0
+                report[4:4 + length] = chunk
+                self._exchange()
+                if reply.status in commands.BUSY_STATUSES:
+                    # The previous chunk is still being clocked out, or an external master holds the
+                    # bus; resend this one once it's free.
+                    if wait is None:
+                        wait = self.backoff.start(command.COMMAND, self.deadline)
+                    wait.sleep(reply.status)
+                    continue
+                elif reply.status != commands.SPI_STATUS_SUCCESS:
+                    raise CommandException(reply.status)
+                if wait is not None:
+                    wait.done()
+                    wait = None
+
+                sent += length
+                if reply.engine_status == commands.SPI_ENGINE_FINISHED:
+                    finished = True
+                if reply.length:
+                    polls = 0
+                    yield self._input_view[4:4 + reply.length]
+                if finished:
+                    return
+                elif reply.engine_status == commands.SPI_ENGINE_STARTED and not length:
+                    polls = self._backoff(polls)
+                if length:
+                    length = min(size - sent, 60)
+                    chunk = source(sent, length)
+        finally:
+            if not finished:
+                # Abandoned mid-transaction, so release the bus for the next one, even past the deadline
+                deadline, self.deadline = self.deadline, None
+                try:
+                    self.cancel_transfer()
+                finally:
+                    self.deadline = deadline
+
+    def _backoff(self, polls):
+        #print "device.py:MCP2210:_backoff"
+        """Waits before polling the SPI engine again, returning the new count of unproductive polls.
+
+        The first poll after progress is sent straight away, since the USB round trip already paces
+        it; after that the delay doubles from POLL_DELAY_MIN up to POLL_DELAY_MAX.
+        """
+        if polls:
+            time.sleep(min(self.POLL_DELAY_MIN * 2 ** (polls - 1), self.POLL_DELAY_MAX))
+        return polls + 1
 
     def cancel_transfer(self):
         #print "device.py:MCP2210:cancel_transfer"
         """Cancels any ongoing transfers."""
-        self.sendCommand(commands.CancelTransferCommand())
+        self.execute(commands.encoder_for(commands.CancelTransferCommand))
+
+    def chip_status(self):
+        #print "device.py:MCP2210:chip_status"
+        """Reads the chip status: who owns the SPI bus, and the state of password access.
+
+        Returns:
+            A commands.DeviceStatusResponse, whose bus_owner is one of the commands.BUS_OWNER_ values.
+        """
+        return commands.DeviceStatusResponse.from_buffer_copy(
+            self.execute(commands.encoder_for(commands.GetChipStatusCommand)))
+
+    def event_count(self, reset=False):
+        #print "device.py:MCP2210:event_count"
+        """Reads the interrupt event counter, which counts pulses or edges on GP6.
+
+        Arguments:
+            reset: If True, the counter is reset to zero as it is read, so no events are missed in between.
+
+        Returns:
+            The number of events counted, up to 0xFFFF.
+        """
+        command = commands.ResetEventCounterCommand if reset else commands.GetEventCounterCommand
+        return self.execute(commands.encoder_for(command)).count
+
+    def configure_event_counter(self, mode):
+        #print "device.py:MCP2210:configure_event_counter"
+        """Assigns GP6 its dedicated interrupt function and sets what the event counter counts.
+
+        This changes the current chip settings only; set boot_chip_settings to count from power on.
+
+        Arguments:
+            mode: One of the commands.EVENT_COUNT_ values.
+        """
+        settings = self.chip_settings
+        settings.pin_designations[6] = commands.PIN_DEDICATED
+        settings.other_settings = (settings.other_settings & ~0x0E) | (mode << 1)
+        self.chip_settings = settings
+
+    def tune_transfer_settings(self, transaction, expected=None, repetitions=10, **kwargs):
+        #print "device.py:MCP2210:tune_transfer_settings"
+        """Finds the fastest transfer settings the slave answers reliably; see tuning.tune_transfer_settings.
+
+        Usage:
+            >>> settings, curve = dev.tune_transfer_settings(b"\\0" * 60)  # Slave with MISO tied to MOSI
+            >>> dev.boot_transfer_settings = settings
+
+        Returns:
+            A tuple of the fastest commands.SPISettings found, and the throughput of every configuration tried.
+        """
+        from mcp2210.tuning import tune_transfer_settings
+        return tune_transfer_settings(self, transaction, expected, repetitions, **kwargs)
@@ -0,0 +1,278 @@
+import mmap
+import struct
+import time
+
+from mcp2210.device import VerificationError
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+
+class SPIFlash(object):
+    #print "flash.py:SPIFlash"
+    """Reads and programs a 25-series SPI NOR flash attached to an MCP2210.
+
+    The device's current transfer settings must already select the flash's chip select line and a
+    suitable SPI mode. Large regions are streamed between the flash and memory-mapped files, pages that
+    already hold the target data are never reprogrammed, and sectors are only erased when programming
+    alone can't produce the target data.
+
+    Usage:
+        >>> flash = SPIFlash(dev)
+        >>> flash.jedec_id()
+        (239, 64, 20)
+        >>> flash.read_to_file("backup.bin", 0, 1 << 20)
+        >>> flash.write_from_file("firmware.bin")
+        >>> flash.stats()['bytes_per_second']
+    """
+    PAGE_SIZE = 256
+    SECTOR_SIZE = 4096
+
+    WRITE_ENABLE = 0x06
+    READ_STATUS = 0x05
+    FAST_READ = 0x0B
+    PAGE_PROGRAM = 0x02
+    SECTOR_ERASE = 0x20
+    JEDEC_ID = 0x9F
+
+    STATUS_WIP = 0x01
+
+    # Opcode, three address bytes and a dummy byte precede fast read data
+    FAST_READ_HEADER = 5
+
+    def __init__(self, device, poll_interval=0.0):
+        #print "flash.py:SPIFlash:__init__"
+        """Constructor.
+
+        Arguments:
+          device: An MCP2210 whose transfer settings select the flash.
+          poll_interval: Seconds to sleep between status polls while the flash is busy. Each poll is
+            already a USB round trip, so the default is not to sleep at all.
+        """
+        self.device = device
+        self.poll_interval = poll_interval
+        # Largest fast read that fits in one SPI transaction
+        self.read_size = device.MAX_TRANSACTION_SIZE - self.FAST_READ_HEADER
+        self._read_command = bytearray(device.MAX_TRANSACTION_SIZE)
+        self._read_buffer = bytearray(device.MAX_TRANSACTION_SIZE)
+        self.reset_stats()
+
+    def reset_stats(self):
+        #print "flash.py:SPIFlash:reset_stats"
+        self.bytes_read = 0
+        self.bytes_programmed = 0
+        self.pages_programmed = 0
+        self.pages_skipped = 0
+        self.sectors_erased = 0
+        self.wip_wait_time = 0.0
+        self.elapsed = 0.0
+
+    def stats(self):
+        #print "flash.py:SPIFlash:stats"
+        """Returns a dict of transfer counts, time spent waiting on the WIP bit, and overall throughput.
+
+        bytes_per_second counts bytes read and programmed over the time spent in read_to_file and
+        write_from_file.
+        """
+        moved = self.bytes_read + self.bytes_programmed
+        return {
+            'bytes_read': self.bytes_read,
+            'bytes_programmed': self.bytes_programmed,
+            'pages_programmed': self.pages_programmed,
+            'pages_skipped': self.pages_skipped,
+            'sectors_erased': self.sectors_erased,
+            'wip_wait_time': self.wip_wait_time,
+            'elapsed': self.elapsed,
+            'bytes_per_second': moved / self.elapsed if self.elapsed else 0.0,
+        }
+
+    @staticmethod
+    def _address(opcode, address):
+        #print "flash.py:SPIFlash:_address"
+        return struct.pack('>I', (opcode << 24) | (address & 0xFFFFFF))
+
+    def jedec_id(self):
+        #print "flash.py:SPIFlash:jedec_id"
+        """Returns the (manufacturer, memory type, capacity) bytes identifying the flash."""
+        return tuple(bytearray(self.device.transfer(bytearray([self.JEDEC_ID, 0, 0, 0]))[1:]))
+
+    def read_status(self):
+        #print "flash.py:SPIFlash:read_status"
+        return bytearray(self.device.transfer(bytearray([self.READ_STATUS, 0])))[1]
+
+    def wait_ready(self):
+        #print "flash.py:SPIFlash:wait_ready"
+        """Polls the status register until the write-in-progress bit clears.
+
+        Returns:
+          The number of seconds spent waiting, which is also added to wip_wait_time.
+        """
+        start = monotonic()
+        while self.read_status() & self.STATUS_WIP:
+            if self.poll_interval:
+                time.sleep(self.poll_interval)
+        waited = monotonic() - start
+        self.wip_wait_time += waited
+        return waited
+
+    def write_enable(self):
+        #print "flash.py:SPIFlash:write_enable"
+        self.device.transfer(bytearray([self.WRITE_ENABLE]))
+
+    def _fast_read_into(self, address, rx):
+        #print "flash.py:SPIFlash:_fast_read_into"
+        """Fast-reads into memoryview rx in one SPI transaction.
+
+        The first FAST_READ_HEADER bytes of rx receive whatever the flash clocks out during the command,
+        and the rest the data from address onwards, up to read_size bytes.
+        """
+        size = len(rx)
+        self._read_command[:4] = self._address(self.FAST_READ, address)
+        self.device.transfer_into(memoryview(self._read_command)[:size], rx)
+        self.bytes_read += size - self.FAST_READ_HEADER
+
+    def _fast_read(self, address, length):
+        #print "flash.py:SPIFlash:_fast_read"
+        """Fast-reads up to read_size bytes in one SPI transaction, returning a view of the data."""
+        size = self.FAST_READ_HEADER + length
+        self._fast_read_into(address, memoryview(self._read_buffer)[:size])
+        return memoryview(self._read_buffer)[self.FAST_READ_HEADER:size]
+
+    def read_into(self, address, buffer):
+        #print "flash.py:SPIFlash:read_into"
+        """Fast-reads len(buffer) bytes starting at address into a writable buffer."""
+        view = memoryview(buffer)
+        for offset in range(0, len(view), self.read_size):
+            length = min(len(view) - offset, self.read_size)
+            view[offset:offset + length] = self._fast_read(address + offset, length)
+
+    def read(self, address, length):
+        #print "flash.py:SPIFlash:read"
+        """Fast-reads length bytes starting at address."""
+        data = bytearray(length)
+        self.read_into(address, data)
+        return bytes(data)
+
+    def page_program(self, address, data):
+        #print "flash.py:SPIFlash:page_program"
+        """Programs up to a page of data at address and waits for it to complete.
+
+        Data that runs past the end of the page wraps around to its start, as the flash itself does.
+        """
+        self.write_enable()
+        self.device.transfer(self._address(self.PAGE_PROGRAM, address) + bytes(data))
+        self.wait_ready()
+        self.bytes_programmed += len(data)
+        self.pages_programmed += 1
+
+    def sector_erase(self, address):
+        #print "flash.py:SPIFlash:sector_erase"
+        """Erases the sector containing address to 0xFF and waits for it to complete."""
+        self.write_enable()
+        self.device.transfer(self._address(self.SECTOR_ERASE, address))
+        self.wait_ready()
+        self.sectors_erased += 1
+
+    def read_to_file(self, path, address, length):
+        #print "flash.py:SPIFlash:read_to_file"
+        """Reads length bytes starting at address into the file at path, through a memory map.
+
+        The file is created or truncated to length bytes.
+        """
+        start = monotonic()
+        with open(path, 'w+b') as f:
+            f.truncate(length)
+            if not length:
+                return
+            image = mmap.mmap(f.fileno(), length)
+            try:
+                self._read_to_map(image, address, length)
+                image.flush()
+            finally:
+                image.close()
+        self.elapsed += monotonic() - start
+
+    def _read_to_map(self, image, address, length):
+        #print "flash.py:SPIFlash:_read_to_map"
+        """Fast-reads length bytes starting at address into mmap image.
+
+        Each fast read clocks in FAST_READ_HEADER bytes ahead of its data. Reading the chunks last first
+        lets those bytes land on the end of the chunk before, which is only read afterwards, so every chunk
+        but the first is received straight into the map without an intermediate copy.
+        """
+        try:
+            view = memoryview(image)
+        except TypeError:
+            # Python 2's mmap doesn't export the buffer interface, so copy each chunk in
+            for offset in range(0, length, self.read_size):
+                chunk = min(length - offset, self.read_size)
+                image[offset:offset + chunk] = self._fast_read(address + offset, chunk).tobytes()
+            return
+        try:
+            for offset in reversed(range(self.read_size, length, self.read_size)):
+                chunk = min(length - offset, self.read_size)
+                self._fast_read_into(address + offset, view[offset - self.FAST_READ_HEADER:offset + chunk])
+            chunk = min(length, self.read_size)
+            view[:chunk] = self._fast_read(address, chunk)
+        finally:
+            # The map can't be closed while a view of it exists
+            del view
+
+    def write_from_file(self, path, address=0, verify=True):
+        #print "flash.py:SPIFlash:write_from_file"
+        """Programs the contents of the file at path into the flash starting at address.
+
+        Each sector is read first. Sectors that already match are left alone; sectors where the target
+        data needs some bit changed from 0 to 1 are erased; then only the pages that differ from the
+        flash contents are programmed. If the image ends part way through a sector, the rest of that
+        sector keeps its contents.
+
+        Arguments:
+          path: Image file to program, which is memory-mapped rather than read into memory.
+          address: Flash address to program it at, which must be sector aligned.
+          verify: If True, each modified sector is read back and a VerificationError raised on mismatch.
+
+        Returns:
+          The dict returned by stats().
+        """
+        if address % self.SECTOR_SIZE:
+            raise ValueError("Address 0x%x is not aligned to a %d byte sector" % (address, self.SECTOR_SIZE))
+        start = monotonic()
+        with open(path, 'rb') as f:
+            f.seek(0, 2)
+            if not f.tell():
+                return self.stats()
+            image = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for offset in range(0, len(image), self.SECTOR_SIZE):
+                    self._write_sector(address + offset, image[offset:offset + self.SECTOR_SIZE], verify)
+            finally:
+                image.close()
+        self.elapsed += monotonic() - start
+        return self.stats()
+
+    def _write_sector(self, address, target, verify):
+        #print "flash.py:SPIFlash:_write_sector"
+        current = self.read(address, self.SECTOR_SIZE)
+        # An image ending part way through the sector leaves the rest of it as it was, so that data is
+        # reprogrammed if the sector has to be erased
+        target = target + current[len(target):]
+        if current == target:
+            self.pages_skipped += self.SECTOR_SIZE // self.PAGE_SIZE
+            return
+
+        if any(c & t != t for c, t in zip(bytearray(current), bytearray(target))):
+            self.sector_erase(address)
+            current = b'\xff' * self.SECTOR_SIZE
+
+        for page in range(0, self.SECTOR_SIZE, self.PAGE_SIZE):
+            data = target[page:page + self.PAGE_SIZE]
+            if data == current[page:page + self.PAGE_SIZE]:
+                self.pages_skipped += 1
+            else:
+                self.page_program(address + page, data)
+
+        if verify and self.read(address, self.SECTOR_SIZE) != target:
+            raise VerificationError("Flash sector at 0x%.6x doesn't match the image after programming" % address)
@@ -0,0 +1,198 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from mcp2210.device import MCP2210
+from mcp2210.transport import DEFAULT_VID, DEFAULT_PID, HIDTransport, enumerate_devices
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+
+class DeviceWorker(object):
+    #print "manager.py:DeviceWorker"
+    """Runs jobs against one MCP2210 on a dedicated thread, in submission order.
+
+    Every method returns a concurrent.futures.Future, so jobs on different adapters proceed in parallel
+    while commands to the same adapter are never interleaved.
+    """
+
+    def __init__(self, name, device):
+        #print "manager.py:DeviceWorker:__init__"
+        """Constructor.
+
+        Arguments:
+          name: Name of the adapter, normally its USB serial number.
+          device: An open MCP2210.
+        """
+        self.name = name
+        self.device = device
+        self.jobs = 0
+        self.bytes = 0
+        self.busy_time = 0.0
+        self.first_start = None
+        self.last_end = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def submit(self, fn, *args, **kwargs):
+        #print "manager.py:DeviceWorker:submit"
+        """Queues fn(device, *args, **kwargs) to run on the worker thread.
+
+        Returns:
+          A Future for the result of fn.
+        """
+        return self._executor.submit(self._run, 0, fn, args, kwargs)
+
+    def transfer(self, data):
+        #print "manager.py:DeviceWorker:transfer"
+        """Queues an SPI transfer, returning a Future for the received data."""
+        return self._executor.submit(self._run, len(data), MCP2210.transfer, (data,), {})
+
+    def transfer_into(self, data, rx_buffer):
+        #print "manager.py:DeviceWorker:transfer_into"
+        """Queues an SPI transfer into rx_buffer, returning a Future for the number of bytes received."""
+        return self._executor.submit(self._run, len(data), MCP2210.transfer_into, (data, rx_buffer), {})
+
+    def _run(self, size, fn, args, kwargs):
+        #print "manager.py:DeviceWorker:_run"
+        start = monotonic()
+        try:
+            return fn(self.device, *args, **kwargs)
+        finally:
+            end = monotonic()
+            with self._lock:
+                self.jobs += 1
+                self.bytes += size
+                self.busy_time += end - start
+                if self.first_start is None:
+                    self.first_start = start
+                self.last_end = end
+
+    @property
+    def stats(self):
+        #print "manager.py:DeviceWorker:stats(@property)"
+        """Dict of jobs run, SPI bytes transferred, seconds spent busy and throughput in bytes/second."""
+        return self._snapshot()[0]
+
+    def _snapshot(self):
+        #print "manager.py:DeviceWorker:_snapshot"
+        """Returns (stats, first_start, last_end), all read under the lock so they agree with each other."""
+        with self._lock:
+            stats = {
+                'jobs': self.jobs,
+                'bytes': self.bytes,
+                'busy_time': self.busy_time,
+                'throughput': self.bytes / self.busy_time if self.busy_time else 0.0,
+            }
+            return stats, self.first_start, self.last_end
+
+    def close(self):
+        #print "manager.py:DeviceWorker:close"
+        """Waits for queued jobs to finish, then closes the device."""
+        self._executor.shutdown(wait=True)
+        self.device.transport.close()
+
+
+class DeviceManager(object):
+    #print "manager.py:DeviceManager"
+    """Drives every attached MCP2210 from one process, each from its own worker thread.
+
+    Usage:
+        >>> manager = DeviceManager()
+        >>> manager.open_all()
+        >>> futures = manager.transfer_all("data")
+        >>> results = dict((name, future.result()) for name, future in futures.items())
+        >>> manager.stats()['total']['throughput']
+    """
+
+    def __init__(self, vid=DEFAULT_VID, pid=DEFAULT_PID):
+        #print "manager.py:DeviceManager:__init__"
+        """Constructor.
+
+        Arguments:
+          vid: Vendor ID of the adapters to manage.
+          pid: Product ID of the adapters to manage.
+        """
+        self.vid = vid
+        self.pid = pid
+        self.workers = {}
+
+    def open_all(self):
+        #print "manager.py:DeviceManager:open_all"
+        """Opens every attached adapter not already open, by hidapi path.
+
+        Adapters are named by USB serial number, or by path if they report none.
+
+        Returns:
+          The names of the newly opened adapters.
+        """
+        opened = []
+        for info in enumerate_devices(self.vid, self.pid):
+            name = info.get('serial_number') or info['path']
+            if name not in self.workers:
+                transport = HIDTransport(path=info['path'])
+                self.add(name, MCP2210(transport=transport, serial=info.get('serial_number')))
+                opened.append(name)
+        return opened
+
+    def add(self, name, device):
+        #print "manager.py:DeviceManager:add"
+        """Adds an already open MCP2210, such as one using a simulator transport, under name."""
+        self.workers[name] = DeviceWorker(name, device)
+        return self.workers[name]
+
+    def __getitem__(self, name):
+        #print "manager.py:DeviceManager:__getitem__"
+        return self.workers[name]
+
+    def __iter__(self):
+        #print "manager.py:DeviceManager:__iter__"
+        return iter(self.workers.values())
+
+    def __len__(self):
+        #print "manager.py:DeviceManager:__len__"
+        return len(self.workers)
+
+    def map(self, fn, *args, **kwargs):
+        #print "manager.py:DeviceManager:map"
+        """Queues fn(device, *args, **kwargs) on every adapter, returning a dict of name to Future."""
+        return dict((name, worker.submit(fn, *args, **kwargs)) for name, worker in self.workers.items())
+
+    def transfer_all(self, data):
+        #print "manager.py:DeviceManager:transfer_all"
+        """Queues the same SPI transfer on every adapter, returning a dict of name to Future."""
+        return dict((name, worker.transfer(data)) for name, worker in self.workers.items())
+
+    def stats(self):
+        #print "manager.py:DeviceManager:stats"
+        """Returns throughput statistics for each adapter by name, plus their aggregate under 'total'.
+
+        The aggregate throughput is the total bytes divided by the wall clock time from the first job
+        starting on any adapter to the last one finishing, so it reflects how well the adapters overlap.
+        """
+        stats = {}
+        started = []
+        ended = []
+        for name, worker in self.workers.items():
+            stats[name], first_start, last_end = worker._snapshot()
+            if first_start is not None:
+                started.append(first_start)
+                ended.append(last_end)
+        total = {
+            'jobs': sum(s['jobs'] for s in stats.values()),
+            'bytes': sum(s['bytes'] for s in stats.values()),
+            'busy_time': sum(s['busy_time'] for s in stats.values()),
+        }
+        elapsed = max(ended) - min(started) if started else 0
+        total['throughput'] = total['bytes'] / elapsed if elapsed else 0.0
+        stats['total'] = total
+        return stats
+
+    def close(self):
+        #print "manager.py:DeviceManager:close"
+        """Finishes queued jobs and closes every adapter."""
+        for worker in self.workers.values():
+            worker.close()
+        self.workers.clear()
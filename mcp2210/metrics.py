@@ -0,0 +1,293 @@
+from bisect import bisect_left
+import os
+
+from mcp2210 import commands
+from mcp2210.capture import command_key, command_name
+from mcp2210.transport import Transport
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+
+# Upper bounds, in seconds, of the command latency histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Phases of a command that time is accounted to
+PHASES = ('encode', 'write', 'read', 'decode')
+
+
+class _CommandMetrics(object):
+    #print "metrics.py:_CommandMetrics"
+    """Counters for one command class."""
+    __slots__ = ('count', 'timeouts', 'bytes_out', 'bytes_in', 'spi_sent', 'spi_received', 'encode_time',
+                 'write_time', 'read_time', 'decode_time', 'latency_sum', 'buckets')
+
+    def __init__(self, buckets):
+        #print "metrics.py:_CommandMetrics:__init__"
+        self.count = 0
+        self.timeouts = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.spi_sent = 0
+        self.spi_received = 0
+        self.encode_time = 0.0
+        self.write_time = 0.0
+        self.read_time = 0.0
+        self.decode_time = 0.0
+        self.latency_sum = 0.0
+        # One count per bucket, plus one for latencies beyond the last
+        self.buckets = [0] * (buckets + 1)
+
+
+def _number(value):
+    #print "metrics.py:_number"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    #print "metrics.py:_escape"
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics(object):
+    #print "metrics.py:Metrics"
+    """Counts and times every command exchanged with an MCP2210, for export to Prometheus.
+
+    Per command class it keeps the number of commands, the error statuses returned, report and SPI
+    payload bytes, a histogram of round trip latency from writing the command to reading its response,
+    and the total time spent encoding the command, writing it, waiting for and reading the response,
+    and decoding it. Encoding and decoding are timed for sendCommand() and execute(); SPI transfers
+    build their reports in place, so only their writes and reads are timed. Commands are keyed by
+    capture.command_key(), so each boot settings command is counted separately. A command counts as timed
+    out once when no response arrives in time; responses drained afterwards aren't counted at all.
+
+    Updating costs a few clock reads and counter increments per command, a microsecond or two, so it
+    can be left on. Like tracing, it costs nothing at all until enabled.
+
+    Usage:
+        >>> dev.metrics = Metrics(labels={'adapter': 'bench-1'})
+        >>> dev.transfer(b"data")
+        >>> dev.metrics.snapshot()['SPITransfer']['count']
+        >>> dev.metrics.export("/var/lib/node_exporter/mcp2210.prom")  # Or a function taking the text
+        >>> dev.metrics = None
+    """
+
+    def __init__(self, labels=None, buckets=LATENCY_BUCKETS, prefix='mcp2210'):
+        #print "metrics.py:Metrics:__init__"
+        """Constructor.
+
+        Arguments:
+          labels: Dict of Prometheus labels added to every sample, such as the adapter's serial number.
+          buckets: Upper bounds of the latency histogram buckets, in seconds, in increasing order.
+          prefix: Prefix of the exported metric names.
+        """
+        self.labels = dict(labels or {})
+        self.bucket_bounds = tuple(buckets)
+        self.prefix = prefix
+        self.reset()
+
+    def reset(self):
+        #print "metrics.py:Metrics:reset"
+        self._commands = {}
+        # (command key, status) to the number of responses with that non-zero status
+        self.statuses = {}
+
+    def _command(self, key):
+        #print "metrics.py:Metrics:_command"
+        metrics = self._commands.get(key)
+        if metrics is None:
+            metrics = self._commands[key] = _CommandMetrics(len(self.bucket_bounds))
+        return metrics
+
+    def record_encode(self, key, seconds):
+        #print "metrics.py:Metrics:record_encode"
+        """Records the time taken to encode a command with a capture.command_key() into its report."""
+        self._command(key).encode_time += seconds
+
+    def record_decode(self, key, seconds):
+        #print "metrics.py:Metrics:record_decode"
+        self._command(key).decode_time += seconds
+
+    def record_write(self, key, length, seconds):
+        #print "metrics.py:Metrics:record_write"
+        metrics = self._command(key)
+        metrics.count += 1
+        metrics.bytes_out += length
+        metrics.write_time += seconds
+
+    def record_read(self, key, length, status, seconds, latency, spi_sent=0, spi_received=0):
+        #print "metrics.py:Metrics:record_read"
+        """Records a response: its length, status, the time reading it took, and the round trip latency
+        since its command was written. SPI payload bytes only count when the status is success."""
+        metrics = self._command(key)
+        metrics.bytes_in += length
+        metrics.read_time += seconds
+        metrics.latency_sum += latency
+        metrics.buckets[bisect_left(self.bucket_bounds, latency)] += 1
+        if status:
+            self.statuses[key, status] = self.statuses.get((key, status), 0) + 1
+        else:
+            metrics.spi_sent += spi_sent
+            metrics.spi_received += spi_received
+
+    def record_timeout(self, key, seconds):
+        #print "metrics.py:Metrics:record_timeout"
+        metrics = self._command(key)
+        metrics.timeouts += 1
+        metrics.read_time += seconds
+
+    def snapshot(self):
+        #print "metrics.py:Metrics:snapshot"
+        """Returns the current values as a dict of command name to a dict of counters.
+
+        Each holds count, timeouts, bytes_out, bytes_in, spi_sent and spi_received; encode, write, read
+        and decode seconds; statuses, a dict of non-zero status to count; and latency, a dict with the
+        sum of latencies and a list of (upper bound, cumulative count) buckets ending with infinity.
+        """
+        result = {}
+        for key, metrics in self._commands.items():
+            cumulative = 0
+            buckets = []
+            for bound, count in zip(self.bucket_bounds + (float('inf'),), metrics.buckets):
+                cumulative += count
+                buckets.append((bound, cumulative))
+            result[command_name(key)] = {
+                'count': metrics.count,
+                'timeouts': metrics.timeouts,
+                'bytes_out': metrics.bytes_out,
+                'bytes_in': metrics.bytes_in,
+                'spi_sent': metrics.spi_sent,
+                'spi_received': metrics.spi_received,
+                'encode': metrics.encode_time,
+                'write': metrics.write_time,
+                'read': metrics.read_time,
+                'decode': metrics.decode_time,
+                'statuses': dict((status, count) for (k, status), count in self.statuses.items() if k == key),
+                'latency': {'sum': metrics.latency_sum, 'buckets': buckets},
+            }
+        return result
+
+    def _sample(self, name, labels, value):
+        #print "metrics.py:Metrics:_sample"
+        labels = sorted(list(self.labels.items()) + labels)
+        text = ','.join('%s="%s"' % (key, _escape(label)) for key, label in labels)
+        if text:
+            return '%s_%s{%s} %s' % (self.prefix, name, text, _number(value))
+        return '%s_%s %s' % (self.prefix, name, _number(value))
+
+    def prometheus_text(self):
+        #print "metrics.py:Metrics:prometheus_text"
+        """Renders the current values in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        families = [
+            ('commands_total', 'counter', "Commands sent to the MCP2210", lambda s: [([], s['count'])]),
+            ('command_timeouts_total', 'counter', "Commands the MCP2210 did not answer in time",
+             lambda s: [([], s['timeouts'])]),
+            ('command_status_total', 'counter', "Responses with a non-zero status",
+             lambda s: [([('status', '0x%.2x' % status),
+                          ('message', commands.STATUS_MESSAGES.get(status, "Unknown status"))], count)
+                        for status, count in sorted(s['statuses'].items())]),
+            ('report_bytes_total', 'counter', "Bytes of HID reports moved over USB",
+             lambda s: [([('direction', 'out')], s['bytes_out']), ([('direction', 'in')], s['bytes_in'])]),
+            ('spi_bytes_total', 'counter', "SPI payload bytes accepted and returned",
+             lambda s: [([('direction', 'sent')], s['spi_sent']),
+                        ([('direction', 'received')], s['spi_received'])]),
+            ('phase_seconds_total', 'counter', "Seconds spent in each phase of a command",
+             lambda s: [([('phase', phase)], s[phase]) for phase in PHASES]),
+        ]
+        lines = []
+        for name, kind, help, samples in families:
+            lines.append('# HELP %s_%s %s' % (self.prefix, name, help))
+            lines.append('# TYPE %s_%s %s' % (self.prefix, name, kind))
+            for command, stats in sorted(snapshot.items()):
+                for labels, value in samples(stats):
+                    lines.append(self._sample(name, [('command', command)] + labels, value))
+
+        name = 'command_latency_seconds'
+        lines.append('# HELP %s_%s Round trip time from writing a command to reading its response'
+                     % (self.prefix, name))
+        lines.append('# TYPE %s_%s histogram' % (self.prefix, name))
+        for command, stats in sorted(snapshot.items()):
+            latency = stats['latency']
+            for bound, count in latency['buckets']:
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(self._sample(name + '_bucket', [('command', command), ('le', le)], count))
+            lines.append(self._sample(name + '_sum', [('command', command)], latency['sum']))
+            lines.append(self._sample(name + '_count', [('command', command)], latency['buckets'][-1][1]))
+        return '\n'.join(lines) + '\n'
+
+    def export(self, target):
+        #print "metrics.py:Metrics:export"
+        """Exports the current values in the Prometheus text format.
+
+        Arguments:
+          target: A path to write to, replaced atomically so a collector such as node_exporter's
+            textfile collector never reads a partial file, or a function called with the text.
+        """
+        text = self.prometheus_text()
+        if callable(target):
+            target(text)
+            return
+        with open(target + '.tmp', 'w') as f:
+            f.write(text)
+        getattr(os, 'replace', os.rename)(target + '.tmp', target)
+
+
+class MeteredTransport(Transport):
+    #print "metrics.py:MeteredTransport"
+    """Wraps another transport, timing every report written and read into a Metrics.
+
+    MCP2210 installs one when its metrics attribute is set, so it rarely needs to be used directly.
+    """
+
+    def __init__(self, transport, metrics):
+        #print "metrics.py:MeteredTransport:__init__"
+        self.transport = transport
+        self.metrics = metrics
+        self._key = None
+        self._spi = False
+        self._spi_length = 0
+        self._sent = 0.0
+        # True from writing a command until its response, or the timeout waiting for it, is read
+        self._pending = False
+
+    def write(self, report):
+        #print "metrics.py:MeteredTransport:write"
+        command = report[0]
+        key = self._key = command_key(command, report[1])
+        self._spi = command == commands.SPITransferCommand.COMMAND
+        self._spi_length = report[1] if self._spi else 0
+        start = monotonic()
+        self.transport.write(report)
+        self._sent = end = monotonic()
+        self._pending = True
+        self.metrics.record_write(key, len(report), end - start)
+
+    def read_into(self, report, timeout=None):
+        #print "metrics.py:MeteredTransport:read_into"
+        if not self._pending:
+            # Draining responses to commands that timed out
+            return self.transport.read_into(report, timeout)
+        start = monotonic()
+        length = self.transport.read_into(report, timeout)
+        end = monotonic()
+        if not length:
+            self._pending = False
+            self.metrics.record_timeout(self._key, end - start)
+        elif report[0] != self._key[0]:
+            # A late response to an earlier command, which the device discards
+            pass
+        elif self._spi:
+            self._pending = False
+            self.metrics.record_read(self._key, length, report[1], end - start, end - self._sent,
+                                     self._spi_length, report[2])
+        else:
+            self._pending = False
+            self.metrics.record_read(self._key, length, report[1], end - start, end - self._sent)
+        return length
+
+    def close(self):
+        #print "metrics.py:MeteredTransport:close"
+        self.transport.close()
@@ -0,0 +1,130 @@
+import threading
+import time
+
+from mcp2210 import commands
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+
+class EventMonitor(object):
+    #print "monitor.py:EventMonitor"
+    """Polls an MCP2210's interrupt event counter and chip status, delivering changes to callbacks.
+
+    Counting happens in the chip, so pulses on GP6 are counted at whatever rate they arrive, while each
+    poll costs just one command per kind of callback registered - the counter is read and reset in a
+    single command. Polls run either from poll(), or on a dedicated thread between start() and stop().
+
+    While the thread runs it has the device to itself; don't send it other commands from other threads.
+
+    Usage:
+        >>> dev.configure_event_counter(commands.EVENT_COUNT_RISING_EDGES)
+        >>> monitor = EventMonitor(dev, interval=0.01)
+        >>> monitor.on_count(on_pulses)  # Called as on_pulses(delta, total, timestamp)
+        >>> monitor.on_bus_owner(on_owner)  # Called as on_owner(old, new, timestamp)
+        >>> with monitor:
+        ...     time.sleep(10)
+        >>> monitor.total
+    """
+
+    def __init__(self, device, interval=0.01):
+        #print "monitor.py:EventMonitor:__init__"
+        """Constructor.
+
+        Arguments:
+          device: The MCP2210 to poll. Its event counter is reset by every poll.
+          interval: Seconds between polls on the monitor thread.
+        """
+        self.device = device
+        self.interval = interval
+        self.total = 0
+        self.bus_owner = None
+        self.polls = 0
+        self.error = None
+        self._count_callbacks = []
+        self._owner_callbacks = []
+        self._counter = commands.encoder_for(commands.ResetEventCounterCommand)
+        self._status = commands.encoder_for(commands.GetChipStatusCommand)
+        self._running = False
+        self._thread = None
+
+    def on_count(self, callback):
+        #print "monitor.py:EventMonitor:on_count"
+        """Registers callback(delta, total, timestamp), called after each poll that counted new events."""
+        self._count_callbacks.append(callback)
+
+    def on_bus_owner(self, callback):
+        #print "monitor.py:EventMonitor:on_bus_owner"
+        """Registers callback(old, new, timestamp), called when the SPI bus owner changes.
+
+        Owners are commands.BUS_OWNER_ values; old is None on the first poll.
+        """
+        self._owner_callbacks.append(callback)
+
+    def poll(self):
+        #print "monitor.py:EventMonitor:poll"
+        """Polls the device once, calling any callbacks due."""
+        self.polls += 1
+        if self._count_callbacks:
+            delta = self.device.execute(self._counter).count
+            if delta:
+                self.total += delta
+                timestamp = monotonic()
+                for callback in self._count_callbacks:
+                    callback(delta, self.total, timestamp)
+        if self._owner_callbacks:
+            owner = self.device.execute(self._status).bus_owner
+            if owner != self.bus_owner:
+                old, self.bus_owner = self.bus_owner, owner
+                timestamp = monotonic()
+                for callback in self._owner_callbacks:
+                    callback(old, owner, timestamp)
+
+    def start(self):
+        #print "monitor.py:EventMonitor:start"
+        """Starts polling on a new thread."""
+        if self._running:
+            return
+        self.error = None
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="mcp2210-event-monitor")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        #print "monitor.py:EventMonitor:stop"
+        """Stops polling and waits for the thread to exit, re-raising any error it stopped on."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        #print "monitor.py:EventMonitor:__enter__"
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        #print "monitor.py:EventMonitor:__exit__"
+        self.stop()
+
+    def _run(self):
+        #print "monitor.py:EventMonitor:_run"
+        next_poll = monotonic()
+        try:
+            while self._running:
+                self.poll()
+                next_poll += self.interval
+                delay = next_poll - monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    # Fell behind; poll again straight away but don't try to catch up
+                    next_poll = monotonic()
+        except Exception as e:
+            self.error = e
+            self._running = False
@@ -0,0 +1,308 @@
+"""Provisions adapters from a golden configuration, sending each only the commands it needs.
+
+A golden configuration is a JSON object with any of these keys:
+  manufacturer_name, product_name: USB strings.
+  boot_chip_settings, chip_settings: Objects with any of the commands.ChipSettings fields.
+  boot_transfer_settings, transfer_settings: Objects with any of the commands.SPISettings fields.
+  boot_usb_settings: Object with any of the commands.USBSettings fields.
+  eeprom: Object of start address to hex string of the bytes from there, such as {"0x00": "c0ffee"}.
+
+Settings fields and EEPROM bytes the configuration leaves out are left as they are on each adapter.
+For example:
+
+    {
+      "product_name": "Sensor bridge",
+      "boot_transfer_settings": {"bit_rate": 4000000, "spi_mode": 3},
+      "boot_chip_settings": {"pin_designations": [1, 1, 1, 0, 0, 0, 2, 0, 0]},
+      "eeprom": {"0x00": "0102"}
+    }
+
+Run it on every attached adapter with:
+    python -m mcp2210.provision golden.json
+
+or write a golden configuration from a reference adapter with:
+    python -m mcp2210.provision --dump golden.json
+"""
+import binascii
+from ctypes import Array
+import json
+import sys
+
+from mcp2210 import commands
+from mcp2210.device import VerificationError
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+
+# Settings that can be provisioned, with the structure each holds, or None for strings. Strings go
+# first, since the boot chip settings may password-protect the chip.
+SETTINGS = (
+    ('manufacturer_name', None),
+    ('product_name', None),
+    ('boot_usb_settings', commands.USBSettings),
+    ('boot_transfer_settings', commands.SPISettings),
+    ('transfer_settings', commands.SPISettings),
+    ('boot_chip_settings', commands.ChipSettings),
+    ('chip_settings', commands.ChipSettings),
+)
+
+# Fields the chip never reports back, so they can't be compared. A setting whose configuration
+# includes one is always sent.
+WRITE_ONLY_FIELDS = frozenset(['new_password'])
+
+
+def settings_to_dict(settings):
+    #print "provision.py:settings_to_dict"
+    """Converts a settings structure to a dict of its fields, as used in golden configurations."""
+    result = {}
+    for name, kind in settings._fields_:
+        if name in WRITE_ONLY_FIELDS:
+            continue
+        value = getattr(settings, name)
+        result[name] = list(value) if isinstance(value, Array) else value
+    return result
+
+
+def _merge(settings, values):
+    #print "provision.py:_merge"
+    """Returns a copy of settings with the fields in values replaced."""
+    merged = type(settings).from_buffer_copy(settings)
+    for name, value in values.items():
+        if name not in dict(merged._fields_):
+            raise ValueError("%s has no field %r" % (type(settings).__name__, name))
+        if name == 'new_password':
+            value = value.encode('utf-8')
+        if isinstance(value, list):
+            getattr(merged, name)[:len(value)] = value
+        else:
+            setattr(merged, name, value)
+    return merged
+
+
+def _same(a, b):
+    #print "provision.py:_same"
+    """Compares two settings structures, ignoring write only fields."""
+    return settings_to_dict(a) == settings_to_dict(b)
+
+
+def load_config(path):
+    #print "provision.py:load_config"
+    """Reads a golden configuration from a JSON file, checking its keys."""
+    with open(path) as f:
+        config = json.load(f)
+    unknown = set(config) - set(name for name, kind in SETTINGS) - set(['eeprom'])
+    if unknown:
+        raise ValueError("Unknown keys in %s: %s" % (path, ", ".join(sorted(unknown))))
+    return config
+
+
+def _eeprom_bytes(config):
+    #print "provision.py:_eeprom_bytes"
+    """Returns a dict of address to value for the EEPROM bytes in a configuration."""
+    values = {}
+    for start, data in config.get('eeprom', {}).items():
+        start = int(start, 0)
+        for offset, value in enumerate(bytearray(binascii.unhexlify(data))):
+            if not 0 <= start + offset < 256:
+                raise ValueError("EEPROM data at 0x%.2x runs past the end of the EEPROM" % start)
+            values[start + offset] = value
+    return values
+
+
+def snapshot(device, eeprom=True):
+    #print "provision.py:snapshot"
+    """Reads an adapter's configuration in the golden configuration format, for use as a golden one."""
+    device.invalidate_settings()
+    config = {}
+    for name, kind in SETTINGS:
+        value = getattr(device, name)
+        config[name] = value if kind is None else settings_to_dict(value)
+    if eeprom:
+        device.eeprom.invalidate()
+        config['eeprom'] = {'0x00': binascii.hexlify(device.eeprom[0:256]).decode('ascii')}
+    return config
+
+
+class Provisioner(object):
+    #print "provision.py:Provisioner"
+    """Brings adapters into line with a golden configuration.
+
+    Each adapter's current state is read first - only the settings and EEPROM bytes the configuration
+    covers - and compared with the configuration, so only commands that change something are sent.
+    Afterwards the state is read again and checked. With a DeviceManager, every adapter is provisioned
+    at once on its own worker thread.
+
+    Usage:
+        >>> provisioner = Provisioner(load_config("golden.json"))
+        >>> provisioner.diff(dev)  # What would change
+        >>> manager = DeviceManager()
+        >>> manager.open_all()
+        >>> reports = provisioner.provision_all(manager)
+    """
+
+    def __init__(self, config):
+        #print "provision.py:Provisioner:__init__"
+        """Constructor.
+
+        Arguments:
+          config: A golden configuration dict, as from load_config().
+        """
+        self.config = config
+        self._eeprom = _eeprom_bytes(config)
+
+    def diff(self, device):
+        #print "provision.py:Provisioner:diff"
+        """Reads an adapter's state and compares it with the configuration.
+
+        Settings whose configuration includes a write only field, such as a new password, can't be
+        compared, so they are always included.
+
+        Returns:
+          A dict of setting name to the value it should be set to, for each setting that differs, plus
+          under 'eeprom' a dict of address to value for each EEPROM byte that differs.
+        """
+        return self._diff(device, write_only=True)
+
+    def _diff(self, device, write_only):
+        #print "provision.py:Provisioner:_diff"
+        """Implements diff(), only including settings for their write only fields if write_only is True."""
+        device.invalidate_settings()
+        device.eeprom.invalidate()
+        changes = {}
+        for name, kind in SETTINGS:
+            if name not in self.config:
+                continue
+            current = getattr(device, name)
+            if kind is None:
+                if current != self.config[name]:
+                    changes[name] = self.config[name]
+            else:
+                wanted = _merge(current, self.config[name])
+                unreadable = write_only and WRITE_ONLY_FIELDS.intersection(self.config[name])
+                if unreadable or not _same(current, wanted):
+                    changes[name] = wanted
+        eeprom = dict((address, value) for address, value in sorted(self._eeprom.items())
+                      if bytearray(device.eeprom[address])[0] != value)
+        if eeprom:
+            changes['eeprom'] = eeprom
+        return changes
+
+    def apply(self, device, changes):
+        #print "provision.py:Provisioner:apply"
+        """Sends the commands to make changes, as returned by diff().
+
+        Returns:
+          The number of commands sent.
+        """
+        sent = 0
+        for name, kind in SETTINGS:
+            if name in changes:
+                setattr(device, name, changes[name])
+                sent += 1
+        for address, value in sorted(changes.get('eeprom', {}).items()):
+            device.eeprom[address] = value
+            sent += 1
+        return sent
+
+    def provision(self, device, verify=True):
+        #print "provision.py:Provisioner:provision"
+        """Reads an adapter's state, applies the changes it needs, then reads it back to check them.
+
+        Returns:
+          A dict with the names of the settings changed, the number of EEPROM bytes written, the number
+          of commands sent to make the changes, and the seconds taken.
+
+        Raises:
+          VerificationError if the adapter's state still differs from the configuration afterwards.
+        """
+        start = monotonic()
+        changes = self.diff(device)
+        sent = self.apply(device, changes)
+        if verify and changes:
+            # Write only fields can't be read back, so only the rest is checked
+            remaining = self._diff(device, write_only=False)
+            if remaining:
+                raise VerificationError("Settings did not take effect: %s" % ", ".join(sorted(remaining)))
+        return {
+            'changed': sorted(name for name in changes if name != 'eeprom'),
+            'eeprom_bytes': len(changes.get('eeprom', {})),
+            'commands': sent,
+            'seconds': monotonic() - start,
+        }
+
+    def provision_all(self, manager, verify=True):
+        #print "provision.py:Provisioner:provision_all"
+        """Provisions every adapter of a DeviceManager in parallel.
+
+        Returns:
+          A dict of adapter name to a concurrent.futures.Future for its provision() report; a failed
+          adapter's future raises its error without affecting the others.
+        """
+        return manager.map(lambda device: self.provision(device, verify))
+
+
+def main(argv=None):
+    #print "provision.py:main"
+    import argparse
+    from mcp2210.manager import DeviceManager
+
+    parser = argparse.ArgumentParser(description="Provision MCP2210 adapters from a golden configuration")
+    parser.add_argument('config', help="Golden configuration file")
+    parser.add_argument('--dump', action='store_true',
+                        help="Write the configuration of the first attached adapter to the file instead")
+    parser.add_argument('--dry-run', action='store_true', help="Only report what would change")
+    parser.add_argument('--simulate', type=int, default=0, metavar='N',
+                        help="Provision N simulated adapters instead of the attached ones")
+    args = parser.parse_args(argv)
+
+    manager = DeviceManager()
+    if args.simulate:
+        from mcp2210.device import MCP2210
+        from mcp2210.simulator import SimulatedMCP2210
+        for i in range(args.simulate):
+            manager.add("sim%d" % i, MCP2210(transport=SimulatedMCP2210()))
+    else:
+        manager.open_all()
+    if not len(manager):
+        sys.exit("No adapters found")
+
+    try:
+        if args.dump:
+            worker = sorted(manager, key=lambda worker: worker.name)[0]
+            config = worker.submit(snapshot).result()
+            with open(args.config, 'w') as f:
+                json.dump(config, f, indent=2, sort_keys=True)
+            return
+
+        provisioner = Provisioner(load_config(args.config))
+        start = monotonic()
+        if args.dry_run:
+            futures = manager.map(provisioner.diff)
+        else:
+            futures = provisioner.provision_all(manager)
+        failed = 0
+        for name, future in sorted(futures.items()):
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                print("%s: failed: %s" % (name, e))
+                continue
+            if args.dry_run:
+                print("%s: %s" % (name, ", ".join(sorted(result)) or "up to date"))
+            else:
+                print("%s: %d commands, changed %s, %d EEPROM bytes, %.3fs" % (
+                    name, result['commands'], ", ".join(result['changed']) or "nothing",
+                    result['eeprom_bytes'], result['seconds']))
+        print("%d adapters in %.3fs, %d failed" % (len(futures), monotonic() - start, failed))
+    finally:
+        manager.close()
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
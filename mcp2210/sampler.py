@@ -0,0 +1,204 @@
+from array import array
+import threading
+import time
+
+from mcp2210 import commands
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+
+class GPIOSampler(object):
+    #print "sampler.py:GPIOSampler"
+    """Samples the GPIO pins of an MCP2210 as fast as the bus allows, on a dedicated thread.
+
+    Each sample is a (timestamp, gpio_word) pair, stored in a ring buffer allocated up front: NumPy arrays
+    if NumPy is installed, otherwise arrays from the standard library. Timestamps are monotonic() times,
+    taken midway between sending the command and receiving its response. Edge detection and statistics
+    are vectorized with NumPy when it's available.
+
+    While the sampler runs it has the device to itself; don't send it other commands from other threads.
+
+    Usage:
+        >>> sampler = GPIOSampler(dev)
+        >>> sampler.on_change(3, on_button)  # Called as on_button(pin, level, timestamp)
+        >>> with sampler:
+        ...     time.sleep(10)
+        >>> times, levels = sampler.edges(3)
+        >>> sampler.stats()['rate']
+    """
+
+    def __init__(self, device, size=65536, interval=0.0):
+        #print "sampler.py:GPIOSampler:__init__"
+        """Constructor.
+
+        Arguments:
+          device: The MCP2210 to sample.
+          size: Number of samples to keep; once full, the oldest are overwritten.
+          interval: Minimum seconds between samples. By default samples are taken back to back.
+        """
+        self.device = device
+        self.size = size
+        self.interval = interval
+        if numpy is not None:
+            self._times = numpy.zeros(size, dtype=numpy.float64)
+            self._values = numpy.zeros(size, dtype=numpy.uint16)
+        else:
+            self._times = array('d', [0.0]) * size
+            self._values = array('H', [0]) * size
+        self.count = 0
+        self.error = None
+        self._callbacks = {}
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+
+    def on_change(self, pin, callback):
+        #print "sampler.py:GPIOSampler:on_change"
+        """Registers callback(pin, level, timestamp) to be called on the sampling thread when pin changes.
+
+        Callbacks delay the next sample, so they should return quickly.
+        """
+        self._callbacks.setdefault(pin, []).append(callback)
+
+    def start(self):
+        #print "sampler.py:GPIOSampler:start"
+        """Starts sampling on a new thread."""
+        if self._running:
+            return
+        self.error = None
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="mcp2210-gpio-sampler")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        #print "sampler.py:GPIOSampler:stop"
+        """Stops sampling and waits for the thread to exit, re-raising any error it stopped on."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        #print "sampler.py:GPIOSampler:__enter__"
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        #print "sampler.py:GPIOSampler:__exit__"
+        self.stop()
+
+    def clear(self):
+        #print "sampler.py:GPIOSampler:clear"
+        with self._lock:
+            self.count = 0
+
+    def _run(self):
+        #print "sampler.py:GPIOSampler:_run"
+        device = self.device
+        encoder = commands.encoder_for(commands.GetGPIOValueCommand)
+        times = self._times
+        values = self._values
+        size = self.size
+        last = None
+        next_sample = 0.0
+        try:
+            while self._running:
+                if self.interval:
+                    now = monotonic()
+                    if now < next_sample:
+                        time.sleep(next_sample - now)
+                    next_sample = max(next_sample, now) + self.interval
+                sent = monotonic()
+                value = device.execute(encoder).gpio
+                timestamp = (sent + monotonic()) / 2
+                with self._lock:
+                    i = self.count % size
+                    times[i] = timestamp
+                    values[i] = value
+                    self.count += 1
+                if value != last:
+                    if last is not None and self._callbacks:
+                        self._notify(last ^ value, value, timestamp)
+                    last = value
+        except Exception as e:
+            self.error = e
+            self._running = False
+
+    def _notify(self, changed, value, timestamp):
+        #print "sampler.py:GPIOSampler:_notify"
+        for pin, callbacks in self._callbacks.items():
+            if changed & (1 << pin):
+                level = (value >> pin) & 1
+                for callback in callbacks:
+                    callback(pin, level, timestamp)
+
+    def samples(self):
+        #print "sampler.py:GPIOSampler:samples"
+        """Returns copies of the retained (timestamps, gpio_words), oldest first.
+
+        These are NumPy arrays if NumPy is installed, otherwise standard library arrays.
+        """
+        with self._lock:
+            count = self.count
+            if count <= self.size:
+                if numpy is not None:
+                    return self._times[:count].copy(), self._values[:count].copy()
+                return self._times[:count], self._values[:count]
+            i = count % self.size
+            if numpy is not None:
+                return (numpy.concatenate((self._times[i:], self._times[:i])),
+                        numpy.concatenate((self._values[i:], self._values[:i])))
+            return self._times[i:] + self._times[:i], self._values[i:] + self._values[:i]
+
+    def edges(self, pin):
+        #print "sampler.py:GPIOSampler:edges"
+        """Finds the retained samples at which pin changed level.
+
+        Returns:
+          A tuple of (timestamps, levels), giving the time of the first sample after each change and the
+          level the pin changed to: 1 for a rising edge and 0 for a falling one.
+        """
+        times, values = self.samples()
+        if numpy is not None:
+            levels = (values >> pin) & 1
+            changed = numpy.flatnonzero(levels[1:] != levels[:-1]) + 1
+            return times[changed], levels[changed]
+        levels = [(value >> pin) & 1 for value in values]
+        changed = [i for i in range(1, len(levels)) if levels[i] != levels[i - 1]]
+        return [times[i] for i in changed], [levels[i] for i in changed]
+
+    def stats(self):
+        #print "sampler.py:GPIOSampler:stats"
+        """Returns a dict describing the sample timing over the retained samples.
+
+        The keys are samples (the total taken), rate (samples per second), and the mean, minimum and
+        maximum interval between samples, and its standard deviation as jitter, all in seconds.
+        """
+        times, values = self.samples()
+        result = {'samples': self.count, 'rate': 0.0, 'mean_interval': 0.0, 'min_interval': 0.0,
+                  'max_interval': 0.0, 'jitter': 0.0}
+        if len(times) < 2:
+            return result
+        if numpy is not None:
+            intervals = numpy.diff(times)
+            mean = float(intervals.mean())
+            result.update(min_interval=float(intervals.min()), max_interval=float(intervals.max()),
+                          jitter=float(intervals.std()))
+        else:
+            intervals = [b - a for a, b in zip(times, times[1:])]
+            mean = sum(intervals) / len(intervals)
+            result.update(min_interval=min(intervals), max_interval=max(intervals),
+                          jitter=(sum((x - mean) ** 2 for x in intervals) / len(intervals)) ** 0.5)
+        result.update(rate=1.0 / mean if mean else 0.0, mean_interval=mean)
+        return result
@@ -0,0 +1,169 @@
+from concurrent.futures import Future
+
+from mcp2210.commands import SPISettings
+
+
+def _settings_key(settings):
+    #print "scheduler.py:_settings_key"
+    """Returns the bytes of settings other than the transaction size, which is set per transfer anyway."""
+    key = SPISettings.from_buffer_copy(settings)
+    key.spi_tx_size = 0
+    return bytes(bytearray(key))
+
+
+def _chip_selects(settings):
+    #print "scheduler.py:_chip_selects"
+    """Returns the mask of chip select lines a transfer with settings drives.
+
+    Settings that don't change any line between idle and active can't be told apart by slave, so they
+    are treated as driving every line.
+    """
+    return (settings.idle_cs ^ settings.active_cs) or 0xFFFF
+
+
+class _Job(object):
+    #print "scheduler.py:_Job"
+    __slots__ = ('settings', 'key', 'chip_selects', 'data', 'future')
+
+    def __init__(self, settings, data):
+        #print "scheduler.py:_Job:__init__"
+        self.settings = SPISettings.from_buffer_copy(settings)
+        self.key = _settings_key(settings)
+        self.chip_selects = _chip_selects(settings)
+        self.data = data
+        self.future = Future()
+
+
+class TransactionScheduler(object):
+    #print "scheduler.py:TransactionScheduler"
+    """Queues SPI transfers to several slaves and runs them with as few transfer settings changes as possible.
+
+    Each job carries the SPISettings for its slave. When the queue is flushed, jobs with the settings
+    currently on the chip run first, so settings are only sent when they actually change. Jobs that
+    drive a common chip select line always run in the order they were submitted, so a sequence of
+    transfers to one slave - even with different modes or bit rates - is never reordered; only jobs for
+    different slaves are regrouped.
+
+    Usage:
+        >>> sensor = dev.scheduler.submit(sensor_settings, b"\\x80\\0\\0")
+        >>> dev.scheduler.submit(display_settings, frame)
+        >>> dev.scheduler.flush()
+        >>> sensor.result()
+        >>> dev.scheduler.stats()['settings_writes_avoided']
+    """
+
+    def __init__(self, device):
+        #print "scheduler.py:TransactionScheduler:__init__"
+        """Constructor.
+
+        Arguments:
+          device: The MCP2210 to run transfers on.
+        """
+        self.device = device
+        self._pending = []
+        self.reset_stats()
+
+    def reset_stats(self):
+        #print "scheduler.py:TransactionScheduler:reset_stats"
+        self.jobs = 0
+        self.settings_writes = 0
+        self.settings_writes_avoided = 0
+
+    def stats(self):
+        #print "scheduler.py:TransactionScheduler:stats"
+        """Returns a dict of jobs run, settings changes made, and settings changes saved by regrouping.
+
+        Settings changes are counted ignoring the transaction size, which each transfer sets anyway in
+        the same command. The saving is relative to running the jobs in submission order.
+        """
+        return {
+            'jobs': self.jobs,
+            'settings_writes': self.settings_writes,
+            'settings_writes_avoided': self.settings_writes_avoided,
+        }
+
+    def __len__(self):
+        #print "scheduler.py:TransactionScheduler:__len__"
+        return len(self._pending)
+
+    def submit(self, settings, data):
+        #print "scheduler.py:TransactionScheduler:submit"
+        """Queues an SPI transfer of data using settings.
+
+        Arguments:
+          settings: A commands.SPISettings for the slave; spi_tx_size is ignored. It is copied, so the
+            caller may reuse it.
+          data: The data to transfer, as bytes, a bytearray or a memoryview.
+
+        Returns:
+          A concurrent.futures.Future for the received data, resolved by flush().
+        """
+        job = _Job(settings, data)
+        self._pending.append(job)
+        return job.future
+
+    def flush(self):
+        #print "scheduler.py:TransactionScheduler:flush"
+        """Runs every queued job, resolving their futures.
+
+        A job that fails has the exception set on its future, and the remaining jobs still run. Jobs
+        whose futures were cancelled are skipped.
+
+        Returns:
+          The number of jobs run.
+        """
+        jobs, self._pending = self._pending, []
+        current = _settings_key(self.device.transfer_settings)
+
+        naive = 0
+        key = current
+        for job in jobs:
+            if job.key != key:
+                naive += 1
+                key = job.key
+
+        writes = 0
+        for job in self._order(jobs, current):
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            if job.key != current:
+                writes += 1
+                current = job.key
+            self._run(job)
+
+        self.jobs += len(jobs)
+        self.settings_writes += writes
+        self.settings_writes_avoided += naive - writes
+        return len(jobs)
+
+    @staticmethod
+    def _order(jobs, current):
+        #print "scheduler.py:TransactionScheduler:_order"
+        """Yields jobs in run order: the oldest runnable job with the current settings, else the oldest
+        runnable job. A job is runnable once every earlier job sharing a chip select line has run."""
+        pending = list(jobs)
+        while pending:
+            blocked = 0
+            chosen = None
+            for i, job in enumerate(pending):
+                if not job.chip_selects & blocked:
+                    if chosen is None:
+                        chosen = i
+                    if job.key == current:
+                        chosen = i
+                        break
+                blocked |= job.chip_selects
+            job = pending.pop(chosen)
+            current = job.key
+            yield job
+
+    def _run(self, job):
+        #print "scheduler.py:TransactionScheduler:_run"
+        try:
+            settings = job.settings
+            settings.spi_tx_size = min(len(job.data), self.device.MAX_TRANSACTION_SIZE)
+            # Settings and transaction size go in one command; the transfer then finds them already set
+            self.device.transfer_settings = settings
+            job.future.set_result(self.device.transfer(job.data))
+        except Exception as e:
+            job.future.set_exception(e)
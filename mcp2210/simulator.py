@@ -0,0 +1,521 @@
+from collections import deque
+import threading
+import time
+
+from mcp2210 import commands
+from mcp2210.transport import Transport
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+
+# Values of the access control byte in the chip settings
+ACCESS_UNPROTECTED = 0x00
+ACCESS_PASSWORD = 0x40
+ACCESS_LOCKED = 0x80
+
+# Failed password attempts after which the chip refuses further attempts until reset
+MAX_PASSWORD_ATTEMPTS = 5
+
+
+class SPILoopback(object):
+    #print "simulator.py:SPILoopback"
+    """SPI slave model with MISO tied to MOSI, so every transfer returns the data it sent.
+
+    Slave models implement exchange, which is called with the bytes clocked out in each chunk and the
+    active SPISettings and returns as many bytes clocked in, and release, called when chip select is
+    released at the end of a transaction.
+    """
+
+    def exchange(self, data, settings):
+        #print "simulator.py:SPILoopback:exchange"
+        return data
+
+    def release(self):
+        #print "simulator.py:SPILoopback:release"
+        pass
+
+
+class SimulatedMCP2210(Transport):
+    #print "simulator.py:SimulatedMCP2210"
+    """Transport backed by a software model of an MCP2210 rather than a physical adapter.
+
+    The model keeps the chip's volatile and NVRAM settings, GPIO registers, USB strings, EEPROM and
+    SPI engine state, and answers each output report the way the datasheet describes. Each response
+    becomes readable `latency` seconds after its report was written, and the SPI engine takes as long
+    to clock data as the current bit rate and delays imply, so timing-dependent behaviour such as
+    "transfer in progress" statuses shows up as it would on the bus.
+
+    Usage:
+        >>> dev = MCP2210(transport=SimulatedMCP2210())
+        >>> dev.transfer(b"data")
+        'data'
+    """
+    # Factory defaults for the NVRAM settings
+    DEFAULT_SPI_SETTINGS = (12000000, 0x01FF, 0x0000, 1, 1, 1, 4, 0)
+    DEFAULT_USB_SETTINGS = (0x04D8, 0x00DE, 0x80, 50)
+    DEFAULT_MANUFACTURER = u"Microchip Technology Inc."
+    DEFAULT_PRODUCT = u"MCP2210 USB to SPI Master"
+    EEPROM_SIZE = 256
+
+    def __init__(self, latency=0.001, slave=None):
+        #print "simulator.py:SimulatedMCP2210:__init__"
+        """Constructor.
+
+        Arguments:
+          latency: Seconds from writing a report until its response can be read. The default models
+            the 1ms polling interval of the chip's full speed interrupt endpoint.
+          slave: SPI slave model; defaults to an SPILoopback.
+        """
+        self.latency = latency
+        self.slave = slave if slave is not None else SPILoopback()
+        self.boot_chip_settings = commands.ChipSettings()
+        self.boot_chip_settings.gpio_directions = 0x01FF
+        self.boot_spi_settings = commands.SPISettings(*self.DEFAULT_SPI_SETTINGS)
+        self.usb_settings = commands.USBSettings(*self.DEFAULT_USB_SETTINGS)
+        self.manufacturer = self._descriptor(self.DEFAULT_MANUFACTURER)
+        self.product = self._descriptor(self.DEFAULT_PRODUCT)
+        self.eeprom = bytearray(b'\xff' * self.EEPROM_SIZE)
+        self.password = b''
+        # Levels driven onto pins configured as inputs by the outside world
+        self.gpio_inputs = 0x0000
+        self.bus_owner = commands.BUS_OWNER_NONE
+        # Number of reports the model has answered
+        self.reports = 0
+        # Number of upcoming responses to lose, as if they never made it back over USB
+        self.lose_responses = 0
+        self._responses = deque()
+        self._lock = threading.Condition()
+        self._handlers = {
+            commands.CancelTransferCommand.COMMAND: self._cancel_transfer,
+            commands.GetChipStatusCommand.COMMAND: self._get_chip_status,
+            commands.GetEventCounterCommand.COMMAND: self._get_event_counter,
+            commands.GetChipSettingsCommand.COMMAND: self._get_chip_settings,
+            commands.SetChipSettingsCommand.COMMAND: self._set_chip_settings,
+            commands.SetGPIOValueCommand.COMMAND: self._set_gpio_value,
+            commands.GetGPIOValueCommand.COMMAND: self._get_gpio_value,
+            commands.SetGPIODirectionCommand.COMMAND: self._set_gpio_direction,
+            commands.GetGPIODirectionCommand.COMMAND: self._get_gpio_direction,
+            commands.SetSPISettingsCommand.COMMAND: self._set_spi_settings,
+            commands.GetSPISettingsCommand.COMMAND: self._get_spi_settings,
+            commands.SPITransferCommand.COMMAND: self._spi_transfer,
+            commands.ReadEEPROMCommand.COMMAND: self._read_eeprom,
+            commands.WriteEEPROMCommand.COMMAND: self._write_eeprom,
+            commands.SetBootSettingsCommand.COMMAND: self._set_boot_settings,
+            commands.GetBootSettingsCommand.COMMAND: self._get_boot_settings,
+            commands.SendPasswordCommand.COMMAND: self._send_password,
+        }
+        self.power_cycle()
+
+    @staticmethod
+    def _descriptor(s):
+        #print "simulator.py:SimulatedMCP2210:_descriptor"
+        return bytearray(s.encode('utf-16-le'))
+
+    def power_cycle(self):
+        #print "simulator.py:SimulatedMCP2210:power_cycle"
+        """Resets volatile state, copying the NVRAM settings into the current ones as the chip does at boot."""
+        with self._lock:
+            self.chip_settings = commands.ChipSettings.from_buffer_copy(self.boot_chip_settings)
+            self.spi_settings = commands.SPISettings.from_buffer_copy(self.boot_spi_settings)
+            self.gpio_outputs = self.chip_settings.gpio_outputs
+            self.gpio_directions = self.chip_settings.gpio_directions
+            self.unlocked = False
+            self.password_attempts = 0
+            self.event_count = 0
+            self._reset_engine()
+            self._responses.clear()
+
+    def _reset_engine(self):
+        #print "simulator.py:SimulatedMCP2210:_reset_engine"
+        if getattr(self, '_active', False):
+            self.slave.release()
+        self._active = False
+        self._to_send = 0
+        self._busy_until = 0.0
+        self._pending = deque()
+        self._received = bytearray()
+
+    def write(self, report):
+        #print "simulator.py:SimulatedMCP2210:write"
+        report = bytearray(report)
+        report.extend(bytearray(64 - len(report)))
+        response = bytearray(64)
+        response[0] = report[0]
+        with self._lock:
+            handler = self._handlers.get(report[0])
+            if handler is None:
+                response[1] = commands.STATUS_UNKNOWN_COMMAND
+            else:
+                handler(report, response)
+            self.reports += 1
+            if self.lose_responses:
+                self.lose_responses -= 1
+                return
+            self._responses.append((monotonic() + self.latency, response))
+            self._lock.notify()
+
+    def read_into(self, report, timeout=None):
+        #print "simulator.py:SimulatedMCP2210:read_into"
+        end = None if timeout is None else monotonic() + timeout
+        with self._lock:
+            while not self._responses:
+                if end is None:
+                    self._lock.wait()
+                else:
+                    remaining = end - monotonic()
+                    if remaining <= 0:
+                        return 0
+                    self._lock.wait(remaining)
+            ready, response = self._responses[0]
+            if end is not None and ready > end:
+                # Not ready in time; it stays queued and turns up late
+                ready = None
+            else:
+                self._responses.popleft()
+        if ready is None:
+            time.sleep(max(end - monotonic(), 0))
+            return 0
+        delay = ready - monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        report[:len(response)] = response
+        return len(response)
+
+    def _locked(self):
+        #print "simulator.py:SimulatedMCP2210:_locked"
+        """Returns True if NVRAM writes are currently refused by the chip's access control."""
+        access = self.boot_chip_settings.access_control
+        return access == ACCESS_LOCKED or (access == ACCESS_PASSWORD and not self.unlocked)
+
+    def _gpio_value(self):
+        #print "simulator.py:SimulatedMCP2210:_gpio_value"
+        return ((self.gpio_outputs & ~self.gpio_directions) | (self.gpio_inputs & self.gpio_directions)) & 0x01FF
+
+    def pulse(self, count=1):
+        #print "simulator.py:SimulatedMCP2210:pulse"
+        """Models count pulses arriving on GP6.
+
+        They are counted if GP6 is assigned its dedicated function and an interrupt counting mode is set
+        in the chip settings. The counter stops at 0xFFFF.
+        """
+        with self._lock:
+            settings = self.chip_settings
+            if (settings.pin_designations[6] == commands.PIN_DEDICATED
+                    and (settings.other_settings >> 1) & 0x07 != commands.EVENT_COUNT_NONE):
+                self.event_count = min(self.event_count + count, 0xFFFF)
+
+    def _get_event_counter(self, report, response):
+        #print "simulator.py:SimulatedMCP2210:_get_event_counter"
+        commands.GetEventCounterResponse.from_buffer(response).count = self.event_count
+        if not report[1] & 0x01:
+            self.event_count = 0
+
+    def _cancel_transfer(self, report, response):
+        #print "simulator.py:SimulatedMCP2210:_cancel_transfer"
+        self._reset_engine()
+        self._get_chip_status(report, response)
+
+    def _get_chip_status(self, report, response):
+        #print "simulator.py:SimulatedMCP2210:_get_chip_status"
+        status = commands.DeviceStatusResponse.from_buffer(response)
+        status.bus_release_status = 0x01
+        status.bus_owner = self.bus_owner
+        status.password_attempts = self.password_attempts
+        status.password_guessed = int(self.unlocked)
+
+    def _get_chip_settings(self, report, response):
+        #print "simulator.py:SimulatedMCP2210:_get_chip_settings"
+        settings = commands.ChipSettings.from_buffer_copy(self.chip_settings)
+        settings.gpio_outputs = self.gpio_outputs
+        settings.gpio_directions = self.gpio_directions
+        settings.new_password = b''
+        commands.GetChipSettingsResponse.from_buffer(response).settings = settings
+
+    def _set_chip_settings(self, report, response):
+        #print "simulator.py:SimulatedMCP2210:_set_chip_settings"
+        if self._locked():
+            response[1] = commands.STATUS_BLOCKED
+            return
+        self.chip_settings = commands.SetChipSettingsCommand.from_buffer_copy(report).settings
+        self.gpio_outputs = self.chip_settings.gpio_outputs
+        self.gpio_directions = self.chip_settings.gpio_directions
+
+    def _set_gpio_value(self, report, response):
+        #print "simulator.py:SimulatedMCP2210:_set_gpio_value"
+        self.gpio_outputs = commands.SetGPIOValueCommand.from_buffer_copy(report).gpio & 0x01FF
+        commands.GetGPIOResponse.from_buffer(response).gpio = self._gpio_value()
+
+    def _get_gpio_value(self, report, response):
+        #print "simulator.py:SimulatedMCP2210:_get_gpio_value"
+        commands.GetGPIOResponse.from_buffer(response).gpio = self._gpio_value()
+
+    def _set_gpio_direction(self, report, response):
+        #print "simulator.py:SimulatedMCP2210:_set_gpio_direction"
+        self.gpio_directions = commands.SetGPIODirectionCommand.from_buffer_copy(report).gpio & 0x01FF
+        commands.GetGPIOResponse.from_buffer(response).gpio = self.gpio_directions
+
+    def _get_gpio_direction(self, report, response):
+        #print "simulator.py:SimulatedMCP2210:_get_gpio_direction"
+        commands.GetGPIOResponse.from_buffer(response).gpio = self.gpio_directions
+
+    def _set_spi_settings(self, report, response):
+        #print "simulator.py:SimulatedMCP2210:_set_spi_settings"
+        if self._active:
+            response[1] = commands.STATUS_BUSY
+            return
+        self.spi_settings = commands.SetSPISettingsCommand.from_buffer_copy(report).settings
+
+    def _get_spi_settings(self, report, response):
+        #print "simulator.py:SimulatedMCP2210:_get_spi_settings"
+        commands.GetSPISettingsResponse.from_buffer(response).settings = self.spi_settings
+
+    def _clock_time(self, length, first, last):
+        #print "simulator.py:SimulatedMCP2210:_clock_time"
+        """Returns the time in seconds the SPI engine takes to clock out length bytes.
+
+        Delays in the SPI settings are in units of 100us.
+        """
+        settings = self.spi_settings
+        duration = length * 8.0 / max(settings.bit_rate, 1) + (length - 1) * settings.interbyte_delay * 1e-4
+        if first:
+            duration += settings.cs_data_delay * 1e-4
+        if last:
+            duration += settings.lb_cs_delay * 1e-4
+        return duration
+
+    def _spi_transfer(self, report, response):
+        #print "simulator.py:SimulatedMCP2210:_spi_transfer"
+        reply = commands.SPITransferResponse.from_buffer(response)
+        now = monotonic()
+        if self.bus_owner == commands.BUS_OWNER_EXTERNAL:
+            reply.status = commands.SPI_STATUS_BUS_UNAVAILABLE
+            return
+
+        length = min(report[1], 60)
+        if length and now < self._busy_until:
+            reply.status = commands.SPI_STATUS_IN_PROGRESS
+            reply.engine_status = commands.SPI_ENGINE_DATA_PENDING
+            return
+
+        if not self._active:
+            self._active = True
+            self._to_send = self.spi_settings.spi_tx_size
+            first = True
+        else:
+            first = False
+
+        length = min(length, self._to_send)
+        if length:
+            self._to_send -= length
+            start = max(now, self._busy_until)
+            self._busy_until = start + self._clock_time(length, first, not self._to_send)
+            received = bytearray(self.slave.exchange(bytes(report[4:4 + length]), self.spi_settings))
+            self._pending.append((self._busy_until, received[:length]))
+
+        while self._pending and self._pending[0][0] <= now:
+            self._received.extend(self._pending.popleft()[1])
+
+        data = self._received[:60]
+        del self._received[:60]
+        reply.length = len(data)
+        response[4:4 + len(data)] = data
+        if not self._to_send and not self._pending and not self._received:
+            reply.engine_status = commands.SPI_ENGINE_FINISHED
+            self._reset_engine()
+        elif data:
+            reply.engine_status = commands.SPI_ENGINE_DATA_PENDING
+        else:
+            reply.engine_status = commands.SPI_ENGINE_STARTED
+
+    def _read_eeprom(self, report, response):
+        #print "simulator.py:SimulatedMCP2210:_read_eeprom"
+        reply = commands.ReadEEPROMResponse.from_buffer(response)
+        reply.address = report[1]
+        reply.data = self.eeprom[report[1]]
+
+    def _write_eeprom(self, report, response):
+        #print "simulator.py:SimulatedMCP2210:_write_eeprom"
+        if self._locked():
+            response[1] = commands.STATUS_BLOCKED
+            return
+        self.eeprom[report[1]] = report[2]
+
+    def _set_boot_settings(self, report, response):
+        #print "simulator.py:SimulatedMCP2210:_set_boot_settings"
+        response[2] = report[1]
+        if self._locked():
+            response[1] = commands.STATUS_BLOCKED
+            return
+
+        subcommand = report[1]
+        if subcommand == commands.SetBootSPISettingsCommand.SUBCOMMAND:
+            self.boot_spi_settings = commands.SetBootSPISettingsCommand.from_buffer_copy(report).settings
+        elif subcommand == commands.SetBootChipSettingsCommand.SUBCOMMAND:
+            settings = commands.SetBootChipSettingsCommand.from_buffer_copy(report).settings
+            if settings.access_control == ACCESS_PASSWORD:
+                self.password = settings.new_password
+            self.boot_chip_settings = settings
+        elif subcommand == commands.SetBootUSBSettingsCommand.SUBCOMMAND:
+            self.usb_settings = commands.SetBootUSBSettingsCommand.from_buffer_copy(report).settings
+        elif subcommand in (commands.SetUSBProductCommand.SUBCOMMAND, commands.SetUSBManufacturerCommand.SUBCOMMAND):
+            command = commands.SetUSBStringCommand.from_buffer_copy(report)
+            descriptor = bytearray(command.str[:max(command.str_len - 2, 0)])
+            if subcommand == commands.SetUSBProductCommand.SUBCOMMAND:
+                self.product = descriptor
+            else:
+                self.manufacturer = descriptor
+        else:
+            response[1] = commands.STATUS_UNKNOWN_COMMAND
+
+    def _get_boot_settings(self, report, response):
+        #print "simulator.py:SimulatedMCP2210:_get_boot_settings"
+        response[2] = subcommand = report[1]
+        if subcommand == commands.GetBootSPISettingsCommand.SUBCOMMAND:
+            commands.GetSPISettingsResponse.from_buffer(response).settings = self.boot_spi_settings
+        elif subcommand == commands.GetBootChipSettingsCommand.SUBCOMMAND:
+            settings = commands.ChipSettings.from_buffer_copy(self.boot_chip_settings)
+            settings.new_password = b''
+            commands.GetChipSettingsResponse.from_buffer(response).settings = settings
+        elif subcommand == commands.GetBootUSBSettingsCommand.SUBCOMMAND:
+            reply = commands.GetUSBSettingsResponse.from_buffer(response)
+            reply.vid = self.usb_settings.vid
+            reply.pid = self.usb_settings.pid
+            reply.power_option = self.usb_settings.power_option
+            reply.current_request = self.usb_settings.current_request
+        elif subcommand in (commands.GetUSBProductCommand.SUBCOMMAND, commands.GetUSBManufacturerCommand.SUBCOMMAND):
+            if subcommand == commands.GetUSBProductCommand.SUBCOMMAND:
+                descriptor = self.product
+            else:
+                descriptor = self.manufacturer
+            reply = commands.GetUSBStringResponse.from_buffer(response)
+            reply.str_len = len(descriptor) + 2
+            reply.descriptor_id = 0x03
+            response[6:6 + len(descriptor)] = descriptor
+        else:
+            response[1] = commands.STATUS_UNKNOWN_COMMAND
+
+    def _send_password(self, report, response):
+        #print "simulator.py:SimulatedMCP2210:_send_password"
+        if self.boot_chip_settings.access_control == ACCESS_LOCKED:
+            response[1] = commands.STATUS_BLOCKED
+        elif self.password_attempts >= MAX_PASSWORD_ATTEMPTS:
+            response[1] = commands.STATUS_DENIED
+        elif commands.SendPasswordCommand.from_buffer_copy(report).password == self.password:
+            self.unlocked = True
+        else:
+            self.password_attempts += 1
+            response[1] = commands.STATUS_REJECTED
+
+
+class SPIFlashModel(object):
+    #print "simulator.py:SPIFlashModel"
+    """SPI slave model of a 25-series NOR flash, for use as SimulatedMCP2210's slave.
+
+    Supports JEDEC ID, read status, write enable/disable, read, fast read, page program, sector erase
+    and chip erase. Programming and erasing take effect when chip select is released and keep the
+    write-in-progress bit set for the given times, during which other commands are ignored.
+    """
+    READ = 0x03
+    FAST_READ = 0x0B
+    PAGE_PROGRAM = 0x02
+    SECTOR_ERASE = 0x20
+    CHIP_ERASE = 0xC7
+    READ_STATUS = 0x05
+    WRITE_ENABLE = 0x06
+    WRITE_DISABLE = 0x04
+    JEDEC_ID = 0x9F
+
+    # Bytes clocked in before data for commands that take an address
+    HEADER_SIZES = {READ: 4, FAST_READ: 5, PAGE_PROGRAM: 4, SECTOR_ERASE: 4}
+
+    def __init__(self, size=1 << 20, jedec_id=(0xEF, 0x40, 0x14), program_time=0.0007, erase_time=0.045):
+        #print "simulator.py:SPIFlashModel:__init__"
+        """Constructor.
+
+        Arguments:
+          size: Capacity in bytes.
+          jedec_id: Manufacturer, memory type and capacity bytes returned by JEDEC ID.
+          program_time: Seconds a page program keeps the device busy.
+          erase_time: Seconds a sector erase keeps the device busy; a chip erase takes 16 times longer.
+        """
+        self.memory = bytearray(b'\xff' * size)
+        self.jedec_id = bytearray(jedec_id)
+        self.program_time = program_time
+        self.erase_time = erase_time
+        self.write_enabled = False
+        self.busy_until = 0.0
+        self._command = bytearray()
+        self._data = bytearray()
+
+    @property
+    def status(self):
+        #print "simulator.py:SPIFlashModel:status(@property)"
+        return (monotonic() < self.busy_until) | (self.write_enabled << 1)
+
+    def exchange(self, data, settings):
+        #print "simulator.py:SPIFlashModel:exchange"
+        data = bytearray(data)
+        out = bytearray(b'\xff' * len(data))
+        for i, byte in enumerate(data):
+            opcode = self._command[0] if self._command else byte
+            header = self.HEADER_SIZES.get(opcode, 1)
+            if len(self._command) < header:
+                self._command.append(byte)
+                continue
+            if monotonic() < self.busy_until and opcode != self.READ_STATUS:
+                break
+            if opcode in (self.READ, self.FAST_READ):
+                start = (self._address_of(self._command) + len(self._data)) % len(self.memory)
+                chunk = self.memory[start:start + len(data) - i]
+                out[i:i + len(chunk)] = chunk
+                self._data.extend(chunk)
+                break
+            elif opcode == self.PAGE_PROGRAM:
+                self._data.extend(data[i:])
+                break
+            elif opcode == self.READ_STATUS:
+                out[i:] = bytearray([self.status]) * (len(data) - i)
+                break
+            elif opcode == self.JEDEC_ID:
+                position = len(self._data)
+                chunk = self.jedec_id[position:position + len(data) - i]
+                out[i:i + len(chunk)] = chunk
+                self._data.extend(data[i:])
+                break
+        return bytes(out)
+
+    def release(self):
+        #print "simulator.py:SPIFlashModel:release"
+        command, data = self._command, self._data
+        self._command = bytearray()
+        self._data = bytearray()
+        if not command or monotonic() < self.busy_until:
+            return
+        opcode = command[0]
+        if opcode == self.WRITE_ENABLE:
+            self.write_enabled = True
+        elif opcode == self.WRITE_DISABLE:
+            self.write_enabled = False
+        elif opcode in (self.PAGE_PROGRAM, self.SECTOR_ERASE, self.CHIP_ERASE) and self.write_enabled:
+            if opcode == self.PAGE_PROGRAM and len(command) == 4:
+                address = self._address_of(command)
+                page = address & ~0xFF
+                for i, byte in enumerate(data[-256:]):
+                    offset = page + ((address + i) & 0xFF)
+                    self.memory[offset] &= byte
+                self.busy_until = monotonic() + self.program_time
+            elif opcode == self.SECTOR_ERASE and len(command) == 4:
+                sector = self._address_of(command) & ~0xFFF
+                self.memory[sector:sector + 0x1000] = b'\xff' * 0x1000
+                self.busy_until = monotonic() + self.erase_time
+            elif opcode == self.CHIP_ERASE:
+                self.memory[:] = b'\xff' * len(self.memory)
+                self.busy_until = monotonic() + self.erase_time * 16
+            self.write_enabled = False
+
+    def _address_of(self, command):
+        #print "simulator.py:SPIFlashModel:_address_of"
+        return ((command[1] << 16) | (command[2] << 8) | command[3]) % len(self.memory)
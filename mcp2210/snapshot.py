@@ -0,0 +1,136 @@
+import binascii
+import json
+import os
+import re
+
+from mcp2210 import commands
+
+
+# Settings kept in a snapshot, with the structure each holds, or None for strings
+SETTINGS = (
+    ('chip_settings', commands.ChipSettings),
+    ('transfer_settings', commands.SPISettings),
+    ('boot_chip_settings', commands.ChipSettings),
+    ('boot_transfer_settings', commands.SPISettings),
+    ('boot_usb_settings', commands.USBSettings),
+    ('manufacturer_name', None),
+    ('product_name', None),
+)
+
+# Settings that other processes and resets change, which are read back from the device to validate a
+# snapshot. The rest are stored in NVRAM and only change when written.
+VOLATILE_SETTINGS = ('chip_settings', 'transfer_settings')
+
+VERSION = 1
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'mcp2210')
+
+
+class SettingsSnapshot(object):
+    #print "snapshot.py:SettingsSnapshot"
+    """Keeps each adapter's settings in a file between processes, keyed by USB serial number.
+
+    A process that restores a snapshot starts with every setting it holds already cached, after reading
+    back just the volatile settings - the current chip and transfer settings - to check the snapshot is
+    still right. The first transfer needs the transfer settings anyway, so validating costs one extra
+    command, however many settings the process goes on to read. Save the snapshot before exiting, so the
+    next process finds what this one learnt.
+
+    Settings in NVRAM are trusted without being read back; if something else may have changed them,
+    call invalidate_settings() after restoring, or remove the adapter's snapshot.
+
+    Usage:
+        >>> snapshots = SettingsSnapshot()
+        >>> dev = MCP2210(serial="0001234567", lazy=True, cancel=False)
+        >>> snapshots.restore(dev)
+        True
+        >>> dev.transfer(b"data")
+        >>> snapshots.save(dev)
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY):
+        #print "snapshot.py:SettingsSnapshot:__init__"
+        """Constructor.
+
+        Arguments:
+          directory: Directory holding the snapshot files, which is created when first saving.
+        """
+        self.directory = directory
+        self.restored = 0
+        self.rejected = 0
+
+    def path(self, serial):
+        #print "snapshot.py:SettingsSnapshot:path"
+        """Returns the path of the snapshot file for the adapter with serial number serial."""
+        return os.path.join(self.directory, re.sub(r'[^A-Za-z0-9_.-]', '_', serial) + '.json')
+
+    @staticmethod
+    def _serial(device, serial):
+        #print "snapshot.py:SettingsSnapshot:_serial"
+        serial = serial or device.serial
+        if not serial:
+            raise ValueError("The adapter's serial number is needed to key its snapshot")
+        return serial
+
+    def save(self, device, serial=None):
+        #print "snapshot.py:SettingsSnapshot:save"
+        """Writes the device's cached settings to its snapshot file, replacing it atomically.
+
+        The volatile settings are fetched first if they aren't cached; other settings are only saved
+        if they are.
+
+        Arguments:
+          device: The MCP2210.
+          serial: Its USB serial number, if it wasn't given to the MCP2210 constructor.
+        """
+        path = self.path(self._serial(device, serial))
+        for name in VOLATILE_SETTINGS:
+            getattr(device, name)
+        cached = device.cached_settings()
+        settings = {}
+        for name, kind in SETTINGS:
+            if name in cached:
+                value = cached[name]
+                settings[name] = value if kind is None else binascii.hexlify(bytearray(value)).decode('ascii')
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'version': VERSION, 'settings': settings}, f)
+        getattr(os, 'replace', os.rename)(path + '.tmp', path)
+
+    def restore(self, device, serial=None):
+        #print "snapshot.py:SettingsSnapshot:restore"
+        """Fills the device's settings cache from its snapshot, if the snapshot is still valid.
+
+        The volatile settings are read from the device and compared with the snapshot. Either way they
+        end up cached, so nothing is lost when the snapshot turns out to be stale.
+
+        Arguments:
+          device: The MCP2210.
+          serial: Its USB serial number, if it wasn't given to the MCP2210 constructor.
+
+        Returns:
+          True if the snapshot was restored, False if there was none or it no longer matches the device.
+        """
+        path = self.path(self._serial(device, serial))
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (IOError, OSError, ValueError):
+            return False
+        if snapshot.get('version') != VERSION:
+            return False
+
+        values = {}
+        for name, kind in SETTINGS:
+            if name in snapshot['settings']:
+                value = snapshot['settings'][name]
+                values[name] = value if kind is None else kind.from_buffer_copy(binascii.unhexlify(value))
+        for name in VOLATILE_SETTINGS:
+            if name not in values or bytearray(getattr(device, name)) != bytearray(values[name]):
+                self.rejected += 1
+                return False
+
+        device.preload_settings(**values)
+        self.restored += 1
+        return True
@@ -0,0 +1,17 @@
+"""Tests run against the simulated adapter, so they need no hardware:
+
+    python -m unittest discover mcp2210/tests
+"""
+from mcp2210.device import MCP2210
+from mcp2210.simulator import SimulatedMCP2210
+
+
+def simulated_device(latency=0, **kwargs):
+    #print "tests/__init__.py:simulated_device"
+    """Returns a (simulator, MCP2210) pair, with SPI clocked at full speed and no delays."""
+    sim = SimulatedMCP2210(latency=latency, **kwargs)
+    dev = MCP2210(transport=sim)
+    settings = dev.transfer_settings
+    settings.cs_data_delay = settings.lb_cs_delay = settings.interbyte_delay = 0
+    dev.transfer_settings = settings
+    return sim, dev
@@ -0,0 +1,68 @@
+import sys
+import unittest
+
+from mcp2210.simulator import SimulatedMCP2210
+
+if sys.version_info >= (3, 7):
+    import asyncio
+    from mcp2210.aio import AsyncMCP2210
+
+
+@unittest.skipIf(sys.version_info < (3, 7), "asyncio front-end needs Python 3.7")
+class AsyncMCP2210Test(unittest.TestCase):
+    #print "test_aio.py:AsyncMCP2210Test"
+
+    def setUp(self):
+        #print "test_aio.py:AsyncMCP2210Test:setUp"
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.sim = SimulatedMCP2210(latency=0)
+        self.dev = self.loop.run_until_complete(AsyncMCP2210.open(transport=self.sim))
+
+    def tearDown(self):
+        #print "test_aio.py:AsyncMCP2210Test:tearDown"
+        self.loop.run_until_complete(self.dev.close())
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def test_concurrent_transfers_keep_order(self):
+        #print "test_aio.py:AsyncMCP2210Test:test_concurrent_transfers_keep_order"
+        chunks = [bytes(bytearray([i]) * (i + 1)) for i in range(8)]
+        results = self.loop.run_until_complete(asyncio.gather(*[self.dev.transfer(c) for c in chunks]))
+        self.assertEqual(results, chunks)
+        self.assertEqual(self.dev.worker.stats['jobs'], 8)
+
+    def test_transfer_into(self):
+        #print "test_aio.py:AsyncMCP2210Test:test_transfer_into"
+        rx = bytearray(4)
+        self.assertEqual(self.loop.run_until_complete(self.dev.transfer_into(b"abcd", rx)), 4)
+        self.assertEqual(bytes(rx), b"abcd")
+
+    def test_gpio(self):
+        #print "test_aio.py:AsyncMCP2210Test:test_gpio"
+        run = self.loop.run_until_complete
+        run(self.dev.set_gpio_direction(0x1F0))
+        run(self.dev.set_gpio(0))
+        run(self.dev.set_gpio_mask(0x0F, 0x05))
+        self.assertEqual(self.sim.gpio_outputs, 0x05)
+        self.assertEqual(run(self.dev.get_gpio_direction()), 0x1F0)
+        self.sim.gpio_inputs = 0x1A0
+        self.assertEqual(run(self.dev.get_gpio()) & 0x1F0, 0x1A0)
+
+    def test_settings(self):
+        #print "test_aio.py:AsyncMCP2210Test:test_settings"
+        run = self.loop.run_until_complete
+        settings = run(self.dev.get_setting('transfer_settings'))
+        settings.bit_rate = 3000000
+        run(self.dev.set_setting('transfer_settings', settings))
+        self.assertEqual(self.sim.spi_settings.bit_rate, 3000000)
+
+    def test_errors_propagate(self):
+        #print "test_aio.py:AsyncMCP2210Test:test_errors_propagate"
+        def fail(device):
+            raise ValueError()
+        self.assertRaises(ValueError, self.loop.run_until_complete, self.dev.call(fail))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mcp2210 import benchmark
+
+
+class BenchmarkTest(unittest.TestCase):
+    #print "test_benchmark.py:BenchmarkTest"
+
+    def setUp(self):
+        #print "test_benchmark.py:BenchmarkTest:setUp"
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        #print "test_benchmark.py:BenchmarkTest:tearDown"
+        shutil.rmtree(self.directory)
+
+    def test_smoke(self):
+        #print "test_benchmark.py:BenchmarkTest:test_smoke"
+        # Small enough to run in well under a second, while still exercising every benchmark
+        path = os.path.join(self.directory, 'results.json')
+        benchmark.main(['--max-size', '256', '--iterations', '4', '--repeat', '1', '--output', path])
+        with open(path) as f:
+            results = json.load(f)
+
+        self.assertEqual(sorted(results), ['commands', 'eeprom', 'environment', 'gpio', 'startup', 'transfers'])
+        self.assertEqual(results['environment']['max_size'], 256)
+        self.assertTrue('SPITransferCommand' in results['commands'])
+        for timings in results['commands'].values():
+            self.assertTrue(timings['send_cpu'] > 0)
+        self.assertEqual(sorted(int(size) for size in results['transfers']), [1, 4, 16, 60, 256])
+        # At least one report per 60 bytes, plus however many polls the simulated bus timing needed
+        self.assertTrue(results['transfers']['256']['reports'] >= 5)
+        self.assertTrue(results['gpio']['toggles_per_second'] > 0)
+        self.assertTrue(results['startup']['fast_reports'] < results['startup']['default_reports'])
+
+
+if __name__ == '__main__':
+    unittest.main()
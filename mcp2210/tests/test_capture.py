@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mcp2210 import commands
+from mcp2210.capture import (COMMAND_NAMES, CaptureError, CaptureWriter, RecordingTransport, ReplayTransport,
+                             analyze_latency, command_key, command_name, read_capture, read_session)
+from mcp2210.device import MCP2210
+from mcp2210.simulator import SimulatedMCP2210
+
+
+class CommandNamesTest(unittest.TestCase):
+    #print "test_capture.py:CommandNamesTest"
+
+    def test_subcommands_are_told_apart(self):
+        #print "test_capture.py:CommandNamesTest:test_subcommands_are_told_apart"
+        for command in (commands.SetBootChipSettingsCommand, commands.SetBootSPISettingsCommand,
+                        commands.SetUSBProductCommand, commands.GetBootChipSettingsCommand,
+                        commands.GetUSBManufacturerCommand, commands.ResetEventCounterCommand):
+            key = command_key(command.COMMAND, command.SUBCOMMAND)
+            self.assertEqual(COMMAND_NAMES[key], command.__name__[:-len('Command')])
+
+    def test_second_byte_of_other_commands_is_ignored(self):
+        #print "test_capture.py:CommandNamesTest:test_second_byte_of_other_commands_is_ignored"
+        self.assertEqual(command_name(command_key(commands.SPITransferCommand.COMMAND, 60)), 'SPITransfer')
+        self.assertEqual(command_name(command_key(0x99, 1)), '0x99')
+        self.assertEqual(command_name(command_key(0x60, 0x99)), '0x60/0x99')
+
+
+class CaptureTest(unittest.TestCase):
+    #print "test_capture.py:CaptureTest"
+
+    def setUp(self):
+        #print "test_capture.py:CaptureTest:setUp"
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'session.cap')
+
+    def tearDown(self):
+        #print "test_capture.py:CaptureTest:tearDown"
+        shutil.rmtree(self.directory)
+
+    def record_session(self):
+        #print "test_capture.py:CaptureTest:record_session"
+        dev = MCP2210(transport=RecordingTransport(SimulatedMCP2210(latency=0), CaptureWriter(self.path)))
+        dev.boot_chip_settings
+        dev.boot_transfer_settings
+        dev.product_name
+        result = dev.transfer(b"data")
+        dev.transport.close()
+        return result
+
+    def test_empty_file(self):
+        #print "test_capture.py:CaptureTest:test_empty_file"
+        open(self.path, 'wb').close()
+        self.assertRaises(CaptureError, list, read_capture(self.path))
+
+    def test_analyze_latency(self):
+        #print "test_capture.py:CaptureTest:test_analyze_latency"
+        self.record_session()
+        report = analyze_latency(read_session(self.path))
+        for name in ('GetBootChipSettings', 'GetBootSPISettings', 'GetUSBProduct', 'SPITransfer'):
+            self.assertEqual(report[name]['unanswered'], 0)
+        self.assertEqual(report['GetBootChipSettings']['requests'], 1)
+
+    def test_replay(self):
+        #print "test_capture.py:CaptureTest:test_replay"
+        self.assertEqual(self.record_session(), b"data")
+        dev = MCP2210(transport=ReplayTransport(self.path))
+        self.assertEqual(dev.boot_chip_settings.gpio_directions, 0x01FF)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+from mcp2210 import commands
+from mcp2210.simulator import SimulatedMCP2210
+from mcp2210.tests import simulated_device
+
+
+def _report(command):
+    #print "test_commands.py:_report"
+    """Returns the 64-byte report a ctypes command object is sent as."""
+    data = bytearray(command)
+    return data + bytearray(commands.REPORT_SIZE - len(data))
+
+
+class CommandEncoderTest(unittest.TestCase):
+    #print "test_commands.py:CommandEncoderTest"
+
+    def setUp(self):
+        #print "test_commands.py:CommandEncoderTest:setUp"
+        self.report = bytearray(b"\xaa" * commands.REPORT_SIZE)
+
+    def test_matches_command_objects(self):
+        #print "test_commands.py:CommandEncoderTest:test_matches_command_objects"
+        settings = commands.SPISettings(*SimulatedMCP2210.DEFAULT_SPI_SETTINGS)
+        cases = [
+            (commands.SetGPIOValueCommand, (0x1A5,)),
+            (commands.GetGPIODirectionCommand, ()),
+            (commands.ReadEEPROMCommand, (0x42,)),
+            (commands.WriteEEPROMCommand, (0x42, 0x99)),
+            (commands.SetSPISettingsCommand, (settings,)),
+            (commands.CancelTransferCommand, ()),
+        ]
+        for command, values in cases:
+            commands.encoder_for(command).encode_into(self.report, *values)
+            self.assertEqual(self.report, _report(command(*values)), command.__name__)
+
+    def test_encoders_are_cached(self):
+        #print "test_commands.py:CommandEncoderTest:test_encoders_are_cached"
+        encoder = commands.encoder_for(commands.GetGPIOValueCommand)
+        self.assertTrue(commands.encoder_for(commands.GetGPIOValueCommand) is encoder)
+        self.assertFalse(commands.encoder_for(commands.GetGPIODirectionCommand) is encoder)
+
+    def test_decode_is_a_view(self):
+        #print "test_commands.py:CommandEncoderTest:test_decode_is_a_view"
+        encoder = commands.encoder_for(commands.GetGPIOValueCommand)
+        self.report[:4] = b"\x31\x00\x00\x00"
+        self.report[4:6] = b"\x34\x12"
+        response = encoder.decode(self.report)
+        self.assertEqual(response.gpio, 0x1234)
+        self.report[4] = 0x56
+        self.assertEqual(response.gpio, 0x1256)
+
+
+class ExecuteTest(unittest.TestCase):
+    #print "test_commands.py:ExecuteTest"
+
+    def test_execute(self):
+        #print "test_commands.py:ExecuteTest:test_execute"
+        sim, dev = simulated_device()
+        dev.execute(commands.encoder_for(commands.SetGPIODirectionCommand), 0x000)
+        dev.execute(commands.encoder_for(commands.SetGPIOValueCommand), 0x0C3)
+        self.assertEqual(sim.gpio_outputs, 0x0C3)
+        response = dev.execute(commands.encoder_for(commands.GetGPIOValueCommand))
+        self.assertEqual(response.gpio, 0x0C3)
+        dev.execute(commands.encoder_for(commands.WriteEEPROMCommand), 7, 0x5A)
+        self.assertEqual(dev.execute(commands.encoder_for(commands.ReadEEPROMCommand), 7).data, 0x5A)
+
+
+if __name__ == '__main__':
+    unittest.main()
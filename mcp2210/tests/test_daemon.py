@@ -0,0 +1,136 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from mcp2210.daemon import (MASK, OP_SET_GPIO, RESULT_DEADLINE_EXCEEDED, RESULT_OK, AdapterServer, MCP2210Daemon,
+                            RemoteMCP2210)
+from mcp2210.tests import simulated_device
+
+
+class DaemonTest(unittest.TestCase):
+    #print "test_daemon.py:DaemonTest"
+
+    def setUp(self):
+        #print "test_daemon.py:DaemonTest:setUp"
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'mcp2210.sock')
+        self.sim, device = simulated_device()
+        self.daemon = MCP2210Daemon(self.path, {'a': device})
+        self.daemon.start()
+        self.client = RemoteMCP2210(self.path)
+        self.client.gpio_direction.raw = 0
+        self.client.gpio.raw = 0
+
+    def tearDown(self):
+        #print "test_daemon.py:DaemonTest:tearDown"
+        self.client.close()
+        self.daemon.close()
+        shutil.rmtree(self.directory)
+
+    def test_transfer(self):
+        #print "test_daemon.py:DaemonTest:test_transfer"
+        self.assertEqual(self.client.transfer(b"remote"), b"remote")
+
+    def test_batch(self):
+        #print "test_daemon.py:DaemonTest:test_batch"
+        reports = self.sim.reports
+        with self.client.gpio.batch():
+            self.client.gpio[0] = 1
+            self.client.gpio[3] = 1
+        self.assertEqual(self.sim.gpio_outputs, 0x09)
+        self.assertEqual(self.sim.reports, reports + 1)
+
+    def test_batch_unwinds_on_keyboard_interrupt(self):
+        #print "test_daemon.py:DaemonTest:test_batch_unwinds_on_keyboard_interrupt"
+        try:
+            with self.client.gpio.batch():
+                self.client.gpio[1] = 1
+                raise KeyboardInterrupt()
+        except KeyboardInterrupt:
+            pass
+        self.client.gpio[2] = 1
+        self.assertEqual(self.sim.gpio_outputs, 0x04)
+
+    def test_eeprom(self):
+        #print "test_daemon.py:DaemonTest:test_eeprom"
+        self.client.eeprom[3] = 7
+        self.client.eeprom[4:6] = b"ab"
+        self.client.eeprom[-1] = 9
+        self.assertEqual(self.sim.eeprom[3:6], bytearray(b"\x07ab"))
+        self.assertEqual(self.sim.eeprom[255], 9)
+        self.assertEqual(self.client.eeprom[3], b"\x07")
+        self.assertEqual(self.client.eeprom[-1], b"\x09")
+        self.assertEqual(self.client.eeprom[-252:-250], b"ab")
+        self.assertRaises(IndexError, self.client.eeprom.__getitem__, -257)
+        self.assertRaises(IndexError, self.client.eeprom.__setitem__, 256, 0)
+        self.assertRaises(ValueError, self.client.eeprom.__setitem__, 0, 256)
+
+    def test_concurrent_pin_writes(self):
+        #print "test_daemon.py:DaemonTest:test_concurrent_pin_writes"
+        # Writes from several clients may be coalesced into one command, but none may be lost
+        def worker(pin):
+            #print "test_daemon.py:DaemonTest:test_concurrent_pin_writes:worker"
+            client = RemoteMCP2210(self.path)
+            try:
+                for i in range(50):
+                    client.gpio[pin] = i & 1
+                client.gpio[pin] = 1
+            finally:
+                client.close()
+
+        threads = [threading.Thread(target=worker, args=(pin,)) for pin in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.sim.gpio_outputs, 0xFF)
+
+
+
+class _Replies(object):
+    #print "test_daemon.py:_Replies"
+    """Stands in for a client connection, keeping the replies sent to it."""
+
+    def __init__(self):
+        #print "test_daemon.py:_Replies:__init__"
+        self.replies = []
+
+    def reply(self, request_id, result, payload=b''):
+        #print "test_daemon.py:_Replies:reply"
+        self.replies.append((request_id, result))
+
+
+class AdapterServerTest(unittest.TestCase):
+    #print "test_daemon.py:AdapterServerTest"
+
+    def setUp(self):
+        #print "test_daemon.py:AdapterServerTest:setUp"
+        self.sim, device = simulated_device(latency=0.05)
+        self.server = AdapterServer('a', device)
+        self.connection = _Replies()
+
+    def tearDown(self):
+        #print "test_daemon.py:AdapterServerTest:tearDown"
+        self.server.close()
+
+    def _gpio_writes(self, timeouts):
+        #print "test_daemon.py:AdapterServerTest:_gpio_writes"
+        batch = [(self.connection, i, OP_SET_GPIO, timeout, MASK.pack(1 << i, 1 << i))
+                 for i, timeout in enumerate(timeouts)]
+        self.server._execute_batch(batch)
+        return [result for request_id, result in self.connection.replies]
+
+    def test_merged_gpio_write_keeps_shortest_timeout(self):
+        #print "test_daemon.py:AdapterServerTest:test_merged_gpio_write_keeps_shortest_timeout"
+        self.assertEqual(self._gpio_writes([0, 1.0, 0.01]), [RESULT_DEADLINE_EXCEEDED] * 3)
+
+    def test_merged_gpio_write_without_timeouts(self):
+        #print "test_daemon.py:AdapterServerTest:test_merged_gpio_write_without_timeouts"
+        self.assertEqual(self._gpio_writes([0, 0]), [RESULT_OK] * 2)
+        self.assertEqual(self.sim.gpio_outputs & 0x03, 0x03)
+        self.assertEqual(self.server.commands_saved, 1)
+
+if __name__ == '__main__':
+    unittest.main()
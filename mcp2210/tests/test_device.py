@@ -0,0 +1,456 @@
+import threading
+import time
+import unittest
+
+from mcp2210 import commands
+from mcp2210.device import MCP2210, BusyBackoff, CommandException, DeadlineExceeded, VerificationError
+from mcp2210.simulator import SimulatedMCP2210
+from mcp2210.tests import simulated_device
+from mcp2210.transport import BufferedTransport
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+
+class TransferTest(unittest.TestCase):
+    #print "test_device.py:TransferTest"
+
+    def setUp(self):
+        #print "test_device.py:TransferTest:setUp"
+        self.sim, self.dev = simulated_device()
+
+    def test_loopback(self):
+        #print "test_device.py:TransferTest:test_loopback"
+        data = bytes(bytearray(range(256))) * 3
+        self.assertEqual(self.dev.transfer(data), data)
+        self.assertEqual(self.dev.transfer(b"x"), b"x")
+        self.assertEqual(self.dev.transfer(b""), b"")
+
+    def test_transfer_into(self):
+        #print "test_device.py:TransferTest:test_transfer_into"
+        rx = bytearray(200)
+        self.assertEqual(self.dev.transfer_into(memoryview(b"abc" * 50), rx), 150)
+        self.assertEqual(bytes(rx[:150]), b"abc" * 50)
+        self.assertRaises(ValueError, self.dev.transfer_into, b"abc", bytearray(2))
+
+    def test_slow_bus(self):
+        #print "test_device.py:TransferTest:test_slow_bus"
+        # With the factory delays the engine reports data pending, and the loop polls until it's done
+        dev = MCP2210(transport=SimulatedMCP2210(latency=0.0005))
+        self.assertEqual(dev.transfer(b"0123456789" * 13), b"0123456789" * 13)
+
+    def test_transaction_size_set_once(self):
+        #print "test_device.py:TransferTest:test_transaction_size_set_once"
+        handlers = self.sim._handlers
+        set_settings = handlers[commands.SetSPISettingsCommand.COMMAND]
+        sent = []
+        handlers[commands.SetSPISettingsCommand.COMMAND] = lambda report, response: (
+            sent.append(report[18]), set_settings(report, response))
+        self.dev.transfer(b"12345")
+        self.dev.transfer(b"67890")
+        self.dev.transfer(b"abcdef")
+        # The second transfer is the same size as the first, so only the first and third change it
+        self.assertEqual(sent, [5, 6])
+
+
+class _StuckEEPROM(SimulatedMCP2210):
+    #print "test_device.py:_StuckEEPROM"
+    """Simulator whose EEPROM acknowledges writes without storing them."""
+
+    def _write_eeprom(self, report, response):
+        #print "test_device.py:_StuckEEPROM:_write_eeprom"
+        pass
+
+
+class EEPROMTest(unittest.TestCase):
+    #print "test_device.py:EEPROMTest"
+
+    def setUp(self):
+        #print "test_device.py:EEPROMTest:setUp"
+        self.sim, self.dev = simulated_device()
+
+    def test_uncached(self):
+        #print "test_device.py:EEPROMTest:test_uncached"
+        self.dev.eeprom[0:3] = b"abc"
+        self.assertEqual(bytes(self.sim.eeprom[0:3]), b"abc")
+        self.assertEqual(self.dev.eeprom[1], b"b")
+
+    def test_commit_writes_only_changes(self):
+        #print "test_device.py:EEPROMTest:test_commit_writes_only_changes"
+        self.dev.eeprom.load()
+        self.dev.eeprom[0:4] = b"\x01\x02\x03\x04"
+        self.dev.eeprom[10] = b"\xff"  # Already erased, so nothing to write
+        self.assertEqual(bytes(self.sim.eeprom[0:4]), b"\xff" * 4)
+        self.assertEqual(self.dev.eeprom[0:4], b"\x01\x02\x03\x04")
+        self.assertEqual(self.dev.eeprom.dirty_ranges, [(0, 4), (10, 11)])
+        self.assertEqual(self.dev.eeprom.commit(), 4)
+        self.assertEqual(bytes(self.sim.eeprom[0:4]), b"\x01\x02\x03\x04")
+        self.assertEqual(self.dev.eeprom.dirty_ranges, [])
+        self.assertTrue(self.dev.eeprom.round_trips_saved >= 0)
+
+    def test_cached_reads_cost_nothing(self):
+        #print "test_device.py:EEPROMTest:test_cached_reads_cost_nothing"
+        self.dev.eeprom.load()
+        reports = self.sim.reports
+        for i in range(3):
+            self.assertEqual(self.dev.eeprom[0:256], b"\xff" * 256)
+        self.assertEqual(self.sim.reports, reports)
+        self.assertEqual(self.dev.eeprom.round_trips_saved, 3 * 256 - 256)
+        self.dev.eeprom[0] = 1
+        self.dev.eeprom.invalidate()
+        self.assertFalse(self.dev.eeprom.cached)
+        self.assertEqual(self.dev.eeprom[0], b"\xff")
+
+    def test_negative_index(self):
+        #print "test_device.py:EEPROMTest:test_negative_index"
+        self.dev.eeprom[-1] = 7
+        self.assertEqual(self.sim.eeprom[255], 7)
+        self.dev.eeprom.load()
+        self.assertEqual(self.dev.eeprom[-1], b"\x07")
+        self.dev.eeprom[-2] = 8
+        self.assertEqual(self.dev.eeprom.dirty_ranges, [(254, 255)])
+        self.assertEqual(self.dev.eeprom.commit(), 1)
+        self.assertEqual(self.sim.eeprom[254], 8)
+        self.assertRaises(IndexError, self.dev.eeprom.__getitem__, 256)
+        self.assertRaises(IndexError, self.dev.eeprom.__setitem__, -257, 0)
+
+    def test_commit_verifies(self):
+        #print "test_device.py:EEPROMTest:test_commit_verifies"
+        dev = MCP2210(transport=_StuckEEPROM(latency=0))
+        dev.eeprom.load()
+        dev.eeprom[5] = 0
+        self.assertRaises(VerificationError, dev.eeprom.commit)
+
+
+class GPIOTest(unittest.TestCase):
+    #print "test_device.py:GPIOTest"
+
+    def setUp(self):
+        #print "test_device.py:GPIOTest:setUp"
+        self.sim, self.dev = simulated_device()
+        self.dev.gpio_direction.raw = 0
+        self.dev.gpio.raw = 0
+
+    def test_batch_sends_one_command(self):
+        #print "test_device.py:GPIOTest:test_batch_sends_one_command"
+        reports = self.sim.reports
+        with self.dev.gpio.batch():
+            self.dev.gpio[0] = 1
+            with self.dev.gpio.batch():
+                self.dev.gpio[2] = 1
+            self.dev.gpio.write_mask(0xF0, 0x30)
+            self.assertEqual(self.sim.gpio_outputs, 0)
+        self.assertEqual(self.sim.reports, reports + 1)
+        self.assertEqual(self.sim.gpio_outputs, 0x35)
+
+    def test_unchanged_batch_sends_nothing(self):
+        #print "test_device.py:GPIOTest:test_unchanged_batch_sends_nothing"
+        reports = self.sim.reports
+        with self.dev.gpio.batch():
+            self.dev.gpio[0] = 0
+        self.assertEqual(self.sim.reports, reports)
+
+    def test_batch_discarded_on_exception(self):
+        #print "test_device.py:GPIOTest:test_batch_discarded_on_exception"
+        try:
+            with self.dev.gpio.batch():
+                self.dev.gpio[1] = 1
+                raise RuntimeError()
+        except RuntimeError:
+            pass
+        self.assertEqual(self.sim.gpio_outputs, 0)
+        self.assertEqual(self.dev.gpio[1], 0)
+
+    def test_batch_unwinds_on_keyboard_interrupt(self):
+        #print "test_device.py:GPIOTest:test_batch_unwinds_on_keyboard_interrupt"
+        try:
+            with self.dev.gpio.batch():
+                self.dev.gpio[1] = 1
+                raise KeyboardInterrupt()
+        except KeyboardInterrupt:
+            pass
+        self.dev.gpio[2] = 1
+        self.assertEqual(self.sim.gpio_outputs, 0x04)
+
+    def test_chip_settings_update_shadows(self):
+        #print "test_device.py:GPIOTest:test_chip_settings_update_shadows"
+        settings = self.dev.chip_settings
+        settings.gpio_outputs = 0x005
+        settings.gpio_directions = 0x000
+        self.dev.chip_settings = settings
+        self.dev.gpio[8] = 1
+        self.assertEqual(self.sim.gpio_outputs, 0x105)
+
+        settings = self.dev.chip_settings
+        settings.gpio_directions = 0x1F0
+        self.dev.chip_settings = settings
+        reports = self.sim.reports
+        self.assertEqual(self.dev.gpio_direction.raw, 0x1F0)
+        self.assertEqual(self.sim.reports, reports)
+
+    def test_preloaded_chip_settings_update_shadows(self):
+        #print "test_device.py:GPIOTest:test_preloaded_chip_settings_update_shadows"
+        settings = self.dev.chip_settings
+        self.sim.gpio_outputs = settings.gpio_outputs = 0x003
+        self.dev.preload_settings(chip_settings=settings)
+        self.dev.gpio[4] = 1
+        self.assertEqual(self.sim.gpio_outputs, 0x013)
+
+
+class SettingsCacheTest(unittest.TestCase):
+    #print "test_device.py:SettingsCacheTest"
+
+    def setUp(self):
+        #print "test_device.py:SettingsCacheTest:setUp"
+        self.sim, self.dev = simulated_device()
+
+    def test_reads_are_cached(self):
+        #print "test_device.py:SettingsCacheTest:test_reads_are_cached"
+        self.dev.boot_chip_settings
+        reports = self.sim.reports
+        settings = self.dev.boot_chip_settings
+        self.assertEqual(self.sim.reports, reports)
+        # Reads return copies, so changing one doesn't touch the cache
+        settings.gpio_outputs = 0x1234
+        self.assertNotEqual(self.dev.boot_chip_settings.gpio_outputs, 0x1234)
+
+    def test_unchanged_write_is_skipped(self):
+        #print "test_device.py:SettingsCacheTest:test_unchanged_write_is_skipped"
+        settings = self.dev.transfer_settings
+        reports = self.sim.reports
+        self.dev.transfer_settings = settings
+        self.assertEqual(self.sim.reports, reports)
+        self.assertEqual(self.dev.settings_writes_skipped, 1)
+        settings.bit_rate = 1000000
+        self.dev.transfer_settings = settings
+        self.assertEqual(self.sim.reports, reports + 1)
+        self.assertEqual(self.sim.spi_settings.bit_rate, 1000000)
+
+    def test_ttl(self):
+        #print "test_device.py:SettingsCacheTest:test_ttl"
+        self.dev.settings_ttl = 0.02
+        self.dev.chip_settings
+        reports = self.sim.reports
+        self.dev.chip_settings
+        self.assertEqual(self.sim.reports, reports)
+        time.sleep(0.03)
+        self.dev.chip_settings
+        self.assertEqual(self.sim.reports, reports + 1)
+
+    def test_invalidate(self):
+        #print "test_device.py:SettingsCacheTest:test_invalidate"
+        self.dev.product_name
+        self.dev.invalidate_settings('product_name')
+        reports = self.sim.reports
+        self.assertEqual(self.dev.product_name, SimulatedMCP2210.DEFAULT_PRODUCT)
+        self.assertEqual(self.sim.reports, reports + 1)
+
+
+class _RecordingSlave(object):
+    #print "test_device.py:_RecordingSlave"
+    """Loopback SPI slave that records the data of each transaction."""
+
+    def __init__(self):
+        #print "test_device.py:_RecordingSlave:__init__"
+        self.transactions = [b""]
+
+    def exchange(self, data, settings):
+        #print "test_device.py:_RecordingSlave:exchange"
+        self.transactions[-1] += bytes(data)
+        return data
+
+    def release(self):
+        #print "test_device.py:_RecordingSlave:release"
+        self.transactions.append(b"")
+
+
+class StreamTest(unittest.TestCase):
+    #print "test_device.py:StreamTest"
+
+    def setUp(self):
+        #print "test_device.py:StreamTest:setUp"
+        self.slave = _RecordingSlave()
+        self.sim, self.dev = simulated_device(slave=self.slave)
+        self.pulled = 0
+
+    def _chunks(self, count, size):
+        #print "test_device.py:StreamTest:_chunks"
+        for i in range(count):
+            self.pulled += 1
+            yield bytes(bytearray([i]) * size)
+
+    def test_chunk_per_transaction(self):
+        #print "test_device.py:StreamTest:test_chunk_per_transaction"
+        received = b"".join(self.dev.transfer_stream(self._chunks(3, 100)))
+        self.assertEqual(received, b"\x00" * 100 + b"\x01" * 100 + b"\x02" * 100)
+        self.assertEqual(self.slave.transactions[:-1], [b"\x00" * 100, b"\x01" * 100, b"\x02" * 100])
+
+    def test_length_joins_chunks(self):
+        #print "test_device.py:StreamTest:test_length_joins_chunks"
+        received = b"".join(self.dev.transfer_stream(self._chunks(5, 25), length=110))
+        self.assertEqual(len(received), 110)
+        self.assertEqual(self.slave.transactions[:-1], [received])
+
+    def test_chunks_pulled_lazily(self):
+        #print "test_device.py:StreamTest:test_chunks_pulled_lazily"
+        stream = self.dev.transfer_stream(self._chunks(1000, 30), length=30000)
+        self.assertEqual(next(stream), b"\x00" * 30 + b"\x01" * 30)
+        # Received data lags a report behind, so at most one more report's worth has been pulled
+        self.assertEqual(self.pulled, 4)
+        for i in range(10):
+            next(stream)
+        self.assertEqual(self.pulled, 24)
+        stream.close()
+
+    def test_short_input(self):
+        #print "test_device.py:StreamTest:test_short_input"
+        stream = self.dev.transfer_stream(self._chunks(2, 10), length=100)
+        self.assertRaises(ValueError, list, stream)
+
+
+class TimeoutTest(unittest.TestCase):
+    #print "test_device.py:TimeoutTest"
+
+    def setUp(self):
+        #print "test_device.py:TimeoutTest:setUp"
+        self.sim, self.dev = simulated_device()
+        self.dev.response_timeout = 0.01
+
+    def test_lost_response(self):
+        #print "test_device.py:TimeoutTest:test_lost_response"
+        self.dev.chip_settings
+        self.sim.lose_responses = 1
+        self.assertRaises(DeadlineExceeded, self.dev.chip_status)
+        # The command may have taken effect, so cached settings are dropped
+        self.assertEqual(self.dev.cached_settings(), {})
+        self.assertEqual(self.dev.chip_status().bus_owner, commands.BUS_OWNER_NONE)
+
+    def test_late_response_is_drained(self):
+        #print "test_device.py:TimeoutTest:test_late_response_is_drained"
+        self.dev.gpio_direction.raw = 0x0F0
+        self.sim.latency = 0.02
+        self.assertRaises(DeadlineExceeded, self.dev.gpio_direction.read)
+        self.sim.latency = 0
+        time.sleep(0.03)
+        self.sim.gpio_directions = 0x00F
+        # The late response to the same command must not be taken for the answer to this one
+        self.assertEqual(self.dev.gpio_direction.read(), 0x00F)
+        self.assertEqual(self.dev.stale_responses, 1)
+
+    def test_time_limit(self):
+        #print "test_device.py:TimeoutTest:test_time_limit"
+        self.sim.latency = 0.005
+        start = monotonic()
+        with self.dev.time_limit(0.02):
+            self.assertRaises(DeadlineExceeded, self.dev.transfer, b"\0" * 2000)
+        self.assertTrue(monotonic() - start < 0.5)
+        # The abandoned transaction was cancelled, so the next one starts cleanly
+        self.sim.latency = 0
+        self.assertEqual(self.dev.transfer(b"again"), b"again")
+
+    def test_busy_retries_stop_at_deadline(self):
+        #print "test_device.py:TimeoutTest:test_busy_retries_stop_at_deadline"
+        self.dev.response_timeout = 1.0
+        self.dev.backoff.record(commands.SPITransferCommand.COMMAND, 0.5, 1, 0.5)
+        self.sim.bus_owner = commands.BUS_OWNER_EXTERNAL
+        start = monotonic()
+        with self.dev.time_limit(0.02):
+            self.assertRaises(DeadlineExceeded, self.dev.transfer, b"abc")
+        self.assertTrue(monotonic() - start < 0.25)
+
+
+class BufferedTransportTest(unittest.TestCase):
+    #print "test_device.py:BufferedTransportTest"
+
+    def setUp(self):
+        #print "test_device.py:BufferedTransportTest:setUp"
+        self.sim = SimulatedMCP2210(latency=0)
+        self.transport = BufferedTransport(self.sim, queue_size=2)
+
+    def tearDown(self):
+        #print "test_device.py:BufferedTransportTest:tearDown"
+        self.transport.close()
+
+    def test_transfer(self):
+        #print "test_device.py:BufferedTransportTest:test_transfer"
+        dev = MCP2210(transport=self.transport)
+        self.assertEqual(dev.transfer(b"0123456789" * 20), b"0123456789" * 20)
+        self.assertEqual(self.transport.dropped, 0)
+
+    def test_oldest_report_dropped(self):
+        #print "test_device.py:BufferedTransportTest:test_oldest_report_dropped"
+        report = bytearray(64)
+        for address in range(4):
+            self.sim.eeprom[address] = address
+            report[:3] = bytearray([commands.ReadEEPROMCommand.COMMAND, address, 0])
+            self.transport.write(report)
+        end = monotonic() + 1.0
+        while self.transport.dropped < 2 and monotonic() < end:
+            time.sleep(0.001)
+        self.assertEqual(self.transport.dropped, 2)
+        self.assertEqual(self.transport.read_into(report, 0.1), 64)
+        self.assertEqual(report[2:4], bytearray([2, 2]))
+        self.assertEqual(self.transport.read_into(report, 0.1), 64)
+        self.assertEqual(report[2:4], bytearray([3, 3]))
+        self.assertEqual(self.transport.read_into(report, 0.01), 0)
+
+
+class BusyBackoffTest(unittest.TestCase):
+    #print "test_device.py:BusyBackoffTest"
+
+    def test_delay_grows_from_learned_wait(self):
+        #print "test_device.py:BusyBackoffTest:test_delay_grows_from_learned_wait"
+        backoff = BusyBackoff()
+        backoff.record(1, 0.0, 0, 0.001)
+        wait = backoff.start(1)
+        delays = []
+        for i in range(4):
+            wait.sleep(commands.STATUS_BUSY)
+            delays.append(wait.delay)
+        self.assertEqual(delays, [0.001, 0.002, 0.004, backoff.MAX_DELAY])
+
+    def test_long_learned_wait_is_not_capped(self):
+        #print "test_device.py:BusyBackoffTest:test_long_learned_wait_is_not_capped"
+        backoff = BusyBackoff()
+        backoff.record(1, 0.0, 0, 0.02)
+        wait = backoff.start(1, deadline=monotonic())
+        wait.sleep(commands.STATUS_BUSY)
+        wait.sleep(commands.STATUS_BUSY)
+        self.assertEqual(wait.delay, 0.02)
+
+    def test_sleep_stops_at_deadline(self):
+        #print "test_device.py:BusyBackoffTest:test_sleep_stops_at_deadline"
+        backoff = BusyBackoff()
+        backoff.record(1, 0.0, 0, 0.5)
+        start = monotonic()
+        backoff.start(1, deadline=start + 0.01).sleep(commands.STATUS_BUSY)
+        self.assertTrue(monotonic() - start < 0.25)
+
+    def test_timeout(self):
+        #print "test_device.py:BusyBackoffTest:test_timeout"
+        backoff = BusyBackoff(timeout=0.0)
+        wait = backoff.start(1)
+        time.sleep(0.001)
+        self.assertRaises(CommandException, wait.sleep, commands.STATUS_BUSY)
+
+    def test_learns_from_busy_bus(self):
+        #print "test_device.py:BusyBackoffTest:test_learns_from_busy_bus"
+        sim, dev = simulated_device()
+        sim.bus_owner = commands.BUS_OWNER_EXTERNAL
+        timer = threading.Timer(0.01, setattr, (sim, 'bus_owner', commands.BUS_OWNER_NONE))
+        timer.start()
+        try:
+            self.assertEqual(dev.transfer(b"abc"), b"abc")
+        finally:
+            timer.join()
+        stats = dev.backoff.stats()[commands.SPITransferCommand.COMMAND]
+        self.assertEqual(stats['waits'], 1)
+        self.assertTrue(stats['retries'] >= 1)
+        self.assertTrue(stats['wait_time'] >= 0.005)
+        self.assertTrue(stats['typical_wait'] > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from mcp2210.flash import SPIFlash
+from mcp2210.simulator import SPIFlashModel
+from mcp2210.tests import simulated_device
+
+
+class SPIFlashTest(unittest.TestCase):
+    #print "test_flash.py:SPIFlashTest"
+
+    def setUp(self):
+        #print "test_flash.py:SPIFlashTest:setUp"
+        self.chip = SPIFlashModel(size=1 << 18, program_time=0, erase_time=0)
+        self.sim, self.dev = simulated_device(slave=self.chip)
+        self.flash = SPIFlash(self.dev)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        #print "test_flash.py:SPIFlashTest:tearDown"
+        shutil.rmtree(self.directory)
+
+    def _image(self, data):
+        #print "test_flash.py:SPIFlashTest:_image"
+        path = os.path.join(self.directory, 'image.bin')
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_jedec_id(self):
+        #print "test_flash.py:SPIFlashTest:test_jedec_id"
+        self.assertEqual(self.flash.jedec_id(), (0xEF, 0x40, 0x14))
+
+    def test_read_to_file(self):
+        #print "test_flash.py:SPIFlashTest:test_read_to_file"
+        # Long enough to take several fast reads, the last of them short
+        length = 2 * self.flash.read_size + 1000
+        self.chip.memory[:] = bytearray(i * 7 & 0xFF for i in range(len(self.chip.memory)))
+        path = os.path.join(self.directory, 'backup.bin')
+        self.flash.read_to_file(path, 16, length)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), bytes(self.chip.memory[16:16 + length]))
+        self.assertEqual(self.flash.bytes_read, length)
+
+    def test_write_skips_unchanged_pages(self):
+        #print "test_flash.py:SPIFlashTest:test_write_skips_unchanged_pages"
+        image = bytes(bytearray(i & 0xFF for i in range(2 * SPIFlash.SECTOR_SIZE)))
+        path = self._image(image)
+        stats = self.flash.write_from_file(path, 0x1000)
+        self.assertEqual(bytes(self.chip.memory[0x1000:0x3000]), image)
+        self.assertEqual(stats['pages_programmed'], 32)
+        self.assertEqual(stats['sectors_erased'], 0)
+
+        self.flash.reset_stats()
+        stats = self.flash.write_from_file(path, 0x1000)
+        self.assertEqual(stats['pages_programmed'], 0)
+        self.assertEqual(stats['pages_skipped'], 32)
+
+    def test_erase_only_when_needed(self):
+        #print "test_flash.py:SPIFlashTest:test_erase_only_when_needed"
+        self.chip.memory[0:0x2000] = b"\x0f" * 0x2000
+        # Clearing bits programs over the old data; setting any needs an erase
+        path = self._image(b"\x05" * 0x1000 + b"\x1f" * 0x1000)
+        stats = self.flash.write_from_file(path)
+        self.assertEqual(stats['sectors_erased'], 1)
+        self.assertEqual(bytes(self.chip.memory[0:0x2000]), b"\x05" * 0x1000 + b"\x1f" * 0x1000)
+
+    def test_partial_sector_keeps_tail(self):
+        #print "test_flash.py:SPIFlashTest:test_partial_sector_keeps_tail"
+        self.chip.memory[0:0x1000] = b"\x00" * 0x1000
+        self.flash.write_from_file(self._image(b"\xaa" * 100))
+        self.assertEqual(self.flash.sectors_erased, 1)
+        self.assertEqual(bytes(self.chip.memory[0:100]), b"\xaa" * 100)
+        self.assertEqual(bytes(self.chip.memory[100:0x1000]), b"\x00" * (0x1000 - 100))
+
+    def test_unaligned_address(self):
+        #print "test_flash.py:SPIFlashTest:test_unaligned_address"
+        self.assertRaises(ValueError, self.flash.write_from_file, self._image(b"x"), 0x100)
+
+
+if __name__ == '__main__':
+    unittest.main()
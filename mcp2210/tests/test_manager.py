@@ -0,0 +1,78 @@
+import threading
+import unittest
+
+from mcp2210.device import MCP2210
+from mcp2210.manager import DeviceManager
+from mcp2210.simulator import SimulatedMCP2210
+
+
+class DeviceManagerTest(unittest.TestCase):
+    #print "test_manager.py:DeviceManagerTest"
+
+    def setUp(self):
+        #print "test_manager.py:DeviceManagerTest:setUp"
+        # Two adapters with different response latencies, as a mixed set on one hub would have
+        self.sims = {'A': SimulatedMCP2210(latency=0), 'B': SimulatedMCP2210(latency=0.0002)}
+        self.manager = DeviceManager()
+        for name, sim in self.sims.items():
+            self.manager.add(name, MCP2210(transport=sim))
+
+    def tearDown(self):
+        #print "test_manager.py:DeviceManagerTest:tearDown"
+        self.manager.close()
+
+    def test_transfer_all(self):
+        #print "test_manager.py:DeviceManagerTest:test_transfer_all"
+        futures = self.manager.transfer_all(b"0123456789" * 10)
+        self.assertEqual(sorted(futures), ['A', 'B'])
+        for future in futures.values():
+            self.assertEqual(future.result(), b"0123456789" * 10)
+
+    def test_map_runs_on_worker_threads(self):
+        #print "test_manager.py:DeviceManagerTest:test_map_runs_on_worker_threads"
+        def read(device, address):
+            return threading.current_thread(), device.eeprom[address]
+        futures = self.manager.map(read, 3)
+        threads = set()
+        for future in futures.values():
+            thread, value = future.result()
+            threads.add(thread)
+            self.assertEqual(value, b"\xff")
+        self.assertEqual(len(threads), 2)
+        self.assertFalse(threading.current_thread() in threads)
+
+    def test_jobs_run_in_submission_order(self):
+        #print "test_manager.py:DeviceManagerTest:test_jobs_run_in_submission_order"
+        worker = self.manager['A']
+        order = []
+        futures = [worker.submit(lambda device, i: order.append(i), i) for i in range(20)]
+        for future in futures:
+            future.result()
+        self.assertEqual(order, list(range(20)))
+
+    def test_stats(self):
+        #print "test_manager.py:DeviceManagerTest:test_stats"
+        self.assertEqual(self.manager.stats()['total']['throughput'], 0.0)
+        self.manager['A'].transfer(b"x" * 64).result()
+        self.manager['A'].submit(MCP2210.transfer, b"ignored").result()
+        for future in self.manager.transfer_all(b"y" * 32).values():
+            future.result()
+        stats = self.manager.stats()
+        self.assertEqual(stats['A']['jobs'], 3)
+        self.assertEqual(stats['A']['bytes'], 96)
+        self.assertEqual(stats['B']['bytes'], 32)
+        self.assertEqual(stats['total']['jobs'], 4)
+        self.assertEqual(stats['total']['bytes'], 128)
+        self.assertTrue(stats['total']['throughput'] > 0)
+
+    def test_failed_job_is_counted(self):
+        #print "test_manager.py:DeviceManagerTest:test_failed_job_is_counted"
+        def fail(device):
+            raise ValueError()
+        self.assertRaises(ValueError, self.manager['B'].submit(fail).result)
+        self.assertEqual(self.manager['B'].stats['jobs'], 1)
+        self.assertEqual(len(self.manager), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from mcp2210.device import DeadlineExceeded
+from mcp2210.metrics import Metrics, MeteredTransport
+from mcp2210.tests import simulated_device
+
+
+class MetricsTest(unittest.TestCase):
+    #print "test_metrics.py:MetricsTest"
+
+    def setUp(self):
+        #print "test_metrics.py:MetricsTest:setUp"
+        self.sim, self.dev = simulated_device()
+        self.dev.metrics = Metrics(labels={'adapter': 'test'})
+
+    def test_counts_by_command_class(self):
+        #print "test_metrics.py:MetricsTest:test_counts_by_command_class"
+        self.dev.boot_chip_settings
+        self.dev.boot_transfer_settings
+        self.dev.product_name
+        self.dev.transfer(b"x" * 100)
+        snapshot = self.dev.metrics.snapshot()
+        for name in ('GetBootChipSettings', 'GetBootSPISettings', 'GetUSBProduct'):
+            self.assertEqual(snapshot[name]['count'], 1)
+        self.assertEqual(snapshot['SPITransfer']['spi_sent'], 100)
+        self.assertEqual(snapshot['SPITransfer']['spi_received'], 100)
+        self.assertEqual(snapshot['SPITransfer']['latency']['buckets'][-1][1], snapshot['SPITransfer']['count'])
+
+    def test_each_timeout_counted_once(self):
+        #print "test_metrics.py:MetricsTest:test_each_timeout_counted_once"
+        for i in range(2):
+            self.dev.response_timeout = 0.01
+            self.sim.latency = 0.02
+            self.assertRaises(DeadlineExceeded, self.dev.chip_status)
+            self.sim.latency = 0
+            self.dev.response_timeout = 1.0
+            time.sleep(0.03)
+            self.dev.chip_status()
+        self.assertEqual(self.dev.stale_responses, 2)
+        stats = self.dev.metrics.snapshot()['GetChipStatus']
+        self.assertEqual((stats['count'], stats['timeouts']), (4, 2))
+        self.assertTrue('mcp2210_command_timeouts_total{adapter="test",command="GetChipStatus"} 2'
+                        in self.dev.metrics.prometheus_text().splitlines())
+
+    def test_statuses(self):
+        #print "test_metrics.py:MetricsTest:test_statuses"
+        self.assertRaises(Exception, self.dev.authenticate, b"wrong")
+        self.assertEqual(len(self.dev.metrics.snapshot()['SendPassword']['statuses']), 1)
+
+    def test_export(self):
+        #print "test_metrics.py:MetricsTest:test_export"
+        self.dev.transfer(b"data")
+        exported = []
+        self.dev.metrics.export(exported.append)
+        self.assertTrue('# TYPE mcp2210_command_latency_seconds histogram' in exported[0])
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'mcp2210.prom')
+            self.dev.metrics.export(path)
+            with open(path) as f:
+                self.assertEqual(f.read(), exported[0])
+            self.assertEqual(os.listdir(directory), ['mcp2210.prom'])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_disable(self):
+        #print "test_metrics.py:MetricsTest:test_disable"
+        self.assertTrue(isinstance(self.dev.transport, MeteredTransport))
+        self.dev.metrics = None
+        self.assertTrue(self.dev.transport is self.sim)
+        self.assertFalse('sendCommand' in self.dev.__dict__)
+
+
+if __name__ == '__main__':
+    unittest.main()
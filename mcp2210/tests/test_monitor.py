@@ -0,0 +1,84 @@
+import time
+import unittest
+
+from mcp2210 import commands
+from mcp2210.monitor import EventMonitor
+from mcp2210.tests import simulated_device
+
+
+class EventCounterTest(unittest.TestCase):
+    #print "test_monitor.py:EventCounterTest"
+
+    def setUp(self):
+        #print "test_monitor.py:EventCounterTest:setUp"
+        self.sim, self.dev = simulated_device()
+
+    def test_counts_only_when_configured(self):
+        #print "test_monitor.py:EventCounterTest:test_counts_only_when_configured"
+        self.sim.pulse(3)
+        self.assertEqual(self.dev.event_count(), 0)
+        self.dev.configure_event_counter(commands.EVENT_COUNT_RISING_EDGES)
+        self.assertEqual(self.dev.chip_settings.pin_designations[6], commands.PIN_DEDICATED)
+        self.sim.pulse(3)
+        self.assertEqual(self.dev.event_count(), 3)
+        self.assertEqual(self.dev.event_count(reset=True), 3)
+        self.assertEqual(self.dev.event_count(), 0)
+        self.sim.pulse(0x10000)
+        self.assertEqual(self.dev.event_count(), 0xFFFF)
+
+    def test_chip_status(self):
+        #print "test_monitor.py:EventCounterTest:test_chip_status"
+        self.assertEqual(self.dev.chip_status().bus_owner, commands.BUS_OWNER_NONE)
+        self.sim.bus_owner = commands.BUS_OWNER_EXTERNAL
+        status = self.dev.chip_status()
+        self.assertEqual(status.bus_owner, commands.BUS_OWNER_EXTERNAL)
+        # The status is a copy, so it outlives the next command
+        self.dev.event_count()
+        self.assertEqual(status.bus_owner, commands.BUS_OWNER_EXTERNAL)
+
+
+class EventMonitorTest(unittest.TestCase):
+    #print "test_monitor.py:EventMonitorTest"
+
+    def setUp(self):
+        #print "test_monitor.py:EventMonitorTest:setUp"
+        self.sim, self.dev = simulated_device()
+        self.dev.configure_event_counter(commands.EVENT_COUNT_FALLING_EDGES)
+        self.monitor = EventMonitor(self.dev, interval=0.001)
+        self.counts = []
+        self.owners = []
+        self.monitor.on_count(lambda delta, total, timestamp: self.counts.append((delta, total)))
+        self.monitor.on_bus_owner(lambda old, new, timestamp: self.owners.append((old, new)))
+
+    def test_poll(self):
+        #print "test_monitor.py:EventMonitorTest:test_poll"
+        reports = self.sim.reports
+        self.monitor.poll()
+        # One command for the counter and one for the status
+        self.assertEqual(self.sim.reports, reports + 2)
+        self.assertEqual(self.counts, [])
+        self.assertEqual(self.owners, [(None, commands.BUS_OWNER_NONE)])
+
+        self.sim.pulse(4)
+        self.monitor.poll()
+        self.sim.pulse(1)
+        self.sim.bus_owner = commands.BUS_OWNER_EXTERNAL
+        self.monitor.poll()
+        self.monitor.poll()
+        self.assertEqual(self.counts, [(4, 4), (1, 5)])
+        self.assertEqual(self.owners[1:], [(commands.BUS_OWNER_NONE, commands.BUS_OWNER_EXTERNAL)])
+        self.assertEqual(self.monitor.total, 5)
+
+    def test_thread(self):
+        #print "test_monitor.py:EventMonitorTest:test_thread"
+        with self.monitor:
+            self.sim.pulse(2)
+            end = time.time() + 5.0
+            while self.monitor.total < 2 and time.time() < end:
+                time.sleep(0.001)
+        self.assertEqual(self.monitor.total, 2)
+        self.assertTrue(self.monitor.polls >= 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mcp2210.device import MCP2210, VerificationError
+from mcp2210.manager import DeviceManager
+from mcp2210.provision import Provisioner, load_config, snapshot
+from mcp2210.simulator import ACCESS_PASSWORD, SimulatedMCP2210
+
+GOLDEN = {
+    'product_name': u"Sensor bridge",
+    'boot_transfer_settings': {'bit_rate': 4000000, 'spi_mode': 3},
+    'boot_chip_settings': {'pin_designations': [1, 1, 1, 0, 0, 0, 2, 0, 0]},
+    'eeprom': {'0x10': 'c0ffee'},
+}
+
+
+class _StuckEEPROM(SimulatedMCP2210):
+    #print "test_provision.py:_StuckEEPROM"
+    """Simulator whose EEPROM acknowledges writes without storing them."""
+
+    def _write_eeprom(self, report, response):
+        #print "test_provision.py:_StuckEEPROM:_write_eeprom"
+        pass
+
+
+class ProvisionerTest(unittest.TestCase):
+    #print "test_provision.py:ProvisionerTest"
+
+    def setUp(self):
+        #print "test_provision.py:ProvisionerTest:setUp"
+        self.sim = SimulatedMCP2210(latency=0)
+        self.dev = MCP2210(transport=self.sim)
+        self.provisioner = Provisioner(GOLDEN)
+
+    def test_diff(self):
+        #print "test_provision.py:ProvisionerTest:test_diff"
+        changes = self.provisioner.diff(self.dev)
+        self.assertEqual(sorted(changes), ['boot_chip_settings', 'boot_transfer_settings', 'eeprom',
+                                           'product_name'])
+        # The erased EEPROM already holds 0xFF at 0x11
+        self.assertEqual(changes['eeprom'], {0x10: 0xC0, 0x12: 0xEE})
+        # Fields the configuration leaves out keep the adapter's values
+        spi_tx_size = changes['boot_transfer_settings'].spi_tx_size
+        self.assertEqual(spi_tx_size, self.sim.boot_spi_settings.spi_tx_size)
+
+        self.sim.eeprom[0x10:0x13] = b"\xc0\xff\xee"
+        self.assertFalse('eeprom' in self.provisioner.diff(self.dev))
+
+    def test_provision(self):
+        #print "test_provision.py:ProvisionerTest:test_provision"
+        report = self.provisioner.provision(self.dev)
+        self.assertEqual(report['changed'], ['boot_chip_settings', 'boot_transfer_settings', 'product_name'])
+        self.assertEqual(report['eeprom_bytes'], 2)
+        self.assertEqual(report['commands'], 5)
+        self.assertEqual(self.sim.boot_spi_settings.bit_rate, 4000000)
+        self.assertEqual(self.sim.eeprom[0x10:0x13], bytearray(b"\xc0\xff\xee"))
+
+        report = self.provisioner.provision(self.dev)
+        self.assertEqual(report['commands'], 0)
+
+    def test_new_password_is_always_sent(self):
+        #print "test_provision.py:ProvisionerTest:test_new_password_is_always_sent"
+        provisioner = Provisioner({'boot_chip_settings': {'access_control': ACCESS_PASSWORD,
+                                                          'new_password': u"secret"}})
+        self.assertEqual(sorted(provisioner.diff(self.dev)), ['boot_chip_settings'])
+        self.assertEqual(provisioner.provision(self.dev)['changed'], ['boot_chip_settings'])
+        self.assertEqual(self.sim.password, b"secret")
+        # The password can't be read back, so it is still reported as a change
+        self.assertEqual(sorted(provisioner.diff(self.dev)), ['boot_chip_settings'])
+
+    def test_verify(self):
+        #print "test_provision.py:ProvisionerTest:test_verify"
+        dev = MCP2210(transport=_StuckEEPROM(latency=0))
+        self.assertRaises(VerificationError, self.provisioner.provision, dev)
+        self.assertEqual(self.provisioner.provision(dev, verify=False)['eeprom_bytes'], 2)
+
+    def test_unknown_field(self):
+        #print "test_provision.py:ProvisionerTest:test_unknown_field"
+        provisioner = Provisioner({'boot_transfer_settings': {'bitrate': 1000000}})
+        self.assertRaises(ValueError, provisioner.diff, self.dev)
+
+    def test_snapshot_round_trip(self):
+        #print "test_provision.py:ProvisionerTest:test_snapshot_round_trip"
+        self.provisioner.provision(self.dev)
+        golden = snapshot(self.dev)
+        other = MCP2210(transport=SimulatedMCP2210(latency=0))
+        Provisioner(golden).provision(other)
+        self.assertEqual(snapshot(other), golden)
+
+
+class ProvisionAllTest(unittest.TestCase):
+    #print "test_provision.py:ProvisionAllTest"
+
+    def setUp(self):
+        #print "test_provision.py:ProvisionAllTest:setUp"
+        self.directory = tempfile.mkdtemp()
+        self.manager = DeviceManager()
+        self.sims = [SimulatedMCP2210(latency=0), _StuckEEPROM(latency=0)]
+        for i, sim in enumerate(self.sims):
+            self.manager.add("sim%d" % i, MCP2210(transport=sim))
+
+    def tearDown(self):
+        #print "test_provision.py:ProvisionAllTest:tearDown"
+        self.manager.close()
+        shutil.rmtree(self.directory)
+
+    def test_provision_all(self):
+        #print "test_provision.py:ProvisionAllTest:test_provision_all"
+        path = os.path.join(self.directory, 'golden.json')
+        with open(path, 'w') as f:
+            json.dump(GOLDEN, f)
+        futures = Provisioner(load_config(path)).provision_all(self.manager)
+        self.assertEqual(futures['sim0'].result()['eeprom_bytes'], 2)
+        # One adapter failing doesn't affect the other
+        self.assertRaises(VerificationError, futures['sim1'].result)
+        self.assertEqual(self.sims[1].product, self.sims[0].product)
+
+    def test_load_config_rejects_unknown_keys(self):
+        #print "test_provision.py:ProvisionAllTest:test_load_config_rejects_unknown_keys"
+        path = os.path.join(self.directory, 'golden.json')
+        with open(path, 'w') as f:
+            json.dump({'product': u"Sensor bridge"}, f)
+        self.assertRaises(ValueError, load_config, path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import time
+import unittest
+
+from mcp2210 import commands
+from mcp2210.device import DeadlineExceeded
+from mcp2210.sampler import GPIOSampler
+from mcp2210.tests import simulated_device
+
+
+class GPIOSamplerTest(unittest.TestCase):
+    #print "test_sampler.py:GPIOSamplerTest"
+
+    def setUp(self):
+        #print "test_sampler.py:GPIOSamplerTest:setUp"
+        self.sim, self.dev = simulated_device()
+        # GP3 toggles every fifth time the pins are read, so edges land on known samples
+        handlers = self.sim._handlers
+        get_gpio = handlers[commands.GetGPIOValueCommand.COMMAND]
+        self.polls = 0
+
+        def toggling_get_gpio(report, response):
+            self.sim.gpio_inputs = 0x008 if (self.polls // 5) % 2 else 0x000
+            self.polls += 1
+            get_gpio(report, response)
+        handlers[commands.GetGPIOValueCommand.COMMAND] = toggling_get_gpio
+
+    def _sample(self, sampler, count):
+        #print "test_sampler.py:GPIOSamplerTest:_sample"
+        with sampler:
+            end = time.time() + 5.0
+            while sampler.count < count and time.time() < end:
+                time.sleep(0.001)
+        self.assertTrue(sampler.count >= count)
+
+    def test_edges_and_callbacks(self):
+        #print "test_sampler.py:GPIOSamplerTest:test_edges_and_callbacks"
+        sampler = GPIOSampler(self.dev)
+        changes = []
+        sampler.on_change(3, lambda pin, level, timestamp: changes.append((pin, level)))
+        sampler.on_change(4, lambda pin, level, timestamp: changes.append((pin, level)))
+        self._sample(sampler, 30)
+        times, levels = sampler.edges(3)
+        count = sampler.count
+        self.assertEqual(list(levels), [(i + 1) % 2 for i in range((count - 1) // 5)])
+        self.assertEqual(changes, [(3, level) for level in levels])
+        self.assertEqual(list(sampler.edges(4)[1]), [])
+        self.assertEqual(list(times), sorted(times))
+
+    def test_ring_buffer_keeps_newest(self):
+        #print "test_sampler.py:GPIOSamplerTest:test_ring_buffer_keeps_newest"
+        sampler = GPIOSampler(self.dev, size=8)
+        self._sample(sampler, 20)
+        times, values = sampler.samples()
+        self.assertEqual(len(times), 8)
+        self.assertEqual(list(times), sorted(times))
+        stats = sampler.stats()
+        self.assertEqual(stats['samples'], sampler.count)
+        self.assertTrue(stats['rate'] > 0)
+        self.assertTrue(stats['min_interval'] <= stats['mean_interval'] <= stats['max_interval'])
+
+    def test_interval(self):
+        #print "test_sampler.py:GPIOSamplerTest:test_interval"
+        sampler = GPIOSampler(self.dev, interval=0.005)
+        self._sample(sampler, 5)
+        self.assertTrue(sampler.stats()['min_interval'] >= 0.004)
+
+    def test_error_stops_sampling(self):
+        #print "test_sampler.py:GPIOSamplerTest:test_error_stops_sampling"
+        self.dev.response_timeout = 0.01
+        self.sim.lose_responses = 1
+        sampler = GPIOSampler(self.dev)
+        sampler.start()
+        sampler._thread.join(5.0)
+        self.assertRaises(DeadlineExceeded, sampler.stop)
+        self.assertEqual(sampler.count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
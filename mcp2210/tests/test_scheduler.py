@@ -0,0 +1,67 @@
+import unittest
+
+from mcp2210.simulator import SPILoopback
+from mcp2210.tests import simulated_device
+
+
+class _RecordingSlave(SPILoopback):
+    #print "test_scheduler.py:_RecordingSlave"
+    """Loopback slave that records the data and chip select lines of each transaction."""
+
+    def __init__(self):
+        #print "test_scheduler.py:_RecordingSlave:__init__"
+        self.transactions = []
+        self._data = bytearray()
+        self._active_cs = None
+
+    def exchange(self, data, settings):
+        #print "test_scheduler.py:_RecordingSlave:exchange"
+        self._data.extend(bytearray(data))
+        self._active_cs = settings.active_cs
+        return data
+
+    def release(self):
+        #print "test_scheduler.py:_RecordingSlave:release"
+        if self._data:
+            self.transactions.append((self._active_cs, bytes(self._data)))
+        self._data = bytearray()
+
+
+class TransactionSchedulerTest(unittest.TestCase):
+    #print "test_scheduler.py:TransactionSchedulerTest"
+
+    def setUp(self):
+        #print "test_scheduler.py:TransactionSchedulerTest:setUp"
+        self.slave = _RecordingSlave()
+        self.sim, self.dev = simulated_device(slave=self.slave)
+        self.slave_a = self.dev.transfer_settings
+        self.slave_a.idle_cs, self.slave_a.active_cs = 0x1FF, 0x1FE
+        self.slave_b = self.dev.transfer_settings
+        self.slave_b.idle_cs, self.slave_b.active_cs = 0x1FF, 0x1FD
+        self.slave_b.bit_rate = 1000000
+
+    def test_regroups_slaves(self):
+        #print "test_scheduler.py:TransactionSchedulerTest:test_regroups_slaves"
+        scheduler = self.dev.scheduler
+        futures = [scheduler.submit(settings, data) for settings, data in
+                   ((self.slave_a, b"a1"), (self.slave_b, b"b1"), (self.slave_a, b"a2"), (self.slave_b, b"b2"))]
+        self.assertEqual(scheduler.flush(), 4)
+        self.assertEqual([future.result() for future in futures], [b"a1", b"b1", b"a2", b"b2"])
+        self.assertEqual(self.slave.transactions, [(0x1FE, b"a1"), (0x1FE, b"a2"), (0x1FD, b"b1"), (0x1FD, b"b2")])
+        self.assertEqual(scheduler.stats()['settings_writes'], 2)
+        self.assertEqual(scheduler.stats()['settings_writes_avoided'], 2)
+
+    def test_keeps_order_per_slave(self):
+        #print "test_scheduler.py:TransactionSchedulerTest:test_keeps_order_per_slave"
+        fast = self.dev.transfer_settings
+        fast.idle_cs, fast.active_cs = self.slave_a.idle_cs, self.slave_a.active_cs
+        fast.spi_mode = 3
+        scheduler = self.dev.scheduler
+        for settings, data in ((self.slave_a, b"1"), (fast, b"2"), (self.slave_a, b"3")):
+            scheduler.submit(settings, data)
+        scheduler.flush()
+        self.assertEqual([data for cs, data in self.slave.transactions], [b"1", b"2", b"3"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import json
+import shutil
+import tempfile
+import unittest
+
+from mcp2210.device import MCP2210
+from mcp2210.simulator import SimulatedMCP2210
+from mcp2210.snapshot import SettingsSnapshot
+from mcp2210.transport import LazyTransport
+
+
+class LazyTransportTest(unittest.TestCase):
+    #print "test_snapshot.py:LazyTransportTest"
+
+    def setUp(self):
+        #print "test_snapshot.py:LazyTransportTest:setUp"
+        self.opened = []
+        self.transport = LazyTransport(self._open)
+
+    def _open(self):
+        #print "test_snapshot.py:LazyTransportTest:_open"
+        sim = SimulatedMCP2210(latency=0)
+        self.opened.append(sim)
+        return sim
+
+    def test_opens_on_first_command(self):
+        #print "test_snapshot.py:LazyTransportTest:test_opens_on_first_command"
+        dev = MCP2210(transport=self.transport, cancel=False)
+        self.assertFalse(self.transport.opened)
+        self.assertEqual(dev.transfer(b"data"), b"data")
+        self.assertTrue(self.transport.opened)
+        self.assertEqual(len(self.opened), 1)
+        # The wrapped transport's methods take over once it's open
+        self.assertEqual(self.transport.write, self.opened[0].write)
+        dev.transfer(b"more")
+        self.assertEqual(len(self.opened), 1)
+
+    def test_cancel_opens_straight_away(self):
+        #print "test_snapshot.py:LazyTransportTest:test_cancel_opens_straight_away"
+        MCP2210(transport=self.transport)
+        self.assertTrue(self.transport.opened)
+
+    def test_close_unopened(self):
+        #print "test_snapshot.py:LazyTransportTest:test_close_unopened"
+        self.transport.close()
+        self.assertEqual(self.opened, [])
+
+
+class SettingsSnapshotTest(unittest.TestCase):
+    #print "test_snapshot.py:SettingsSnapshotTest"
+
+    def setUp(self):
+        #print "test_snapshot.py:SettingsSnapshotTest:setUp"
+        self.directory = tempfile.mkdtemp()
+        self.snapshots = SettingsSnapshot(self.directory)
+        self.sim = SimulatedMCP2210(latency=0)
+        dev = MCP2210(transport=self.sim, serial="0001234567")
+        dev.boot_chip_settings
+        dev.product_name
+        self.snapshots.save(dev)
+
+    def tearDown(self):
+        #print "test_snapshot.py:SettingsSnapshotTest:tearDown"
+        shutil.rmtree(self.directory)
+
+    def _device(self):
+        #print "test_snapshot.py:SettingsSnapshotTest:_device"
+        """Returns a device as a new process would open it, which has nothing cached."""
+        return MCP2210(transport=self.sim, serial="0001234567", cancel=False)
+
+    def test_restore(self):
+        #print "test_snapshot.py:SettingsSnapshotTest:test_restore"
+        dev = self._device()
+        reports = self.sim.reports
+        self.assertTrue(self.snapshots.restore(dev))
+        # Only the volatile settings are read back
+        self.assertEqual(self.sim.reports, reports + 2)
+        self.assertEqual(dev.product_name, SimulatedMCP2210.DEFAULT_PRODUCT)
+        self.assertEqual(dev.boot_chip_settings.gpio_directions, 0x01FF)
+        dev.transfer_settings
+        self.assertEqual(self.sim.reports, reports + 2)
+        self.assertEqual(self.snapshots.restored, 1)
+
+    def test_stale_snapshot_rejected(self):
+        #print "test_snapshot.py:SettingsSnapshotTest:test_stale_snapshot_rejected"
+        self.sim.spi_settings.bit_rate = 1000000
+        dev = self._device()
+        self.assertFalse(self.snapshots.restore(dev))
+        self.assertEqual(self.snapshots.rejected, 1)
+        # The volatile settings read to check the snapshot are still cached
+        reports = self.sim.reports
+        self.assertEqual(dev.transfer_settings.bit_rate, 1000000)
+        self.assertEqual(self.sim.reports, reports)
+        self.assertFalse('product_name' in dev.cached_settings())
+
+    def test_unusable_files(self):
+        #print "test_snapshot.py:SettingsSnapshotTest:test_unusable_files"
+        path = self.snapshots.path("0001234567")
+        with open(path, 'w') as f:
+            f.write("{")
+        self.assertFalse(self.snapshots.restore(self._device()))
+        with open(path, 'w') as f:
+            json.dump({'version': 0, 'settings': {}}, f)
+        self.assertFalse(self.snapshots.restore(self._device()))
+        self.assertFalse(self.snapshots.restore(self._device(), serial="other"))
+        self.assertEqual(self.snapshots.rejected, 0)
+
+    def test_needs_serial(self):
+        #print "test_snapshot.py:SettingsSnapshotTest:test_needs_serial"
+        dev = MCP2210(transport=self.sim, cancel=False)
+        self.assertRaises(ValueError, self.snapshots.save, dev)
+        self.assertTrue(self.snapshots.restore(dev, serial="0001234567"))
+
+    def test_path_is_sanitized(self):
+        #print "test_snapshot.py:SettingsSnapshotTest:test_path_is_sanitized"
+        self.assertEqual(self.snapshots.path("../a b"), self.snapshots.path(".._a_b"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+from mcp2210 import commands
+from mcp2210.device import MCP2210
+from mcp2210.simulator import SimulatedMCP2210
+from mcp2210.trace import REQUEST, RESPONSE, Tracer, format_trace
+
+
+class TracerTest(unittest.TestCase):
+    #print "test_trace.py:TracerTest"
+
+    def setUp(self):
+        #print "test_trace.py:TracerTest:setUp"
+        self.dev = MCP2210(transport=SimulatedMCP2210(latency=0))
+
+    def test_records_requests_and_responses(self):
+        #print "test_trace.py:TracerTest:test_records_requests_and_responses"
+        self.dev.tracer = Tracer(16)
+        self.dev.chip_status()
+        frames = list(self.dev.tracer)
+        self.assertEqual([direction for timestamp, direction, report in frames], [REQUEST, RESPONSE])
+        for timestamp, direction, report in frames:
+            self.assertEqual(len(report), 64)
+            self.assertEqual(bytearray(report)[0], commands.GetChipStatusCommand.COMMAND)
+        self.assertTrue(frames[0][0] <= frames[1][0])
+        self.assertTrue('> 10 00' in format_trace(frames))
+
+    def test_ring_buffer_keeps_newest(self):
+        #print "test_trace.py:TracerTest:test_ring_buffer_keeps_newest"
+        tracer = self.dev.tracer = Tracer(4)
+        for address in range(5):
+            self.dev.eeprom[address]
+        self.assertEqual(tracer.count, 10)
+        self.assertEqual(len(tracer), 4)
+        addresses = [bytearray(report)[1] for timestamp, direction, report in tracer if direction == REQUEST]
+        self.assertEqual(addresses, [3, 4])
+
+    def test_disabled_by_default(self):
+        #print "test_trace.py:TracerTest:test_disabled_by_default"
+        self.assertEqual(self.dev.tracer, None)
+        self.assertFalse('_exchange' in self.dev.__dict__)
+        tracer = self.dev.tracer = Tracer(8)
+        self.dev.tracer = None
+        self.assertFalse('_exchange' in self.dev.__dict__)
+        self.dev.chip_status()
+        self.assertEqual(tracer.count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
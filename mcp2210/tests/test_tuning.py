@@ -0,0 +1,74 @@
+import unittest
+
+from mcp2210.device import MCP2210, VerificationError
+from mcp2210.simulator import SimulatedMCP2210, SPILoopback
+from mcp2210.tests import simulated_device
+
+
+class _SlowSlave(SPILoopback):
+    #print "test_tuning.py:_SlowSlave"
+    """Loopback slave that returns garbage when clocked faster than max_bit_rate."""
+
+    def __init__(self, max_bit_rate):
+        #print "test_tuning.py:_SlowSlave:__init__"
+        self.max_bit_rate = max_bit_rate
+
+    def exchange(self, data, settings):
+        #print "test_tuning.py:_SlowSlave:exchange"
+        if settings.bit_rate > self.max_bit_rate:
+            return b"\xff" * len(data)
+        return data
+
+
+class _GapSlave(SPILoopback):
+    #print "test_tuning.py:_GapSlave"
+    """Loopback slave that returns garbage without an inter-byte delay."""
+
+    def exchange(self, data, settings):
+        #print "test_tuning.py:_GapSlave:exchange"
+        if not settings.interbyte_delay:
+            return b"\xff" * len(data)
+        return data
+
+
+class TuneTransferSettingsTest(unittest.TestCase):
+    #print "test_tuning.py:TuneTransferSettingsTest"
+
+    def test_finds_fastest_bit_rate(self):
+        #print "test_tuning.py:TuneTransferSettingsTest:test_finds_fastest_bit_rate"
+        sim, dev = simulated_device(slave=_SlowSlave(4000000))
+        original = dev.transfer_settings.bit_rate
+        settings, curve = dev.tune_transfer_settings(b"\x01\x02\x03", repetitions=3)
+        self.assertEqual(settings.bit_rate, 4000000)
+        # The device's settings are left alone until the caller assigns the result
+        self.assertEqual(dev.transfer_settings.bit_rate, original)
+        for point in curve:
+            if point['passed']:
+                self.assertEqual(point['errors'], 0)
+                self.assertTrue(point['bytes_per_second'] > 0)
+            else:
+                self.assertEqual(point['errors'], 3)
+                self.assertEqual(point['bytes_per_second'], None)
+
+    def test_lowers_delays(self):
+        #print "test_tuning.py:TuneTransferSettingsTest:test_lowers_delays"
+        # Starts from the factory delays, which all work
+        dev = MCP2210(transport=SimulatedMCP2210(latency=0, slave=_GapSlave()))
+        settings, curve = dev.tune_transfer_settings(b"\x01\x02\x03", repetitions=2)
+        self.assertEqual((settings.interbyte_delay, settings.cs_data_delay, settings.lb_cs_delay), (1, 0, 0))
+        self.assertEqual(settings.bit_rate, 12000000)
+
+    def test_slave_never_answers(self):
+        #print "test_tuning.py:TuneTransferSettingsTest:test_slave_never_answers"
+        sim, dev = simulated_device(slave=_SlowSlave(0))
+        self.assertRaises(VerificationError, dev.tune_transfer_settings, b"\x01", repetitions=1,
+                          bit_rates=(12000000, 1000000))
+
+    def test_needs_a_repetition(self):
+        #print "test_tuning.py:TuneTransferSettingsTest:test_needs_a_repetition"
+        sim, dev = simulated_device()
+        self.assertRaises(ValueError, dev.tune_transfer_settings, b"\x01", repetitions=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
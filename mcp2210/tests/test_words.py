@@ -0,0 +1,85 @@
+import unittest
+
+from mcp2210.simulator import SPILoopback
+from mcp2210.tests import simulated_device
+from mcp2210.words import WordTransfer, empty_words, pack_words, unpack_words_into
+
+
+class _ADCSlave(SPILoopback):
+    #print "test_words.py:_ADCSlave"
+    """Models a 12-bit ADC answering each 16-bit command word with a sample in bits 1-12.
+
+    The sample is the channel, bits 6-7 of the command, times 1000.
+    """
+
+    def exchange(self, data, settings):
+        #print "test_words.py:_ADCSlave:exchange"
+        data = bytearray(data)
+        out = bytearray(len(data))
+        for i in range(0, len(data) - 1, 2):
+            sample = ((data[i + 1] >> 6) & 0x03) * 1000
+            out[i] = (sample << 1) >> 8
+            out[i + 1] = (sample << 1) & 0xFF
+        return bytes(out)
+
+
+class PackWordsTest(unittest.TestCase):
+    #print "test_words.py:PackWordsTest"
+
+    def test_pack(self):
+        #print "test_words.py:PackWordsTest:test_pack"
+        self.assertEqual(pack_words([0x1234, 0x0056]), bytearray(b"\x12\x34\x00\x56"))
+        self.assertEqual(pack_words([0x1234], endian='little'), bytearray(b"\x34\x12"))
+        self.assertEqual(pack_words([0x123456, 0xABCDEF], word_bits=24),
+                         bytearray(b"\x12\x34\x56\xab\xcd\xef"))
+        self.assertEqual(pack_words([0x81, 0x7F], word_bits=8), bytearray(b"\x81\x7f"))
+
+    def test_unpack_round_trip(self):
+        #print "test_words.py:PackWordsTest:test_unpack_round_trip"
+        for word_bits in (8, 12, 16, 20, 32):
+            for endian in ('big', 'little'):
+                words = [0, 1, (1 << word_bits) - 1, 0x5A5A5A5A & ((1 << word_bits) - 1)]
+                out = empty_words(len(words), word_bits)
+                data = pack_words(words, word_bits, endian)
+                self.assertEqual(unpack_words_into(data, out, word_bits, endian), 4)
+                self.assertEqual(list(out), words)
+
+    def test_mask(self):
+        #print "test_words.py:PackWordsTest:test_mask"
+        out = empty_words(2, 16)
+        unpack_words_into(b"\x3f\xfe\x80\x03", out, mask=0x1FFE)
+        self.assertEqual(list(out), [0xFFF, 0x001])
+
+    def test_bad_arguments(self):
+        #print "test_words.py:PackWordsTest:test_bad_arguments"
+        self.assertRaises(ValueError, pack_words, [1], 33)
+        self.assertRaises(ValueError, pack_words, [1], 16, 'middle')
+        self.assertRaises(ValueError, unpack_words_into, b"\0" * 6, empty_words(2, 16))
+
+
+class WordTransferTest(unittest.TestCase):
+    #print "test_words.py:WordTransferTest"
+
+    def setUp(self):
+        #print "test_words.py:WordTransferTest:setUp"
+        self.sim, self.dev = simulated_device(slave=_ADCSlave())
+
+    def test_read(self):
+        #print "test_words.py:WordTransferTest:test_read"
+        # Enough channels to span several reports
+        transfer = WordTransfer(self.dev, [0x0600, 0x0640, 0x0680, 0x06C0] * 20, mask=0x1FFE)
+        self.assertEqual(list(transfer.read()), [0, 1000, 2000, 3000] * 20)
+        out = empty_words(80, 16)
+        self.assertEqual(transfer.read_into(out), 80)
+        self.assertEqual(list(out[:4]), [0, 1000, 2000, 3000])
+
+    def test_transfer_words(self):
+        #print "test_words.py:WordTransferTest:test_transfer_words"
+        self.assertEqual(list(self.dev.transfer_words([0x0680, 0x0640], mask=0x1FFE)), [2000, 1000])
+        out = empty_words(3, 16)
+        self.assertTrue(self.dev.transfer_words([0x06C0] * 3, mask=0x1FFE, out=out) is out)
+        self.assertEqual(list(out), [3000] * 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+
+REQUEST = 0
+RESPONSE = 1
+
+REPORT_SIZE = 64
+
+
+class Tracer(object):
+    #print "trace.py:Tracer"
+    """Records raw request and response reports in a fixed-size ring buffer.
+
+    Frames are copied into storage allocated up front, so recording costs a 64-byte copy and a
+    timestamp; once the buffer is full the oldest frames are overwritten.
+
+    Usage:
+        >>> dev.tracer = Tracer(4096)
+        >>> dev.transfer(b"data")
+        >>> print format_trace(dev.tracer)
+        >>> dev.tracer = None  # Stop tracing
+    """
+
+    def __init__(self, size=1024):
+        #print "trace.py:Tracer:__init__"
+        """Constructor.
+
+        Arguments:
+          size: Number of frames to keep. A command and its response are two frames.
+        """
+        self.size = size
+        self.count = 0
+        self._data = bytearray(size * REPORT_SIZE)
+        self._times = [0.0] * size
+        self._directions = bytearray(size)
+
+    def record(self, direction, report):
+        #print "trace.py:Tracer:record"
+        """Records one frame.
+
+        Arguments:
+          direction: REQUEST or RESPONSE.
+          report: The 64-byte report.
+        """
+        i = self.count % self.size
+        self._data[i * REPORT_SIZE:(i + 1) * REPORT_SIZE] = report
+        self._times[i] = monotonic()
+        self._directions[i] = direction
+        self.count += 1
+
+    def clear(self):
+        #print "trace.py:Tracer:clear"
+        self.count = 0
+
+    def __len__(self):
+        #print "trace.py:Tracer:__len__"
+        return min(self.count, self.size)
+
+    def __iter__(self):
+        #print "trace.py:Tracer:__iter__"
+        """Yields (timestamp, direction, report) tuples for the retained frames, oldest first."""
+        for n in range(self.count - len(self), self.count):
+            i = n % self.size
+            yield self._times[i], self._directions[i], bytes(self._data[i * REPORT_SIZE:(i + 1) * REPORT_SIZE])
+
+
+def format_bits(report):
+    #print "trace.py:format_bits"
+    """Renders a report as a bit matrix: one row per byte from the third byte on, most significant bit
+    first, with X for set bits.
+
+    If the set bits span no more than two bytes only the row for the fifth byte is shown, and a report
+    with no bits set past the command byte renders as an empty string.
+    """
+    body = bytearray(report)[2:]
+    lanes = [''.join('X' if x & (1 << i) else ' ' for x in body) for i in range(8)]
+    width = max(len(lane.strip()) for lane in lanes)
+    if width > 2:
+        rows = range(len(body))
+    elif width == 0:
+        rows = []
+    else:
+        rows = [row for row in [2] if row < len(body)]
+    return '\n'.join(' '.join(lanes[i][row] for i in range(7, -1, -1)) for row in rows)
+
+
+def format_trace(frames):
+    #print "trace.py:format_trace"
+    """Renders traced frames, such as a Tracer, with a timestamped hex header and bit matrix for each."""
+    lines = []
+    for timestamp, direction, report in frames:
+        lines.append('%.6f %s %s' % (timestamp, '>' if direction == REQUEST else '<',
+                                     ' '.join('%.2x' % x for x in bytearray(report))))
+        bits = format_bits(report)
+        if bits:
+            lines.append(bits)
+    return '\n'.join(lines)
@@ -0,0 +1,232 @@
+from collections import deque
+import threading
+
+try:
+    import hid
+except ImportError:
+    hid = None
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+
+class Transport(object):
+    #print "transport.py:Transport"
+    """Carries 64-byte HID reports between the host and an MCP2210.
+
+    MCP2210 formats commands into output reports and parses input reports; transports only move them.
+    """
+
+    def write(self, report):
+        #print "transport.py:Transport:write"
+        """Sends one output report.
+
+        Arguments:
+          report: A bytearray holding the report.
+        """
+        raise NotImplementedError()
+
+    def read_into(self, report, timeout=None):
+        #print "transport.py:Transport:read_into"
+        """Reads one input report into report, a writable buffer such as a bytearray.
+
+        Arguments:
+          report: The buffer to read into.
+          timeout: Seconds to wait for a report, or None to wait indefinitely.
+
+        Returns:
+          The number of bytes read, which is 0 if no report arrived in time.
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        #print "transport.py:Transport:close"
+        """Releases the underlying device."""
+        pass
+
+
+# Microchip's default USB IDs for the MCP2210
+DEFAULT_VID = 0x04D8
+DEFAULT_PID = 0x00DE
+
+
+def enumerate_devices(vid=DEFAULT_VID, pid=DEFAULT_PID):
+    #print "transport.py:enumerate_devices"
+    """Lists attached adapters with the given USB IDs.
+
+    Returns:
+      A list of hidapi device info dicts, with keys including 'path' and 'serial_number'.
+    """
+    if hid is None:
+        raise ImportError("hidapi is required to talk to a physical MCP2210")
+    return hid.enumerate(vid, pid)
+
+
+class HIDTransport(Transport):
+    #print "transport.py:HIDTransport"
+    """Transport over hidapi to a physical MCP2210.
+
+    With several adapters attached, vid and pid alone open the first one found; pass the serial number
+    or the hidapi path from enumerate_devices() to pick a specific one.
+    """
+
+    def __init__(self, vid=DEFAULT_VID, pid=DEFAULT_PID, serial=None, path=None):
+        #print "transport.py:HIDTransport:__init__"
+        """Constructor.
+
+        Arguments:
+          vid: Vendor ID
+          pid: Product ID
+          serial: USB serial number of the adapter to open.
+          path: hidapi path of the adapter to open; takes precedence over vid, pid and serial.
+        """
+        if hid is None:
+            raise ImportError("hidapi is required to talk to a physical MCP2210")
+        self.hid = hid.device()
+        if path is not None:
+            self.hid.open_path(path)
+        else:
+            self.hid.open(vid, pid, serial)
+
+    def write(self, report):
+        #print "transport.py:HIDTransport:write"
+        self.hid.write(report)
+
+    def read_into(self, report, timeout=None):
+        #print "transport.py:HIDTransport:read_into"
+        if timeout is None:
+            data = self.hid.read(len(report))
+        else:
+            # hidapi treats a timeout of 0 as blocking, so wait at least a millisecond
+            data = self.hid.read(len(report), max(int(timeout * 1000), 1))
+        report[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        #print "transport.py:HIDTransport:close"
+        self.hid.close()
+
+
+class LazyTransport(Transport):
+    #print "transport.py:LazyTransport"
+    """Wraps a function that opens a transport, calling it on first use rather than straight away.
+
+    Once open, the wrapped transport's methods replace this one's, so later reports pay nothing extra.
+
+    Usage:
+        >>> dev = MCP2210(transport=LazyTransport(lambda: HIDTransport(serial="0001234567")), cancel=False)
+    """
+
+    def __init__(self, opener):
+        #print "transport.py:LazyTransport:__init__"
+        """Constructor.
+
+        Arguments:
+          opener: Function called with no arguments to open the transport.
+        """
+        self.opener = opener
+        self.transport = None
+
+    @property
+    def opened(self):
+        #print "transport.py:LazyTransport:opened(@property)"
+        return self.transport is not None
+
+    def open(self):
+        #print "transport.py:LazyTransport:open"
+        """Opens the transport now, if it isn't already, and returns it."""
+        if self.transport is None:
+            self.transport = self.opener()
+            self.write = self.transport.write
+            self.read_into = self.transport.read_into
+        return self.transport
+
+    def write(self, report):
+        #print "transport.py:LazyTransport:write"
+        self.open().write(report)
+
+    def read_into(self, report, timeout=None):
+        #print "transport.py:LazyTransport:read_into"
+        return self.open().read_into(report, timeout)
+
+    def close(self):
+        #print "transport.py:LazyTransport:close"
+        if self.transport is not None:
+            self.transport.close()
+
+
+class BufferedTransport(Transport):
+    #print "transport.py:BufferedTransport"
+    """Wraps another transport with a background thread that drains its input reports into a bounded queue.
+
+    Reports are read off the device as soon as they arrive, whether or not anything is waiting for them,
+    so the adapter's input buffer never fills up, and reads with a timeout are served from the queue. If
+    the queue is full the oldest report is dropped and counted in dropped; it can only be a response
+    nobody waited for.
+
+    Usage:
+        >>> dev = MCP2210(transport=BufferedTransport(HIDTransport()))
+    """
+    # Seconds the reader thread waits for each report, which bounds how long close() takes
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, transport, queue_size=16):
+        #print "transport.py:BufferedTransport:__init__"
+        """Constructor.
+
+        Arguments:
+          transport: The transport to read from, which then belongs to this object.
+          queue_size: Number of reports to hold before dropping the oldest.
+        """
+        self.transport = transport
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._reports = deque()
+        self._ready = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="mcp2210-reader")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        #print "transport.py:BufferedTransport:_run"
+        report = bytearray(64)
+        while not self._closed:
+            length = self.transport.read_into(report, self.POLL_INTERVAL)
+            if not length:
+                continue
+            with self._ready:
+                if len(self._reports) >= self.queue_size:
+                    self._reports.popleft()
+                    self.dropped += 1
+                self._reports.append(bytes(report[:length]))
+                self._ready.notify()
+
+    def write(self, report):
+        #print "transport.py:BufferedTransport:write"
+        self.transport.write(report)
+
+    def read_into(self, report, timeout=None):
+        #print "transport.py:BufferedTransport:read_into"
+        with self._ready:
+            if timeout is None:
+                while not self._reports:
+                    self._ready.wait()
+            else:
+                end = monotonic() + timeout
+                while not self._reports:
+                    remaining = end - monotonic()
+                    if remaining <= 0:
+                        return 0
+                    self._ready.wait(remaining)
+            data = self._reports.popleft()
+        report[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        #print "transport.py:BufferedTransport:close"
+        self._closed = True
+        self._thread.join()
+        self.transport.close()
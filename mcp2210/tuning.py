@@ -0,0 +1,123 @@
+from mcp2210.commands import SPISettings
+from mcp2210.device import VerificationError
+
+try:
+    from time import monotonic
+except ImportError:
+    from time import time as monotonic
+
+
+# Bit rates tried by default, in Hz, within the 1.5kHz to 12MHz the chip supports
+BIT_RATES = (12000000, 8000000, 6000000, 4000000, 3000000, 2000000, 1500000, 1000000, 800000, 500000,
+             250000, 100000, 50000, 10000)
+
+# Delays tried by default, in the 100us units of SPISettings
+DELAYS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Delays in the order they are reduced; the inter-byte delay usually costs the most throughput
+DELAY_FIELDS = ('interbyte_delay', 'cs_data_delay', 'lb_cs_delay')
+
+
+def _checker(transaction, expected):
+    #print "tuning.py:_checker"
+    """Returns a function that tells whether data received for transaction is right."""
+    if expected is None:
+        expected = transaction
+    if callable(expected):
+        return expected
+    expected = bytes(bytearray(expected))
+    return lambda received: received == expected
+
+
+def tune_transfer_settings(device, transaction, expected=None, repetitions=10, bit_rates=BIT_RATES,
+                           delays=DELAYS):
+    #print "tuning.py:tune_transfer_settings"
+    """Searches for the fastest transfer settings that a slave answers reliably.
+
+    Each configuration is tried by running transaction repetitions times and checking every response; a
+    single wrong response fails it, though all repetitions still run so the errors are counted. The
+    search starts from the device's current transfer settings, whose delays are assumed to work:
+
+      1. The fastest of bit_rates that passes with the current delays is found.
+      2. Each delay in turn is lowered to the smallest of delays that still passes.
+      3. Bit rates faster than the one found are tried again with the lower delays.
+
+    The chip select lines and SPI mode are left as they are. The device's transfer settings are restored
+    when the search ends, so nothing changes until the caller assigns the result.
+
+    Usage:
+        >>> settings, curve = dev.tune_transfer_settings(b"\\x9f\\0\\0\\0", expected=b"\\xff\\xef\\x40\\x14")
+        >>> dev.transfer_settings = settings
+        >>> dev.boot_transfer_settings = settings  # Keep them across resets
+        >>> [(point['bit_rate'], point['bytes_per_second']) for point in curve if point['passed']]
+
+    Arguments:
+      device: The MCP2210 to tune.
+      transaction: Data to send in each verification transaction, such as a register read. It must be
+        safe to repeat any number of times.
+      expected: The data the slave should return, or a function called with the data received that
+        returns True if it is right. By default the slave is expected to return transaction, as a
+        loopback does.
+      repetitions: Number of times each configuration must run without error to pass.
+      bit_rates: Bit rates to try, in Hz.
+      delays: Values to try for each delay, in units of 100us.
+
+    Returns:
+      A tuple of (settings, curve). settings is the fastest commands.SPISettings found. curve is a list
+      with a dict for each configuration tried, in order, giving its bit_rate and delays, whether it
+      passed, the number of wrong responses out of repetitions, and its throughput in bytes_per_second,
+      which is None for configurations that failed.
+
+    Raises:
+      VerificationError if the slave fails at every bit rate with the current delays.
+      ValueError if repetitions is less than 1.
+    """
+    if repetitions < 1:
+        raise ValueError("At least one repetition is needed to verify a configuration")
+    check = _checker(transaction, expected)
+    original = SPISettings.from_buffer_copy(device.transfer_settings)
+    current = SPISettings.from_buffer_copy(original)
+    curve = []
+
+    def trial(**changes):
+        #print "tuning.py:tune_transfer_settings:trial"
+        settings = SPISettings.from_buffer_copy(current)
+        for name, value in changes.items():
+            setattr(settings, name, value)
+        device.transfer_settings = settings
+        errors = 0
+        start = monotonic()
+        for i in range(repetitions):
+            if not check(device.transfer(transaction)):
+                errors += 1
+        elapsed = monotonic() - start
+        point = dict((name, getattr(settings, name)) for name in ('bit_rate',) + DELAY_FIELDS)
+        throughput = None
+        if not errors:
+            throughput = len(transaction) * repetitions / elapsed if elapsed else 0.0
+        point.update(passed=not errors, errors=errors, bytes_per_second=throughput)
+        curve.append(point)
+        if not errors:
+            for name, value in changes.items():
+                setattr(current, name, value)
+        return not errors
+
+    try:
+        for bit_rate in sorted(bit_rates, reverse=True):
+            if trial(bit_rate=bit_rate):
+                break
+        else:
+            raise VerificationError("Slave failed verification at every bit rate with the current delays")
+
+        for name in DELAY_FIELDS:
+            for value in sorted(delay for delay in delays if delay < getattr(current, name)):
+                if trial(**{name: value}):
+                    break
+
+        for bit_rate in sorted((rate for rate in bit_rates if rate > current.bit_rate), reverse=True):
+            if trial(bit_rate=bit_rate):
+                break
+    finally:
+        device.transfer_settings = original
+
+    return current, curve
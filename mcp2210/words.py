@@ -0,0 +1,173 @@
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def _word_layout(word_bits, endian):
+    #print "words.py:_word_layout"
+    """Returns the number of bytes each word of word_bits occupies on the wire, checking the arguments."""
+    if not 1 <= word_bits <= 32:
+        raise ValueError("word_bits must be between 1 and 32, not %r" % (word_bits,))
+    if endian not in ('big', 'little'):
+        raise ValueError("endian must be 'big' or 'little', not %r" % (endian,))
+    return (word_bits + 7) // 8
+
+
+def _mask_shift(mask):
+    #print "words.py:_mask_shift"
+    """Returns the number of zero bits below the lowest set bit of mask."""
+    return (mask & -mask).bit_length() - 1 if mask else 0
+
+
+def _typecode(word_bytes):
+    #print "words.py:_typecode"
+    return 'B' if word_bytes == 1 else 'H' if word_bytes == 2 else 'L'
+
+
+def _dtype(word_bytes):
+    #print "words.py:_dtype"
+    return numpy.uint8 if word_bytes == 1 else numpy.uint16 if word_bytes == 2 else numpy.uint32
+
+
+def empty_words(count, word_bits):
+    #print "words.py:empty_words"
+    """Allocates an array for count words of word_bits, of the type WordTransfer decodes into.
+
+    This is a NumPy array of the smallest unsigned type that holds the words if NumPy is installed,
+    otherwise an array from the standard library.
+    """
+    word_bytes = _word_layout(word_bits, 'big')
+    if numpy is not None:
+        return numpy.zeros(count, dtype=_dtype(word_bytes))
+    return array(_typecode(word_bytes), [0]) * count
+
+
+def pack_words(words, word_bits=16, endian='big'):
+    #print "words.py:pack_words"
+    """Packs integer words into the bytes that send them over SPI, each in a whole number of bytes.
+
+    Arguments:
+      words: A sequence or NumPy array of integers.
+      word_bits: Bits per word; each word is sent as (word_bits + 7) // 8 bytes.
+      endian: 'big' to send the most significant byte of each word first, or 'little'.
+
+    Returns:
+      A bytearray.
+    """
+    word_bytes = _word_layout(word_bits, endian)
+    order = range(word_bytes - 1, -1, -1) if endian == 'big' else range(word_bytes)
+    if numpy is not None:
+        values = numpy.asarray(words, dtype=numpy.uint32)
+        packed = numpy.empty((len(values), word_bytes), dtype=numpy.uint8)
+        for column, byte in enumerate(order):
+            packed[:, column] = (values >> (8 * byte)) & 0xFF
+        return bytearray(packed.tobytes())
+    packed = bytearray(len(words) * word_bytes)
+    for i, value in enumerate(words):
+        offset = i * word_bytes
+        for column, byte in enumerate(order):
+            packed[offset + column] = (value >> (8 * byte)) & 0xFF
+    return packed
+
+
+def unpack_words_into(data, out, word_bits=16, endian='big', mask=None):
+    #print "words.py:unpack_words_into"
+    """Decodes words received over SPI into an existing array.
+
+    Arguments:
+      data: The received bytes, a whole number of words long.
+      out: Array to decode into, with room for every word, as from empty_words().
+      word_bits: Bits per word, as given to pack_words().
+      endian: Byte order of each word, as given to pack_words().
+      mask: Bits of each word to keep, shifted down so the lowest set bit of mask becomes bit 0. This
+        extracts a sample from a frame with leading or trailing padding bits: a 12-bit ADC returning
+        its sample in bits 1-12 of a 16-bit frame is read with word_bits=16, mask=0x1FFE. By default
+        the lowest word_bits bits are kept.
+
+    Returns:
+      The number of words decoded.
+    """
+    word_bytes = _word_layout(word_bits, endian)
+    if mask is None:
+        mask = (1 << word_bits) - 1
+    shift = _mask_shift(mask)
+    count = len(data) // word_bytes
+    if len(out) < count:
+        raise ValueError("Output array holds %d words, need %d" % (len(out), count))
+    order = range(word_bytes) if endian == 'big' else range(word_bytes - 1, -1, -1)
+
+    if numpy is not None:
+        raw = numpy.frombuffer(data, dtype=numpy.uint8, count=count * word_bytes).reshape(count, word_bytes)
+        if word_bytes in (1, 2, 4):
+            values = raw.reshape(-1).view(('>' if endian == 'big' else '<') + 'u%d' % word_bytes)
+            values = values.astype(numpy.uint32)
+        else:
+            values = numpy.zeros(count, dtype=numpy.uint32)
+            for column in order:
+                values <<= 8
+                values |= raw[:, column]
+        values &= mask
+        values >>= shift
+        out[:count] = values
+        return count
+
+    data = bytearray(data)
+    for i in range(count):
+        offset = i * word_bytes
+        value = 0
+        for column in order:
+            value = (value << 8) | data[offset + column]
+        out[i] = (value & mask) >> shift
+    return count
+
+
+class WordTransfer(object):
+    #print "words.py:WordTransfer"
+    """A transfer of fixed command words, encoded once and repeated as often as needed.
+
+    The transmit payload and receive buffer are built up front, so each acquisition costs just the SPI
+    transfer and a vectorized decode into the caller's array - suited to continuous sampling of an ADC.
+
+    Usage:
+        >>> adc = WordTransfer(dev, [0x0600, 0x0640, 0x0680], word_bits=16, mask=0x0FFF)
+        >>> samples = empty_words(3 * 1000, 16).reshape(1000, 3)
+        >>> for row in samples:
+        ...     adc.read_into(row)
+    """
+
+    def __init__(self, device, commands, word_bits=16, endian='big', mask=None):
+        #print "words.py:WordTransfer:__init__"
+        """Constructor.
+
+        Arguments:
+          device: The MCP2210 to transfer with.
+          commands: Sequence or NumPy array of words to send; one word is received for each.
+          word_bits, endian, mask: As for pack_words() and unpack_words_into().
+        """
+        self.device = device
+        self.word_bits = word_bits
+        self.endian = endian
+        self.mask = mask
+        self.count = len(commands)
+        self._tx = pack_words(commands, word_bits, endian)
+        self._rx = bytearray(len(self._tx))
+
+    def read_into(self, out, deadline=None):
+        #print "words.py:WordTransfer:read_into"
+        """Runs the transfer, decoding the received words into out.
+
+        Returns:
+          The number of words decoded.
+        """
+        received = self.device.transfer_into(self._tx, self._rx, deadline)
+        return unpack_words_into(memoryview(self._rx)[:received], out, self.word_bits, self.endian, self.mask)
+
+    def read(self, deadline=None):
+        #print "words.py:WordTransfer:read"
+        """Runs the transfer, returning the received words in a new array as from empty_words()."""
+        out = empty_words(self.count, self.word_bits)
+        self.read_into(out, deadline)
+        return out